@@ -0,0 +1,73 @@
+"""Throughput benchmark of the local document index.
+
+Measures how many documents per second are added to the index and how many
+queries per second are answered in exact and IVF mode, together with the
+recall of the IVF search relative to the exact search.
+
+Run with ``python benchmarks/bench_document_index.py [documents]``.
+"""
+
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from riskgpt.models.utils.documents import DocumentInput
+from riskgpt.storage.document_index import DocumentIndex
+
+QUERIES = 200
+LIMIT = 10
+VOCABULARY = 5000
+TOPICS = 50
+
+
+def corpus(count: int, rng: np.random.Generator):
+    """Documents of random words, each dominated by one of the topics."""
+    words = [f"term{i}" for i in range(VOCABULARY)]
+    documents = []
+    for i in range(count):
+        topic = i % TOPICS
+        topic_words = rng.integers(topic * 100, topic * 100 + 100, 30)
+        noise = rng.integers(0, VOCABULARY, 30)
+        text = " ".join(words[w] for w in np.concatenate([topic_words, noise]))
+        documents.append(DocumentInput(title=f"Document {i}", content=text))
+    return documents
+
+
+def main(count: int = 20000) -> None:
+    rng = np.random.default_rng(0)
+    documents = corpus(count, rng)
+    queries = [d.content for d in corpus(QUERIES, rng)]
+
+    with tempfile.TemporaryDirectory() as path:
+        exact = DocumentIndex(path)
+        start = time.perf_counter()
+        for i in range(0, count, 1000):
+            exact.vectorize(documents[i : i + 1000])
+        added = time.perf_counter() - start
+        print(f"added {count} documents: {count / added:,.0f} documents/s")
+
+        ivf = DocumentIndex(path, mode="ivf")
+        start = time.perf_counter()
+        ivf.search(queries[0])
+        print(f"clustered for IVF in {time.perf_counter() - start:.2f}s")
+
+        expected = []
+        for name, index in (("exact", exact), ("ivf", ivf)):
+            start = time.perf_counter()
+            results = [{m.uuid for m in index.search(q, limit=LIMIT)} for q in queries]
+            elapsed = time.perf_counter() - start
+            if not expected:
+                expected = results
+            recall = np.mean([len(r & e) / LIMIT for r, e in zip(results, expected)])
+            print(
+                f"{name:<6}{QUERIES / elapsed:>10,.0f} queries/s"
+                f"{elapsed / QUERIES * 1e3:>10.2f}ms/query   recall@{LIMIT} {recall:.2f}"
+            )
+        ivf.close()
+        exact.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
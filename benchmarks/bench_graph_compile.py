@@ -0,0 +1,44 @@
+"""Micro-benchmark for the per-request graph construction overhead.
+
+Compares building and compiling a workflow graph on every request (the former
+behaviour) with reusing the module-level compiled graph.
+
+Run with ``python benchmarks/bench_graph_compile.py``.
+"""
+
+import timeit
+
+from riskgpt.workflows import enrich_context, prepare_presentation_output, risk_workflow
+
+ITERATIONS = 200
+
+GRAPHS = {
+    "enrich_context": (
+        lambda: enrich_context.get_enrich_context_graph().compile(),
+        enrich_context._build_graph,
+    ),
+    "risk_workflow": (
+        lambda: risk_workflow.get_risk_workflow_graph().compile(),
+        risk_workflow._build_risk_workflow_graph,
+    ),
+    "prepare_presentation_output": (
+        lambda: prepare_presentation_output.get_presentation_graph().compile(),
+        prepare_presentation_output._build_graph,
+    ),
+}
+
+
+def main() -> None:
+    print(f"{'workflow':<30}{'per request':>14}{'cached':>14}{'speedup':>10}")
+    for name, (compile_graph, cached_graph) in GRAPHS.items():
+        per_request = timeit.timeit(compile_graph, number=ITERATIONS) / ITERATIONS
+        cached_graph()
+        cached = timeit.timeit(cached_graph, number=ITERATIONS) / ITERATIONS
+        print(
+            f"{name:<30}{per_request * 1e3:>12.3f}ms{cached * 1e6:>12.3f}us"
+            f"{per_request / cached:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Wall-clock benchmark of the Monte Carlo portfolio simulation.
+
+Simulates portfolios of risks spread evenly over the triangular, PERT, normal
+and lognormal distributions, with occurrence probabilities between 5% and 95%.
+With ``--correlated`` every 20 consecutive risks share a tag and further tags
+overlapping them link the risks into correlated blocks of 40.
+
+Run with
+``python benchmarks/bench_portfolio_simulation.py [--correlated] [risks] [iterations]``.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from riskgpt.helpers.correlation import CorrelationModel
+from riskgpt.helpers.simulation import simulate_portfolio
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.utils.simulation import SimulatedRisk
+
+
+def portfolio(count: int, rng: np.random.Generator) -> list[SimulatedRisk]:
+    risks = []
+    for i in range(count):
+        low = float(rng.uniform(1e4, 1e5))
+        mode = low * float(rng.uniform(1.2, 2.0))
+        high = mode * float(rng.uniform(1.5, 4.0))
+        distribution = ("triangular", "pert", "normal", "lognormal")[i % 4]
+        if distribution in ("triangular", "pert"):
+            parameters = {"min": low, "mode": mode, "max": high}
+        elif distribution == "normal":
+            parameters = {"mean": mode, "std": (high - low) / 6}
+        else:
+            parameters = {"mu": float(np.log(mode)), "sigma": 0.5}
+        risks.append(
+            SimulatedRisk(
+                risk_id=f"RISK-{i + 1:04d}",
+                distribution=distribution,
+                parameters=parameters,
+                probability=float(rng.uniform(0.05, 0.95)),
+            )
+        )
+    return risks
+
+
+def tags(risks: list[SimulatedRisk]) -> list[CorrelationTag]:
+    ids = [risk.risk_id for risk in risks]
+    groups = [ids[i : i + 20] for i in range(0, len(ids), 20)]
+    groups += [ids[i + 10 : i + 30] for i in range(0, len(ids), 40)]
+    return [
+        CorrelationTag(tag=f"TAG-{k + 1}", justification="benchmark", risk_ids=members)
+        for k, members in enumerate(groups)
+    ]
+
+
+def main(count: int = 1000, iterations: int = 100000, correlated: bool = False) -> None:
+    risks = portfolio(count, np.random.default_rng(0))
+    start = time.perf_counter()
+    model = CorrelationModel.from_tags(risks, tags(risks)) if correlated else None
+    result = simulate_portfolio(risks, iterations, seed=0, correlation=model)
+    elapsed = time.perf_counter() - start
+    kind = "correlated" if correlated else "independent"
+    print(f"{count} {kind} risks x {iterations} iterations: {elapsed:.2f}s")
+    print(
+        f"{count * iterations / elapsed / 1e6:,.1f} million risk samples/s, "
+        f"{iterations / elapsed:,.0f} scenarios/s"
+    )
+    print(result.format_summary())
+    top = result.contributions[0]
+    print(f"largest contribution: {top.risk_id} ({top.tail_share:.1%} of the CVaR)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    correlated = "--correlated" in args
+    main(*(int(arg) for arg in args if arg != "--correlated"), correlated=correlated)
@@ -0,0 +1,105 @@
+"""Wall-clock benchmark of the per-risk pipelines of the presentation workflow.
+
+The chains are replaced by fakes that replay typical latencies of the real
+chain calls, scaled down by ``SCALE``. With ``PRESENTATION_CONCURRENCY=1`` all
+calls run one after another, which replays the former strictly sequential
+workflow; the other runs use concurrent per-risk pipelines.
+
+Run with ``python benchmarks/bench_presentation_pipeline.py [risks]``.
+"""
+
+import asyncio
+import sys
+import time
+
+from riskgpt.models.base import ResponseInfo
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.communication import CommunicationResponse
+from riskgpt.models.chains.correlation import CorrelationTagResponse
+from riskgpt.models.chains.drivers import DriverResponse, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.workflows.presentation import PresentationRequest
+from riskgpt.workflows import prepare_presentation_output as presentation
+
+SCALE = 0.01
+
+# Typical latencies of the chain calls in seconds
+LATENCIES = {
+    "risk_identification_chain": 6.0,
+    "risk_assessment_chain": 4.0,
+    "risk_drivers_chain": 5.0,
+    "risk_mitigations_chain": 6.0,
+    "correlation_tags_chain": 5.0,
+    "communicate_risks_chain": 4.0,
+}
+
+
+def _info() -> ResponseInfo:
+    return ResponseInfo(
+        consumed_tokens=500, total_cost=0.001, prompt_name="x", model_name="m"
+    )
+
+
+def replay(name: str, response):
+    async def chain(request):
+        await asyncio.sleep(LATENCIES[name] * SCALE)
+        return response
+
+    return chain
+
+
+def install_fakes(risks: int) -> None:
+    driver = RiskDriver(driver="driver", explanation="e", influences="both")
+    responses = {
+        "risk_identification_chain": RiskResponse(
+            risks=[
+                IdentifiedRisk(title=f"risk {i}", description="d") for i in range(risks)
+            ],
+            response_info=_info(),
+        ),
+        "risk_assessment_chain": AssessmentResponse(
+            probability=0.5, response_info=_info()
+        ),
+        "risk_drivers_chain": DriverResponse(drivers=[driver], response_info=_info()),
+        "risk_mitigations_chain": MitigationResponse(
+            mitigations=[Mitigation(driver="driver", mitigation="m", explanation="e")],
+            response_info=_info(),
+        ),
+        "correlation_tags_chain": CorrelationTagResponse(
+            correlation_tags=[], response_info=_info()
+        ),
+        "communicate_risks_chain": CommunicationResponse(
+            summary="summary", response_info=_info()
+        ),
+    }
+    for name, response in responses.items():
+        setattr(presentation, name, replay(name, response))
+
+
+async def run(concurrency: int) -> float:
+    presentation.settings.PRESENTATION_CONCURRENCY = concurrency
+    request = PresentationRequest(
+        business_context=BusinessContext(project_id="BENCH"),
+        audience=AudienceEnum.workshop,
+    )
+    start = time.perf_counter()
+    await presentation.prepare_presentation_output(request)
+    return time.perf_counter() - start
+
+
+def main(risks: int = 8) -> None:
+    install_fakes(risks)
+    baseline = asyncio.run(run(1))
+    print(f"{risks} risks, latencies scaled by {SCALE}")
+    print(f"{'concurrency':<14}{'wall clock':>12}{'speedup':>10}")
+    print(f"{'1 (baseline)':<14}{baseline:>11.2f}s{1:>9.1f}x")
+    for concurrency in (2, 5, 10):
+        elapsed = asyncio.run(run(concurrency))
+        print(f"{concurrency:<14}{elapsed:>11.2f}s{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
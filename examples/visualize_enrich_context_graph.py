@@ -13,22 +13,10 @@ To install the required dependencies:
 """
 
 from IPython.display import Image, display
-from riskgpt.models.common import BusinessContext
-from riskgpt.models.workflows.context import EnrichContextRequest
 from riskgpt.workflows.enrich_context import get_enrich_context_graph
 
-# Create a sample request
-request = EnrichContextRequest(
-    business_context=BusinessContext(
-        project_id="Sample Project",
-        project_description="A sample project for visualization",
-        domain_knowledge="sample domain",
-    ),
-    focus_keywords=["sample", "keywords"],
-)
-
-# Get the graph
-graph = get_enrich_context_graph(request)
+# Get the graph; the request is passed in the state when the graph is invoked
+graph = get_enrich_context_graph().compile()
 
 # Visualize the graph
 try:
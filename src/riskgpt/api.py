@@ -7,13 +7,18 @@ point for web search and document retrieval.
 
 from __future__ import annotations
 
+import asyncio
 from typing import List
 
-import logger
-
+from riskgpt.helpers.document_service import (
+    close_document_clients,
+    fetch_document_refs,
+)
 from riskgpt.helpers.search import search
+from riskgpt.logger import logger
 from riskgpt.models.common import BusinessContext
 from riskgpt.models.utils.search import SearchRequest, SearchResponse
+from riskgpt.storage.document_cache import get_document_cache
 
 
 def search_context(search_request: SearchRequest) -> SearchResponse:
@@ -26,18 +31,35 @@ def search_context(search_request: SearchRequest) -> SearchResponse:
     return search(search_request)
 
 
-def fetch_documents(context: BusinessContext) -> List[str]:
+async def afetch_documents(context: BusinessContext) -> List[str]:
     """Fetch document UUIDs relevant to the provided business context.
 
-    The real implementation will call the document microservice.  For now this
-    function returns a mocked list of UUIDs so callers can already integrate
-    against a stable interface.
+    The document service configured with ``DOCUMENT_SERVICE_URL`` is queried
+    over the shared connection pool of the running event loop. An empty list
+    is returned if the service is not configured or unavailable.
     """
 
     logger.info("Fetching relevant documents for project %s", context.project_id)
+    return await fetch_document_refs(context)
+
+
+def fetch_documents(context: BusinessContext) -> List[str]:
+    """Synchronous variant of :func:`afetch_documents`.
+
+    Must not be called from a running event loop; use
+    :func:`afetch_documents` there instead.
+    """
+
+    async def _fetch() -> List[str]:
+        try:
+            refs = await afetch_documents(context)
+            # Keep the prefetched documents in the cache for later excerpts
+            await get_document_cache().wait(refs)
+            return refs
+        finally:
+            await close_document_clients()
 
-    # TODO: Replace with real document service call
-    return ["doc-uuid-001", "doc-uuid-002"]
+    return asyncio.run(_fetch())
 
 
-__all__ = ["search_context", "fetch_documents"]
+__all__ = ["search_context", "fetch_documents", "afetch_documents"]
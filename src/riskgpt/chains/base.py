@@ -10,6 +10,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langsmith import traceable
 
 from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.budget import current_budget
 from riskgpt.helpers.circuit_breaker import openai_breaker, with_fallback
 from riskgpt.helpers.memory_factory import get_memory
 from riskgpt.helpers.misc import flatten_dict
@@ -107,7 +108,16 @@ class BaseChain:
     @with_fallback(_fallback_response)
     @traceable
     async def invoke(self, inputs: Dict[str, Any]):
-        """Invoke the underlying chain asynchronously."""
+        """Invoke the underlying chain asynchronously.
+
+        Within a workflow run with a budget, the call raises
+        :class:`~riskgpt.helpers.budget.BudgetExceededError` instead of calling
+        the model once the budget is exhausted.
+        """
+        budget = current_budget()
+        if budget is not None:
+            budget.check(self.prompt_name)
+
         with get_openai_callback() as cb:
             inputs = flatten_dict(inputs)
             inputs["system_prompt"] = load_system_prompt()
@@ -122,6 +132,8 @@ class BaseChain:
                 self.prompt_name or "prompt",
                 self.settings.OPENAI_MODEL_NAME,
             )
+        if budget is not None:
+            budget.record(result.response_info)
         return result
 
     async def create_response_info(self, cb, result):
@@ -1,12 +1,30 @@
+from typing import Callable, List, Optional, TypeVar
+
 from langchain_core.output_parsers import PydanticOutputParser
 
 from riskgpt.chains.base import BaseChain
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.concurrency import gather_bounded
+from riskgpt.helpers.extraction import estimate_tokens
 from riskgpt.helpers.prompt_loader import load_prompt
+from riskgpt.helpers.summarization import (
+    chunk_by_budget,
+    cited_numbers,
+    number_sources,
+    partition_key_points,
+)
+from riskgpt.logger import logger
+from riskgpt.models.base import ResponseInfo, combine_response_info
 from riskgpt.models.workflows.context import (
+    CitedKeyPointTextRequest,
+    CitedTextReduceRequest,
+    CitedTextResponse,
     KeyPointTextRequest,
     KeyPointTextResponse,
 )
 
+T = TypeVar("T")
+
 
 async def keypoint_text_chain(
     request: KeyPointTextRequest,
@@ -31,9 +49,189 @@ async def keypoint_text_chain(
     inputs = {
         "key_points": "\n".join(
             [
-                f"- {kp.topic.value}: {kp.content} {kp.source_url}"
+                f"- {kp.topic.value}: {kp.content} {'; '.join(kp.all_source_urls())}"
                 for kp in request.key_points
             ]
         )
     }
     return await chain.invoke(inputs)
+
+
+async def keypoint_partial_text_chain(
+    request: CitedKeyPointTextRequest,
+) -> CitedTextResponse:
+    """Summarize a group of key points citing sources with numbered markers."""
+    prompt_data = load_prompt("keypoint_text_partial")
+
+    parser = PydanticOutputParser(pydantic_object=CitedTextResponse)
+    chain = BaseChain(
+        prompt_template=prompt_data["template"],
+        parser=parser,
+        prompt_name="keypoint_text_partial",
+    )
+
+    return await chain.invoke({"key_points": request.format_key_points()})
+
+
+async def keypoint_reduce_text_chain(
+    request: CitedTextReduceRequest,
+) -> CitedTextResponse:
+    """Merge partial summaries into one text keeping their numbered citations."""
+    prompt_data = load_prompt("keypoint_text_reduce")
+
+    parser = PydanticOutputParser(pydantic_object=CitedTextResponse)
+    chain = BaseChain(
+        prompt_template=prompt_data["template"],
+        parser=parser,
+        prompt_name="keypoint_text_reduce",
+    )
+
+    return await chain.invoke({"partial_texts": request.format_partial_texts()})
+
+
+async def keypoint_final_text_chain(
+    request: CitedTextReduceRequest,
+) -> KeyPointTextResponse:
+    """Merge partial summaries into one text with Harvard-style citations.
+
+    The numbered citations of the partial summaries are replaced by
+    Harvard-style citations of the ``sources`` and a references section is
+    added, as in the output of :func:`keypoint_text_chain`.
+    """
+    prompt_data = load_prompt("keypoint_text_final")
+
+    parser = PydanticOutputParser(pydantic_object=KeyPointTextResponse)
+    chain = BaseChain(
+        prompt_template=prompt_data["template"],
+        parser=parser,
+        prompt_name="keypoint_text_final",
+    )
+
+    return await chain.invoke(
+        {
+            "partial_texts": request.format_partial_texts(),
+            "sources": request.format_sources(),
+        }
+    )
+
+
+def _raise_failures(results: List[T | BaseException]) -> List[T]:
+    """Raise the first failure of ``results``, or return the results."""
+    successes: List[T] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        successes.append(result)
+    return successes
+
+
+async def keypoint_text_map_reduce_chain(
+    request: KeyPointTextRequest,
+    on_partial: Optional[Callable[[KeyPointTextResponse], None]] = None,
+) -> KeyPointTextResponse:
+    """
+    Generate text from a large set of key points in a map-reduce fashion.
+
+    The key points are partitioned by topic into groups that fit the
+    ``SUMMARY_GROUP_TOKEN_BUDGET``. Every group is summarized concurrently with
+    numbered citations, and the partial summaries are merged in reduce passes
+    until the remaining texts fit the budget together. The final merge cites
+    the sources in Harvard style and adds the references, so the response has
+    the same format as that of :func:`keypoint_text_chain`.
+
+    ``on_partial`` is called with every partial summary as soon as it is
+    available; its citations still use the numbering across all groups.
+    """
+    settings = RiskGPTSettings()
+    budget = settings.SUMMARY_GROUP_TOKEN_BUDGET
+    limit = settings.SUMMARY_CONCURRENCY
+
+    source_numbers = number_sources(request.key_points)
+    sources = {number: url for url, number in source_numbers.items()}
+
+    async def summarize_group(group_request: CitedKeyPointTextRequest):
+        partial = await keypoint_partial_text_chain(group_request)
+        if on_partial is not None:
+            on_partial(
+                KeyPointTextResponse(
+                    text=partial.text,
+                    references=[
+                        f"[{n}] {sources[n]}"
+                        for n in cited_numbers(partial.text)
+                        if n in sources
+                    ],
+                    response_info=partial.response_info,
+                )
+            )
+        return partial
+
+    groups = partition_key_points(request.key_points, budget)
+    logger.info(
+        "Summarizing %d key points in %d groups",
+        len(request.key_points),
+        len(groups),
+    )
+
+    partials = _raise_failures(
+        await gather_bounded(
+            [
+                CitedKeyPointTextRequest(
+                    key_points=group, source_numbers=source_numbers
+                )
+                for group in groups
+            ],
+            summarize_group,
+            limit=limit,
+        )
+    )
+    response_info_list: List[ResponseInfo] = [p.response_info for p in partials]
+    texts = [p.text for p in partials]
+    if not texts:
+        return KeyPointTextResponse(
+            text="",
+            references=[],
+            response_info=combine_response_info(
+                response_info_list, prompt_name="keypoint_text_map_reduce"
+            ),
+        )
+    # Every source cited by a partial summary is referenced in the final text
+    cited = {
+        n: sources[n] for text in texts for n in cited_numbers(text) if n in sources
+    }
+
+    # Merge the partial texts in rounds of budget-sized batches until the
+    # remaining texts fit the final merge
+    while len(texts) > 1:
+        chunks = chunk_by_budget([estimate_tokens(t) for t in texts], budget)
+        if len(chunks) == 1:
+            break
+        if len(chunks) == len(texts):
+            # No two partials fit the budget together, merge them pairwise
+            chunks = [
+                list(range(i, min(i + 2, len(texts)))) for i in range(0, len(texts), 2)
+            ]
+        merge = [chunk for chunk in chunks if len(chunk) > 1]
+        reduced = _raise_failures(
+            await gather_bounded(
+                [
+                    CitedTextReduceRequest(partial_texts=[texts[i] for i in chunk])
+                    for chunk in merge
+                ],
+                keypoint_reduce_text_chain,
+                limit=limit,
+            )
+        )
+        response_info_list.extend(r.response_info for r in reduced)
+        merged = iter(r.text for r in reduced)
+        texts = [
+            next(merged) if len(chunk) > 1 else texts[chunk[0]] for chunk in chunks
+        ]
+
+    final = await keypoint_final_text_chain(
+        CitedTextReduceRequest(partial_texts=texts, sources=cited)
+    )
+    response_info_list.append(final.response_info)
+    final.response_info = combine_response_info(
+        response_info_list, prompt_name="keypoint_text_map_reduce"
+    )
+    return final
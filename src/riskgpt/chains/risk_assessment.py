@@ -1,8 +1,27 @@
+import math
+from typing import Dict, List
+
 from langchain_core.output_parsers import PydanticOutputParser
 
 from riskgpt.chains.base import BaseChain
-from riskgpt.helpers.prompt_loader import load_prompt
-from riskgpt.models.chains.assessment import AssessmentRequest, AssessmentResponse
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.concurrency import gather_bounded
+from riskgpt.helpers.extraction import estimate_tokens
+from riskgpt.helpers.prompt_loader import load_prompt, load_system_prompt
+from riskgpt.logger import logger
+from riskgpt.models.base import (
+    ResponseInfo,
+    combine_response_info,
+    default_response_info,
+)
+from riskgpt.models.chains.assessment import (
+    AssessmentRequest,
+    AssessmentResponse,
+    BatchAssessmentOutput,
+    BatchAssessmentRequest,
+    BatchAssessmentResponse,
+    RiskToAssess,
+)
 
 
 async def risk_assessment_chain(request: AssessmentRequest) -> AssessmentResponse:
@@ -19,3 +38,165 @@ async def risk_assessment_chain(request: AssessmentRequest) -> AssessmentRespons
 
     inputs = request.model_dump(mode="json", exclude_none=True)
     return await chain.invoke(inputs)
+
+
+async def _risk_assessment_batch(
+    request: BatchAssessmentRequest,
+) -> BatchAssessmentOutput:
+    """Assess all risks of the request in a single LLM call."""
+
+    prompt_data = load_prompt("risk_assessment_batch")
+
+    parser = PydanticOutputParser(pydantic_object=BatchAssessmentOutput)
+    chain = BaseChain(
+        prompt_template=prompt_data["template"],
+        parser=parser,
+        prompt_name="risk_assessment_batch",
+    )
+
+    inputs = request.model_dump(mode="json", exclude_none=True, exclude={"risks"})
+    inputs["risks"] = request.format_risks()
+    return await chain.invoke(inputs)
+
+
+def _split_response_info(info: ResponseInfo, parts: int) -> List[ResponseInfo]:
+    """Split the tokens and cost of a call evenly among its risks."""
+    tokens, remainder = divmod(info.consumed_tokens, parts)
+    return [
+        info.model_copy(
+            update={
+                "consumed_tokens": tokens + (1 if i < remainder else 0),
+                "total_cost": info.total_cost / parts,
+            }
+        )
+        for i in range(parts)
+    ]
+
+
+def _prompt_overhead(prompt_name: str, parser: PydanticOutputParser) -> int:
+    """Estimated tokens of a prompt without the risks to assess."""
+    return estimate_tokens(
+        load_system_prompt()
+        + load_prompt(prompt_name)["template"]
+        + parser.get_format_instructions()
+    )
+
+
+def batch_assessment_saves_tokens(request: BatchAssessmentRequest) -> bool:
+    """Return True if assessing the risks in batches needs fewer prompt tokens.
+
+    Every call repeats the system prompt, the business context, the
+    instructions and the format instructions. Batching sends them once per
+    ``ASSESSMENT_BATCH_SIZE`` risks; it is disabled with a batch size of 1.
+    """
+    size = RiskGPTSettings().ASSESSMENT_BATCH_SIZE
+    count = len(request.risks)
+    if size < 2 or count < 2:
+        return False
+
+    context = estimate_tokens(
+        request.business_context.model_dump_json() + request.document_excerpts
+    )
+    single = _prompt_overhead(
+        "risk_assessment", PydanticOutputParser(pydantic_object=AssessmentResponse)
+    )
+    batch = _prompt_overhead(
+        "risk_assessment_batch",
+        PydanticOutputParser(pydantic_object=BatchAssessmentOutput),
+    )
+    return math.ceil(count / size) * (batch + context) < count * (single + context)
+
+
+async def risk_assessment_batch_chain(
+    request: BatchAssessmentRequest,
+) -> BatchAssessmentResponse:
+    """Assess several risks sharing a business context in batched LLM calls.
+
+    The risks are sent in batches of up to ``ASSESSMENT_BATCH_SIZE`` risks.
+    Risks whose assessment is missing or malformed in the batched output, or
+    whose batch failed, are assessed individually with
+    :func:`risk_assessment_chain`; a risk whose individual assessment fails as
+    well gets an empty assessment with the error in its ``response_info``.
+    The tokens and cost of a batch are split evenly among its risks.
+    """
+
+    settings = RiskGPTSettings()
+    size = max(1, settings.ASSESSMENT_BATCH_SIZE)
+    batches = [request.risks[i : i + size] for i in range(0, len(request.risks), size)]
+
+    outputs = await gather_bounded(
+        batches,
+        lambda batch: _risk_assessment_batch(
+            request.model_copy(update={"risks": batch})
+        ),
+        limit=settings.ASSESSMENT_CONCURRENCY,
+    )
+
+    assessments: Dict[str, AssessmentResponse] = {}
+    shares: Dict[str, ResponseInfo] = {}
+    for batch, output in zip(batches, outputs):
+        if isinstance(output, BaseException):
+            if not isinstance(output, Exception):
+                raise output
+            logger.warning(
+                "Batched assessment of %d risks failed, assessing them individually: %s",
+                len(batch),
+                output,
+            )
+            continue
+
+        for risk, info in zip(
+            batch, _split_response_info(output.response_info, len(batch))
+        ):
+            shares[risk.risk_id] = info
+        ids = {risk.risk_id for risk in batch}
+        for item in output.assessments:
+            if item.risk_id in ids and item.risk_id not in assessments:
+                assessments[item.risk_id] = AssessmentResponse(
+                    **item.model_dump(exclude={"risk_id"}),
+                    document_refs=request.document_refs,
+                    response_info=shares[item.risk_id],
+                )
+
+    missing = [risk for risk in request.risks if risk.risk_id not in assessments]
+    if missing:
+        logger.info("Assessing %d risks individually", len(missing))
+
+    async def assess_individually(risk: RiskToAssess) -> AssessmentResponse:
+        return await risk_assessment_chain(request.single_request(risk))
+
+    results = await gather_bounded(
+        missing, assess_individually, limit=settings.ASSESSMENT_CONCURRENCY
+    )
+    for risk, result in zip(missing, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logger.error("Assessment of risk '%s' failed: %s", risk.risk_title, result)
+            result = AssessmentResponse(
+                response_info=default_response_info(
+                    prompt_name="risk_assessment",
+                    model_name=settings.OPENAI_MODEL_NAME,
+                    error=str(result) or type(result).__name__,
+                )
+            )
+        if risk.risk_id in shares:
+            info = combine_response_info(
+                [shares[risk.risk_id], result.response_info],
+                prompt_name="risk_assessment",
+            )
+            info.error = result.response_info.error
+            result.response_info = info
+        assessments[risk.risk_id] = result
+
+    ordered = {risk.risk_id: assessments[risk.risk_id] for risk in request.risks}
+    response = BatchAssessmentResponse(
+        assessments=ordered,
+        fallback_risk_ids=[risk.risk_id for risk in missing],
+    )
+    response.response_info = combine_response_info(
+        [a.response_info for a in ordered.values()],
+        prompt_name="risk_assessment_batch",
+        model_name=settings.OPENAI_MODEL_NAME,
+    )
+    return response
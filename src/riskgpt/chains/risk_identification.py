@@ -1,11 +1,66 @@
+from typing import List, Literal, Sequence
+
 from langchain_core.output_parsers import PydanticOutputParser
 
 from riskgpt.chains.base import BaseChain
+from riskgpt.config.settings import RiskGPTSettings
 from riskgpt.helpers.prompt_loader import load_prompt
-from riskgpt.models.chains.risk import RiskRequest, RiskResponse
+from riskgpt.helpers.similarity import best_fuzzy_matches
+from riskgpt.logger import logger
+from riskgpt.models.chains.risk import (
+    IdentifiedRisk,
+    Risk,
+    RiskRequest,
+    RiskResponse,
+)
+
+
+def filter_duplicate_risks(
+    risks: Sequence[IdentifiedRisk],
+    existing_risks: Sequence[Risk],
+    threshold: float,
+    handling: Literal["drop", "flag"] = "drop",
+) -> List[IdentifiedRisk]:
+    """Drop or flag identified risks that are near-duplicates of existing risks.
+
+    Risks are compared by the fuzzy similarity of their titles and of their
+    titles with descriptions; the higher of both counts. Flagged risks have
+    ``duplicate_of`` set to the id, or else the title, of the existing risk.
+    """
+    if not risks or not existing_risks:
+        return list(risks)
+
+    by_title = best_fuzzy_matches(
+        [risk.title for risk in risks], [risk.title for risk in existing_risks]
+    )
+    by_text = best_fuzzy_matches(
+        [f"{risk.title}. {risk.description}" for risk in risks],
+        [f"{risk.title}. {risk.description}" for risk in existing_risks],
+    )
+
+    kept: List[IdentifiedRisk] = []
+    for risk, title_match, text_match in zip(risks, by_title, by_text):
+        index, score = max(title_match, text_match, key=lambda match: match[1])
+        if index is None or score < threshold:
+            kept.append(risk)
+            continue
+        existing = existing_risks[index]
+        logger.info(
+            "Identified risk '%s' duplicates existing risk '%s' (%.2f)",
+            risk.title,
+            existing.title,
+            score,
+        )
+        if handling == "flag":
+            kept.append(
+                risk.model_copy(update={"duplicate_of": existing.id or existing.title})
+            )
+    return kept
 
 
 async def risk_identification_chain(request: RiskRequest) -> RiskResponse:
+    """Identify risks and drop or flag those duplicating the existing risks."""
+    settings = RiskGPTSettings()
     prompt_data = load_prompt("risk_identification")
 
     parser = PydanticOutputParser(pydantic_object=RiskResponse)
@@ -16,4 +71,17 @@ async def risk_identification_chain(request: RiskRequest) -> RiskResponse:
     )
 
     inputs = request.model_dump(mode="json", exclude_none=True)
-    return await chain.invoke(inputs)
+    if request.existing_risks and request.existing_risks_digest:
+        inputs["existing_risks"] = request.format_existing_risks(
+            settings.EXISTING_RISKS_DIGEST_CHARS
+        )
+    response = await chain.invoke(inputs)
+
+    if request.existing_risks and isinstance(response, RiskResponse):
+        response.risks = filter_duplicate_risks(
+            response.risks,
+            request.existing_risks,
+            settings.RISK_DUPLICATE_THRESHOLD,
+            request.duplicate_handling,
+        )
+    return response
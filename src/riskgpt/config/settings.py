@@ -1,4 +1,4 @@
-from typing import Literal, Optional
+from typing import Annotated, Dict, Literal, Optional
 
 from pydantic import Field, SecretStr, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -27,8 +27,79 @@ class RiskGPTSettings(BaseSettings):
     GOOGLE_API_KEY: Optional[SecretStr] = None
     TAVILY_API_KEY: Optional[SecretStr] = None
 
+    # Key point extraction settings
+    EXTRACTION_CONCURRENCY: int = Field(default=5, ge=1)
+    EXTRACTION_TIMEOUT: Optional[float] = Field(default=60.0, gt=0)
+    EXTRACTION_PACKING: bool = Field(default=False)
+    EXTRACTION_PACK_TOKEN_BUDGET: int = Field(default=1500, ge=1)
+
+    # Key point summarization settings
+    SUMMARY_MAP_REDUCE_THRESHOLD: Optional[int] = Field(default=6000, ge=1)
+    SUMMARY_GROUP_TOKEN_BUDGET: int = Field(default=2000, ge=1)
+    SUMMARY_CONCURRENCY: int = Field(default=5, ge=1)
+    KEYPOINT_DEDUP_THRESHOLD: Optional[float] = Field(default=None, gt=0, le=1)
+
+    # Incremental context enrichment, enabled by setting the SQLite database path
+    SOURCE_STORE_PATH: Optional[str] = None
+
+    # Persistent risk register, enabled by setting the SQLite database path
+    RISK_REGISTER_PATH: Optional[str] = None
+
+    # Workflow checkpointing settings
+    CHECKPOINT_BACKEND: str = Field(default="none")
+    CHECKPOINT_PATH: str = Field(default="riskgpt_checkpoints.db")
+    CHECKPOINT_TTL_HOURS: float = Field(default=168.0, gt=0)
+
+    # Maximum number of risks assessed concurrently by the workflows
+    ASSESSMENT_CONCURRENCY: int = Field(default=5, ge=1)
+    # Maximum number of chain calls in flight in the presentation workflow
+    PRESENTATION_CONCURRENCY: int = Field(default=5, ge=1)
+    # Monte Carlo simulation of the portfolio loss in presentations
+    SIMULATION_ITERATIONS: int = Field(default=10000, ge=1)
+    SIMULATION_CONFIDENCE: float = Field(default=0.95, gt=0, lt=1)
+    # Seed of the simulation; unset, checkpointed runs derive it from their run ID
+    SIMULATION_SEED: Optional[int] = None
+    # Correlation of simulated risks sharing a correlation tag, 0 disables it
+    SIMULATION_TAG_CORRELATION: float = Field(default=0.5, ge=0, le=1)
+    # Correlation of the risks of single tags, overriding the one above
+    SIMULATION_TAG_COEFFICIENTS: Dict[str, Annotated[float, Field(ge=0, le=1)]] = Field(
+        default_factory=dict
+    )
+    # Risks assessed in one batched call when cheaper, 1 disables batching
+    ASSESSMENT_BATCH_SIZE: int = Field(default=1, ge=1)
+
+    # Multi-category risk sweep settings
+    CATEGORY_CONCURRENCY: int = Field(default=5, ge=1)
+    RISK_DEDUP_THRESHOLD: float = Field(default=0.75, gt=0, le=1)
+
+    # Fuzzy similarity above which an identified risk duplicates an existing one
+    RISK_DUPLICATE_THRESHOLD: float = Field(default=0.7, gt=0, le=1)
+    # Characters of the digest of existing risks passed to the prompt
+    EXISTING_RISKS_DIGEST_CHARS: int = Field(default=4000, ge=0)
+
+    # Fraction of a workflow budget kept for the steps completing the response
+    BUDGET_RESERVE: float = Field(default=0.1, ge=0, lt=1)
+
     # Document service settings
     DOCUMENT_SERVICE_URL: Optional[str] = None
+    DOCUMENT_SERVICE_API_KEY: Optional[SecretStr] = None
+    DOCUMENT_SERVICE_TIMEOUT: float = Field(default=10.0, gt=0)
+    DOCUMENT_SERVICE_CONNECT_TIMEOUT: float = Field(default=5.0, gt=0)
+    DOCUMENT_SERVICE_MAX_CONNECTIONS: int = Field(default=10, ge=1)
+    # Documents kept in memory; a path adds a SQLite tier surviving restarts
+    DOCUMENT_CACHE_SIZE: int = Field(default=256, ge=1)
+    DOCUMENT_CACHE_PATH: Optional[str] = None
+    DOCUMENT_CACHE_TTL_HOURS: float = Field(default=24.0, gt=0)
+    # Characters of document excerpts passed to the chains
+    DOCUMENT_EXCERPT_CHARS: int = Field(default=2000, ge=0)
+
+    # Local document index, used instead of the document service if a path is set
+    DOCUMENT_INDEX_PATH: Optional[str] = None
+    DOCUMENT_INDEX_EMBEDDER: str = Field(default="hashing")
+    DOCUMENT_INDEX_DIMENSION: int = Field(default=1024, ge=8)
+    DOCUMENT_INDEX_MODE: Literal["exact", "ivf"] = Field(default="exact")
+    DOCUMENT_INDEX_IVF_LISTS: Optional[int] = Field(default=None, ge=1)
+    DOCUMENT_INDEX_IVF_PROBES: int = Field(default=4, ge=1)
 
     @field_validator("MEMORY_TYPE")
     @classmethod
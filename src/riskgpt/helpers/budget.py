@@ -0,0 +1,176 @@
+"""Token, cost and time budgets of workflow runs.
+
+A workflow opens a :class:`BudgetTracker` with :func:`track_budget` for the
+duration of a run. Every ``BaseChain`` call checks the tracker of the current
+run before it is made and records its consumption afterwards, so the budget is
+enforced centrally without passing it through every chain. Workflows ask
+:func:`budget_nearly_exhausted` before optional work to skip lower-priority
+sources or risks and keep the reserve for the steps that complete the response.
+Calls wrapped in :func:`before_deadline` are cancelled when the wall-clock
+deadline of the run approaches, so that a run returns on time with the results
+completed so far.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, List, Optional, TypeVar
+
+from riskgpt.logger import logger
+from riskgpt.models.base import ResponseInfo
+from riskgpt.models.common import WorkflowBudget
+
+T = TypeVar("T")
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a chain is called after the budget of the run is exhausted."""
+
+
+class BudgetTracker:
+    """Consumption of a workflow run measured against its budget."""
+
+    def __init__(
+        self,
+        budget: WorkflowBudget,
+        reserve: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.budget = budget
+        self.reserve = reserve
+        self._clock = clock
+        self.started = clock()
+        self.consumed_tokens = 0
+        self.total_cost = 0.0
+        self.skipped: List[str] = []
+
+    @property
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def usage(self) -> float:
+        """Return the largest used fraction of any of the limits."""
+        fractions = [0.0]
+        if self.budget.max_tokens is not None:
+            fractions.append(self.consumed_tokens / self.budget.max_tokens)
+        if self.budget.max_cost is not None:
+            fractions.append(self.total_cost / self.budget.max_cost)
+        if self.budget.max_seconds is not None:
+            fractions.append(self.elapsed / self.budget.max_seconds)
+        return max(fractions)
+
+    def seconds_left(self, keep_reserve: bool = False) -> Optional[float]:
+        """Return the seconds until the deadline, or None without a time limit.
+
+        With ``keep_reserve`` the seconds until the reserve starts are returned.
+        """
+        if self.budget.max_seconds is None:
+            return None
+        limit = self.budget.max_seconds
+        if keep_reserve:
+            limit *= 1.0 - self.reserve
+        return max(0.0, limit - self.elapsed)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.usage() >= 1.0
+
+    @property
+    def nearly_exhausted(self) -> bool:
+        return self.usage() >= 1.0 - self.reserve
+
+    @property
+    def partial(self) -> bool:
+        """Whether work was skipped because of the budget."""
+        return bool(self.skipped)
+
+    def record(self, info: ResponseInfo) -> None:
+        """Add the consumption of a chain call."""
+        self.consumed_tokens += info.consumed_tokens
+        self.total_cost += info.total_cost
+
+    def check(self, prompt_name: str = "") -> None:
+        """Raise :class:`BudgetExceededError` if the budget is exhausted."""
+        if self.exhausted:
+            self.skip(prompt_name or "prompt")
+            raise BudgetExceededError(
+                f"Budget exhausted after {self.consumed_tokens} tokens, "
+                f"{self.total_cost:.4f} USD and {self.elapsed:.1f} s; "
+                f"not calling '{prompt_name or 'prompt'}'"
+            )
+
+    def skip(self, what: str) -> None:
+        """Record work that was skipped to stay within the budget."""
+        logger.warning("Budget nearly exhausted, skipping %s", what)
+        self.skipped.append(what)
+
+    def cancel(self, what: str) -> None:
+        """Record work that was cancelled at the deadline of the run."""
+        logger.warning("Deadline of the run reached, cancelled %s", what)
+        self.skipped.append(what)
+
+
+_current_tracker: ContextVar[Optional[BudgetTracker]] = ContextVar(
+    "riskgpt_budget_tracker", default=None
+)
+
+
+def current_budget() -> Optional[BudgetTracker]:
+    """Return the budget tracker of the current workflow run, if any."""
+    return _current_tracker.get()
+
+
+@contextmanager
+def track_budget(
+    budget: Optional[WorkflowBudget], reserve: float = 0.1
+) -> Iterator[Optional[BudgetTracker]]:
+    """Track the budget of a workflow run within the ``with`` block.
+
+    Without a budget the tracker of an enclosing run, if any, stays active so
+    that nested workflows count against the budget of their caller.
+    """
+    if budget is None:
+        yield current_budget()
+        return
+
+    tracker = BudgetTracker(budget, reserve=reserve)
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+def budget_nearly_exhausted(what: str) -> bool:
+    """Return True and record the skip if the current budget is nearly exhausted.
+
+    Workflows call this before optional work such as extracting a source or
+    analysing another risk.
+    """
+    tracker = current_budget()
+    if tracker is None or not tracker.nearly_exhausted:
+        return False
+    tracker.skip(what)
+    return True
+
+
+async def before_deadline(
+    awaitable: Awaitable[T], what: str, keep_reserve: bool = True
+) -> Optional[T]:
+    """Await ``awaitable`` unless the deadline of the current run passes first.
+
+    If the run has a time limit and ``awaitable`` is still pending when the
+    reserve of the run starts - or at the deadline itself without
+    ``keep_reserve`` - it is cancelled, the cancellation is recorded and None
+    is returned. Steps completing the response pass ``keep_reserve=False``.
+    """
+    tracker = current_budget()
+    timeout = tracker.seconds_left(keep_reserve) if tracker is not None else None
+    if tracker is None or timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        tracker.cancel(what)
+        return None
@@ -0,0 +1,505 @@
+"""Checkpointers that allow failed or cancelled workflow runs to be resumed.
+
+Workflows compiled with a checkpointer store their state after every node
+keyed by a run ID. Running the workflow again with the same run ID resumes
+from the last completed node, so the outputs of chains that already
+completed are reused instead of being paid for again.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (created_at);
+"""
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """Checkpointer storing the workflow checkpoints in a SQLite database."""
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _tuple(
+        self, thread_id: str, checkpoint_ns: str, row: Sequence[Any]
+    ) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        with self._lock:
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+                "ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: list = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        if row is None:
+            return None
+        return self._tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: list = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (
+                checkpoint_ns := config["configurable"].get("checkpoint_ns")
+            ) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            item = self._tuple(thread_id, checkpoint_ns, row)
+            if filter and not all(
+                item.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, "
+                "checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                "metadata_type, metadata, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized,
+                    metadata_type,
+                    serialized_metadata,
+                    time.time(),
+                ),
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append(
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    type_,
+                    serialized,
+                    task_path,
+                )
+            )
+        # Special writes (errors, interrupts) replace earlier ones, regular
+        # writes of a task are only stored once
+        special = [row for row in rows if row[4] < 0]
+        regular = [row for row in rows if row[4] >= 0]
+        columns = (
+            "INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+            "channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT OR REPLACE {columns}", special)
+            self._conn.executemany(f"INSERT OR IGNORE {columns}", regular)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+
+    def prune(self, max_age: timedelta) -> int:
+        """Delete all runs whose last checkpoint is older than ``max_age``."""
+        cutoff = time.time() - max_age.total_seconds()
+        with self._lock:
+            expired = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id "
+                    "HAVING MAX(created_at) < ?",
+                    (cutoff,),
+                ).fetchall()
+            ]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+    # The async methods run the SQLite calls in a worker thread, so that the
+    # checkpoints written after every task do not block the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, max_age: timedelta) -> int:
+        return await asyncio.to_thread(self.prune, max_age)
+
+
+class MemoryCheckpointer(InMemorySaver):
+    """In-memory checkpointer that can prune expired runs."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.updated_at: Dict[str, float] = {}
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self.updated_at[config["configurable"]["thread_id"]] = time.time()
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.updated_at.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+    def prune(self, max_age: timedelta) -> int:
+        """Delete all runs whose last checkpoint is older than ``max_age``."""
+        cutoff = time.time() - max_age.total_seconds()
+        expired = [
+            thread_id
+            for thread_id, updated in self.updated_at.items()
+            if updated < cutoff
+        ]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+    async def aprune(self, max_age: timedelta) -> int:
+        return self.prune(max_age)
+
+
+# Mapping of checkpointer backend names to creator callables
+_CREATORS: Dict[str, Callable[[RiskGPTSettings], Optional[BaseCheckpointSaver]]] = {}
+_INSTANCES: Dict[str, Optional[BaseCheckpointSaver]] = {}
+
+
+def register_checkpointer(
+    name: str, creator: Callable[[RiskGPTSettings], Optional[BaseCheckpointSaver]]
+) -> None:
+    """Register a new checkpointer backend.
+
+    Parameters
+    ----------
+    name:
+        Identifier for the checkpointer backend.
+    creator:
+        Callable that accepts :class:`RiskGPTSettings` and returns a
+        checkpointer instance.
+    """
+
+    _CREATORS[name] = creator
+
+
+register_checkpointer("none", lambda _s: None)
+register_checkpointer("memory", lambda _s: MemoryCheckpointer())
+register_checkpointer("sqlite", lambda s: SQLiteCheckpointer(s.CHECKPOINT_PATH))
+
+
+def get_checkpointer(
+    settings: Optional[RiskGPTSettings] = None,
+) -> Optional[BaseCheckpointSaver]:
+    """Return the shared checkpointer configured by ``CHECKPOINT_BACKEND``."""
+
+    settings = settings or RiskGPTSettings()
+    backend = settings.CHECKPOINT_BACKEND
+    if backend not in _INSTANCES:
+        creator = _CREATORS.get(backend)
+        if creator is None:
+            available = ", ".join(sorted(_CREATORS))
+            raise ValueError(
+                f"Unsupported checkpointer '{backend}'. Available types: {available}"
+            )
+        _INSTANCES[backend] = creator(settings)
+    return _INSTANCES[backend]
+
+
+def with_checkpointer(app: Any, checkpointer: Optional[BaseCheckpointSaver]) -> Any:
+    """Return the compiled graph ``app`` storing its runs with ``checkpointer``.
+
+    The graph is not compiled again: the copy shares the nodes and channels
+    of ``app``, so workflows compile their graph once without a checkpointer
+    and nothing keeps the checkpointers of earlier runs alive.
+    """
+    if checkpointer is None:
+        return app
+    return app.copy(update={"checkpointer": checkpointer})
+
+
+async def _prepare_run(
+    app: Any,
+    inputs: Dict[str, Any],
+    run_id: Optional[str],
+    max_age: Optional[timedelta],
+    max_concurrency: Optional[int],
+) -> Tuple[Optional[Dict[str, Any]], RunnableConfig, Optional[Dict[str, Any]]]:
+    """Return the input and config of a run, and the result if it finished."""
+    config: RunnableConfig = {}
+    if max_concurrency is not None:
+        config["max_concurrency"] = max_concurrency
+    checkpointer = getattr(app, "checkpointer", None)
+    if run_id is None or not checkpointer:
+        return inputs, config, None
+
+    if max_age is not None and hasattr(checkpointer, "aprune"):
+        pruned = await checkpointer.aprune(max_age)
+        if pruned:
+            logger.info("Removed %d expired workflow runs", pruned)
+
+    config["configurable"] = {"thread_id": run_id}
+    snapshot = await app.aget_state(config)
+    if snapshot.next:
+        logger.info("Resuming run %s at %s", run_id, ", ".join(snapshot.next))
+        return None, config, None
+    if snapshot.values:
+        logger.info("Run %s already finished, returning its result", run_id)
+        return None, config, snapshot.values
+    return inputs, config, None
+
+
+async def run_with_checkpoint(
+    app: Any,
+    inputs: Dict[str, Any],
+    run_id: Optional[str] = None,
+    max_age: Optional[timedelta] = None,
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Invoke a compiled graph, resuming the run ``run_id`` if it did not finish.
+
+    Without a run ID or a checkpointer the graph is simply invoked. Otherwise
+    a finished run returns its stored result, an unfinished run resumes from
+    the last completed node and an unknown run starts from ``inputs``; of a
+    step that failed, only the nodes that did not complete run again.
+    Runs older than ``max_age`` are garbage-collected first.
+    ``max_concurrency`` limits the number of nodes running at the same time.
+    """
+
+    graph_input, config, result = await _prepare_run(
+        app, inputs, run_id, max_age, max_concurrency
+    )
+    if result is not None:
+        return result
+    return await app.ainvoke(graph_input, config)
+
+
+async def stream_with_checkpoint(
+    app: Any,
+    inputs: Dict[str, Any],
+    stream_mode: Sequence[str],
+    run_id: Optional[str] = None,
+    max_age: Optional[timedelta] = None,
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Stream a compiled graph like :func:`run_with_checkpoint` invokes it.
+
+    Yields ``(mode, chunk)`` pairs of the ``stream_mode`` list. A resumed run
+    only streams the nodes that run again; a finished run yields its stored
+    result as a single ``("values", result)`` pair.
+    """
+
+    graph_input, config, result = await _prepare_run(
+        app, inputs, run_id, max_age, max_concurrency
+    )
+    if result is not None:
+        yield "values", result
+        return
+    async for mode, chunk in app.astream(
+        graph_input, config, stream_mode=list(stream_mode)
+    ):
+        yield mode, chunk
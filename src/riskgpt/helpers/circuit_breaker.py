@@ -10,7 +10,7 @@ to degrade gracefully when external services are unavailable.
 """
 
 import functools
-from typing import Any, Callable, TypeVar
+from typing import Any, Awaitable, Callable, TypeVar
 
 import pybreaker
 
@@ -103,3 +103,25 @@ def with_fallback(
         return wrapper
 
     return decorator
+
+
+def async_breaker(
+    breaker: pybreaker.CircuitBreaker,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Decorator guarding a coroutine function with a circuit breaker.
+
+    Unlike decorating a coroutine function with the breaker directly, the
+    outcome of the awaited call is recorded, so failures count towards
+    opening the circuit. When the circuit is open, the call raises
+    ``pybreaker.CircuitBreakerError`` without being made.
+    """
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with breaker.calling():
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
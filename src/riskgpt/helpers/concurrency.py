@@ -0,0 +1,34 @@
+"""Helpers for running coroutines concurrently with bounded parallelism."""
+
+import asyncio
+from typing import Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def gather_bounded(
+    items: Iterable[T],
+    func: Callable[[T], Awaitable[R]],
+    *,
+    limit: int,
+    timeout: Optional[float] = None,
+) -> List[R | BaseException]:
+    """Apply ``func`` to all items concurrently with at most ``limit`` in flight.
+
+    Results are returned in the order of ``items`` regardless of completion
+    order. Exceptions raised by ``func`` - including :class:`asyncio.TimeoutError`
+    when a single call exceeds ``timeout`` seconds - are returned in place of
+    the result so that one failing item does not abort the others. The timeout
+    only starts once an item has acquired a slot of the semaphore.
+    """
+
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            if timeout is None:
+                return await func(item)
+            return await asyncio.wait_for(func(item), timeout)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
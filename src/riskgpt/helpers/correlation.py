@@ -0,0 +1,252 @@
+"""Correlation of risks sharing correlation tags.
+
+Risks sharing a tag are correlated with the coefficient of the tag; risks
+sharing several tags with the largest of their coefficients. Risks only
+correlate within the connected groups of risks linked by shared tags, so the
+correlation matrix is block diagonal and each block is handled on its own:
+
+- A group with a single tag is equicorrelated and sampled from one common
+  factor without any factorization.
+- A group of overlapping tags gets its correlation matrix, repaired to the
+  nearest correlation matrix if it is not positive semidefinite, and factored.
+- A group larger than ``MAX_DENSE_BLOCK`` risks is approximated by one factor
+  per tag, which is positive semidefinite by construction and avoids the cubic
+  cost of factoring its matrix.
+
+The correlated normal scores of the model reorder independently sampled losses
+in the simulation (Iman-Conover), so every marginal distribution is kept.
+"""
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from riskgpt.logger import logger
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.utils.simulation import SimulatedRisk
+
+# Groups of overlapping tags up to this size get their exact correlation matrix
+MAX_DENSE_BLOCK = 500
+
+
+def nearest_correlation(
+    matrix: np.ndarray, tolerance: float = 1e-8, max_iterations: int = 100
+) -> np.ndarray:
+    """Return the nearest correlation matrix in the Frobenius norm.
+
+    Alternates projections onto the positive semidefinite matrices and the
+    matrices with unit diagonal, with Dykstra's correction (Higham, 2002).
+    """
+    y = np.array(matrix, dtype=float)
+    correction = np.zeros_like(y)
+    for _ in range(max_iterations):
+        r = y - correction
+        values, vectors = np.linalg.eigh(r)
+        x = (vectors * np.clip(values, 0.0, None)) @ vectors.T
+        correction = x - r
+        previous = y
+        y = x.copy()
+        np.fill_diagonal(y, 1.0)
+        if np.linalg.norm(y - previous) <= tolerance * np.linalg.norm(y):
+            break
+    return y
+
+
+class _FactorBlock:
+    """Risks driven by common tag factors and their own noise."""
+
+    def __init__(self, columns: np.ndarray, loadings: np.ndarray):
+        self.columns = columns
+        self.loadings = loadings
+        self.noise = np.sqrt(np.clip(1.0 - (loadings**2).sum(axis=1), 0.0, None))
+
+    def matrix(self) -> np.ndarray:
+        matrix = self.loadings @ self.loadings.T
+        np.fill_diagonal(matrix, 1.0)
+        return matrix
+
+    def scores(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        factors = rng.standard_normal((self.loadings.shape[1], scenarios))
+        noise = rng.standard_normal((self.columns.size, scenarios))
+        return self.loadings @ factors + noise * self.noise[:, None]
+
+
+class _DenseBlock:
+    """Risks with a full correlation matrix, sampled through its factor."""
+
+    def __init__(self, columns: np.ndarray, matrix: np.ndarray):
+        self.columns = columns
+        values, vectors = np.linalg.eigh(matrix)
+        factor = vectors * np.sqrt(np.clip(values, 0.0, None))
+        # Clipping tiny negative eigenvalues shrinks the diagonal below one
+        self.factor = factor / np.linalg.norm(factor, axis=1, keepdims=True)
+
+    def matrix(self) -> np.ndarray:
+        return self.factor @ self.factor.T
+
+    def scores(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        return self.factor @ rng.standard_normal((self.columns.size, scenarios))
+
+
+class CorrelationModel:
+    """Block-diagonal correlation of the risks of a portfolio.
+
+    ``risk_ids`` lists the risks in the order of the model; risks without a
+    tag are independent and not part of any block.
+    """
+
+    def __init__(
+        self, risk_ids: Sequence[str], blocks: Sequence[_FactorBlock | _DenseBlock]
+    ):
+        self.risk_ids = list(risk_ids)
+        self.blocks = list(blocks)
+        self.correlated = (
+            np.sort(np.concatenate([block.columns for block in self.blocks]))
+            if self.blocks
+            else np.empty(0, dtype=int)
+        )
+        self._positions = [
+            np.searchsorted(self.correlated, block.columns) for block in self.blocks
+        ]
+
+    @classmethod
+    def from_tags(
+        cls,
+        risks: Sequence[SimulatedRisk],
+        tags: Sequence[CorrelationTag] = (),
+        coefficient: float = 0.5,
+        coefficients: Optional[Mapping[str, float]] = None,
+    ) -> "CorrelationModel":
+        """Correlate the risks sharing a correlation tag.
+
+        The tags are the ``CorrelationTag`` groups and the ``correlation_tag``
+        of the risks themselves. Risks of the same tag are correlated with
+        ``coefficients[tag]``, or ``coefficient`` for tags without one; the
+        coefficients must be between 0 and 1.
+        """
+        risk_ids = [risk.risk_id for risk in risks]
+        position = {risk_id: i for i, risk_id in enumerate(risk_ids)}
+        members: Dict[str, set[int]] = {}
+        for group in tags:
+            members.setdefault(group.tag, set()).update(
+                position[risk_id] for risk_id in group.risk_ids if risk_id in position
+            )
+        for i, risk in enumerate(risks):
+            if risk.correlation_tag:
+                members.setdefault(risk.correlation_tag, set()).add(i)
+
+        rho: Dict[str, float] = {}
+        for tag in members:
+            value = (coefficients or {}).get(tag, coefficient)
+            if not 0 <= value <= 1:
+                raise ValueError(f"Coefficient of tag '{tag}' must be between 0 and 1")
+            rho[tag] = value
+        groups = [
+            (tag, sorted(indices))
+            for tag, indices in members.items()
+            if len(indices) > 1 and rho[tag] > 0
+        ]
+
+        blocks: List[_FactorBlock | _DenseBlock] = []
+        for columns, block_tags in _connected_groups(groups):
+            blocks.append(_block(columns, block_tags, rho))
+        return cls(risk_ids, blocks)
+
+    def matrix(self) -> np.ndarray:
+        """Return the full correlation matrix in the order of ``risk_ids``."""
+        matrix = np.eye(len(self.risk_ids))
+        for block in self.blocks:
+            matrix[np.ix_(block.columns, block.columns)] = block.matrix()
+        return matrix
+
+    def scores(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        """Return correlated standard normal scores of the correlated risks.
+
+        The scores form a ``risks x scenarios`` matrix whose rows follow
+        ``correlated``, the sorted positions of the risks that belong to a
+        block.
+        """
+        scores = np.empty((self.correlated.size, scenarios))
+        for block, positions in zip(self.blocks, self._positions):
+            scores[positions] = block.scores(rng, scenarios)
+        return scores
+
+
+def _connected_groups(
+    groups: Sequence[Tuple[str, List[int]]],
+) -> List[Tuple[np.ndarray, List[Tuple[str, List[int]]]]]:
+    """Split tag groups into sets of risks linked by shared tags."""
+    parent: Dict[int, int] = {}
+
+    def find(i: int) -> int:
+        while parent.setdefault(i, i) != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for _, indices in groups:
+        root = find(indices[0])
+        for i in indices[1:]:
+            parent[find(i)] = root
+
+    components: Dict[int, List[Tuple[str, List[int]]]] = {}
+    for group in groups:
+        components.setdefault(find(group[1][0]), []).append(group)
+    result = []
+    for component in components.values():
+        columns = np.array(sorted({i for _, indices in component for i in indices}))
+        result.append((columns, component))
+    return result
+
+
+def _block(
+    columns: np.ndarray,
+    groups: Sequence[Tuple[str, List[int]]],
+    rho: Mapping[str, float],
+) -> _FactorBlock | _DenseBlock:
+    local = {column: i for i, column in enumerate(columns.tolist())}
+    if len(groups) == 1:
+        # A single tag: one common factor gives every pair its coefficient
+        tag = groups[0][0]
+        return _FactorBlock(columns, np.full((columns.size, 1), np.sqrt(rho[tag])))
+
+    if columns.size > MAX_DENSE_BLOCK:
+        # One factor per tag, shared among the tags of a risk
+        loadings = np.zeros((columns.size, len(groups)))
+        for k, (tag, indices) in enumerate(groups):
+            loadings[[local[i] for i in indices], k] = np.sqrt(rho[tag])
+        counts = (loadings > 0).sum(axis=1, keepdims=True)
+        return _FactorBlock(columns, loadings / np.sqrt(counts))
+
+    matrix = np.eye(columns.size)
+    for tag, indices in groups:
+        rows = [local[i] for i in indices]
+        sub = matrix[np.ix_(rows, rows)]
+        matrix[np.ix_(rows, rows)] = np.maximum(sub, rho[tag])
+    np.fill_diagonal(matrix, 1.0)
+    if np.linalg.eigvalsh(matrix)[0] < -1e-10:
+        logger.info(
+            "Correlation of %d risks with tags %s is not positive semidefinite, "
+            "using the nearest correlation matrix",
+            columns.size,
+            ", ".join(tag for tag, _ in groups),
+        )
+        matrix = nearest_correlation(matrix)
+    return _DenseBlock(columns, matrix)
+
+
+def iman_conover(losses: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Reorder every row of ``losses`` to the ranks of the same row of ``scores``.
+
+    Both are ``risks x scenarios`` matrices, so every sort runs over contiguous
+    memory. The scenario with the k-th smallest score gets the k-th smallest
+    loss, so the losses take on the rank correlation of the scores while
+    keeping their marginal distributions.
+    """
+    ranked = np.sort(losses, axis=1)
+    order = np.argsort(scores, axis=1)
+    # Flat positions of the scenarios in the order of their scores
+    order += np.arange(0, order.size, order.shape[1])[:, None]
+    reordered = np.empty(losses.shape)
+    reordered.ravel()[order.ravel()] = ranked.ravel()
+    return reordered
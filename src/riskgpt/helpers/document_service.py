@@ -0,0 +1,271 @@
+"""Async client of the document vector service.
+
+The client implements the ``/search`` and ``/get/{uuid}`` endpoints of
+``DomainDocumentVectorServiceSpecification.md``. All requests of an event loop
+share one keep-alive connection pool, calls are guarded by the document
+service circuit breaker, and batches of searches or documents are requested
+concurrently over the pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.circuit_breaker import async_breaker, document_service_breaker
+from riskgpt.helpers.concurrency import gather_bounded
+from riskgpt.logger import logger
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.documents import Document, DocumentMatch
+from riskgpt.storage.document_cache import get_document_cache
+from riskgpt.storage.document_index import DocumentIndex, get_document_index
+
+
+class DocumentServiceError(RuntimeError):
+    """Raised when the document service returns an unexpected response."""
+
+
+class DocumentNotFoundError(LookupError):
+    """Raised when the document service does not know a document."""
+
+
+# A missing document does not indicate that the service is failing
+document_service_breaker.add_excluded_exception(DocumentNotFoundError)
+
+
+def _parse_matches(data: Any) -> List[DocumentMatch]:
+    """Parse a ``/search`` response of UUIDs with optional scores and metadata."""
+    if isinstance(data, dict):
+        data = data.get("documents", data.get("results"))
+    if not isinstance(data, list):
+        raise DocumentServiceError("Unexpected document service response format")
+
+    matches = []
+    for item in data:
+        if isinstance(item, dict):
+            uuid = item.get("uuid") or item.get("id")
+            if not uuid:
+                logger.warning("Ignoring document match without UUID: %s", item)
+                continue
+            matches.append(
+                DocumentMatch(
+                    uuid=str(uuid),
+                    score=item.get("score"),
+                    metadata=item.get("metadata") or {},
+                )
+            )
+        else:
+            matches.append(DocumentMatch(uuid=str(item)))
+    return matches
+
+
+def _parse_document(uuid: str, data: Any) -> Document:
+    """Parse a ``/get/{uuid}`` response; unknown fields are kept as metadata."""
+    if not isinstance(data, dict):
+        raise DocumentServiceError(f"Unexpected response for document {uuid}")
+    fields = {"uuid", "title", "content", "text", "summary", "url", "metadata"}
+    metadata = dict(data.get("metadata") or {})
+    metadata.update({k: v for k, v in data.items() if k not in fields})
+    return Document(
+        uuid=str(data.get("uuid") or uuid),
+        title=data.get("title") or "",
+        content=data.get("content") or data.get("text") or data.get("summary") or "",
+        url=data.get("url"),
+        metadata=metadata,
+    )
+
+
+class DocumentServiceClient:
+    """Async client of the document service with a keep-alive connection pool.
+
+    Use :func:`get_document_client` to obtain the shared client of the running
+    event loop instead of creating clients per request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 10,
+        api_key: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else None
+        self.max_connections = max_connections
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            headers=headers,
+            transport=transport,
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    @async_breaker(document_service_breaker)
+    async def search(self, context: BusinessContext) -> List[DocumentMatch]:
+        """Return the documents relevant to a business context."""
+        logger.info("Searching documents for project %s", context.project_id)
+        resp = await self._client.post("/search", json=context.model_dump())
+        resp.raise_for_status()
+        return _parse_matches(resp.json())
+
+    @async_breaker(document_service_breaker)
+    async def get(self, uuid: str) -> Document:
+        """Return the metadata and content of a document."""
+        resp = await self._client.get(f"/get/{uuid}")
+        if resp.status_code == 404:
+            raise DocumentNotFoundError(f"Unknown document {uuid}")
+        resp.raise_for_status()
+        return _parse_document(uuid, resp.json())
+
+    async def search_many(
+        self, contexts: Sequence[BusinessContext]
+    ) -> List[List[DocumentMatch] | BaseException]:
+        """Search for several contexts concurrently over the shared pool.
+
+        Results keep the order of the contexts; a failed search is returned as
+        its exception.
+        """
+        return await gather_bounded(contexts, self.search, limit=self.max_connections)
+
+    async def get_many(self, uuids: Sequence[str]) -> Dict[str, Document]:
+        """Fetch several documents concurrently over the shared pool.
+
+        Documents that cannot be fetched are logged and left out.
+        """
+        unique = list(dict.fromkeys(uuids))
+        results = await gather_bounded(unique, self.get, limit=self.max_connections)
+        documents: Dict[str, Document] = {}
+        for uuid, result in zip(unique, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning("Fetching document %s failed: %s", uuid, result)
+                continue
+            documents[uuid] = result
+        return documents
+
+
+_ClientKey = Tuple[str, float, float, int, Optional[str]]
+# Shared clients per event loop and configuration
+_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, Dict[_ClientKey, DocumentServiceClient]
+] = weakref.WeakKeyDictionary()
+
+
+def get_document_client(
+    settings: Optional[RiskGPTSettings] = None,
+) -> Optional[DocumentServiceClient]:
+    """Return the shared document service client of the running event loop.
+
+    Connections cannot be shared across event loops, so one client is kept per
+    loop and configuration. Returns None if ``DOCUMENT_SERVICE_URL`` is unset.
+    """
+    settings = settings or RiskGPTSettings()
+    if not settings.DOCUMENT_SERVICE_URL:
+        return None
+
+    api_key = settings.DOCUMENT_SERVICE_API_KEY
+    key: _ClientKey = (
+        settings.DOCUMENT_SERVICE_URL,
+        settings.DOCUMENT_SERVICE_TIMEOUT,
+        settings.DOCUMENT_SERVICE_CONNECT_TIMEOUT,
+        settings.DOCUMENT_SERVICE_MAX_CONNECTIONS,
+        api_key.get_secret_value() if api_key else None,
+    )
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        client = DocumentServiceClient(
+            key[0],
+            timeout=key[1],
+            connect_timeout=key[2],
+            max_connections=key[3],
+            api_key=key[4],
+        )
+        clients[key] = client
+    return client
+
+
+async def close_document_clients() -> None:
+    """Close the document service clients of the running event loop."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+async def fetch_document_refs(context: BusinessContext) -> List[str]:
+    """Return the UUIDs of the documents relevant to a business context.
+
+    Without ``DOCUMENT_SERVICE_URL`` the local document index at
+    ``DOCUMENT_INDEX_PATH`` is searched instead. The content of the documents
+    is prefetched into the document cache in the background, see
+    :func:`document_excerpts`. Returns an empty list if neither is configured
+    or the service fails or its circuit is open, so that workflows continue
+    without documents.
+    """
+    client = get_document_client()
+    if client is None:
+        index = get_document_index()
+        if index is None:
+            logger.warning("Neither DOCUMENT_SERVICE_URL nor DOCUMENT_INDEX_PATH set")
+            return []
+        # The search and the SQLite lookups block, keep them off the event loop
+        return await asyncio.to_thread(_search_index, index, context)
+    try:
+        matches = await client.search(context)
+    except Exception as exc:
+        logger.warning("Document service unavailable, returning empty list: %s", exc)
+        return []
+    refs = [match.uuid for match in matches]
+    if refs:
+        get_document_cache().prefetch(refs, client.get_many)
+    return refs
+
+
+def _search_index(index: DocumentIndex, context: BusinessContext) -> List[str]:
+    """Search the local document index and cache the documents found."""
+    try:
+        matches = index.search_context(context)
+    except Exception as exc:
+        logger.warning("Document index search failed, returning empty list: %s", exc)
+        return []
+    refs = [match.uuid for match in matches]
+    cache = get_document_cache()
+    for document in index.get_many(refs).values():
+        cache.put(document)
+    return refs
+
+
+async def document_excerpts(
+    uuids: Sequence[str], max_chars: Optional[int] = None
+) -> str:
+    """Return excerpts of the documents for a prompt.
+
+    Waits for the prefetch of the documents started by
+    :func:`fetch_document_refs` but never requests documents itself, so that
+    no round-trip to the document service is added. Documents that are not
+    cached are left out.
+    """
+    if max_chars is None:
+        max_chars = RiskGPTSettings().DOCUMENT_EXCERPT_CHARS
+    if not uuids or max_chars <= 0:
+        return ""
+    cache = get_document_cache()
+    await cache.wait(uuids)
+    return cache.excerpts(uuids, max_chars)
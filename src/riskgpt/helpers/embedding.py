@@ -0,0 +1,143 @@
+"""Text embedders used by the local document index.
+
+The default :class:`HashingEmbedder` needs no model or network access: it
+hashes word unigrams and bigrams into a fixed number of dimensions. Other
+embedders can be registered with :func:`register_embedder` and selected with
+``DOCUMENT_INDEX_EMBEDDER``.
+"""
+
+import hashlib
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, List, Protocol, Sequence
+
+import numpy as np
+
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.similarity import tokenize
+
+
+class Embedder(Protocol):
+    """Maps texts to L2 normalised vectors of a fixed dimension."""
+
+    name: str
+    dimension: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return the vectors of the texts as ``float32`` matrix rows."""
+        ...
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+@lru_cache(maxsize=100_000)
+def _bucket(feature: str, dimension: int) -> int:
+    """Stable signed bucket of a feature; the sign is encoded in the lowest bit."""
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return (value >> 1) % dimension * 2 + (value & 1)
+
+
+class HashingEmbedder:
+    """Stateless embedder hashing word unigrams and bigrams.
+
+    Term counts are damped as ``1 + log(count)``; a random sign per feature
+    keeps hash collisions from adding up.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = 1024):
+        self.dimension = dimension
+
+    def _features(self, text: str) -> Counter:
+        tokens = tokenize(text)
+        return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                bucket = _bucket(feature, self.dimension)
+                sign = 1.0 if bucket & 1 else -1.0
+                matrix[row, bucket >> 1] += sign * (1.0 + math.log(count))
+        return _normalize(matrix)
+
+
+class OpenAIEmbedder:
+    """Embedder using the OpenAI embeddings API."""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-small",
+        dimension: int = 1024,
+    ):
+        from langchain_openai import OpenAIEmbeddings
+
+        self.dimension = dimension
+        self._embeddings = OpenAIEmbeddings(
+            model=model,
+            dimensions=dimension,
+            api_key=api_key,  # type: ignore[arg-type]
+        )
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        vectors: List[List[float]] = self._embeddings.embed_documents(list(texts))
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _openai_embedder(settings: RiskGPTSettings) -> Embedder:
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY must be set for the openai embedder")
+    return OpenAIEmbedder(
+        settings.OPENAI_API_KEY.get_secret_value(),
+        dimension=settings.DOCUMENT_INDEX_DIMENSION,
+    )
+
+
+# Mapping of embedder names to creator callables
+_CREATORS: Dict[str, Callable[[RiskGPTSettings], Embedder]] = {}
+
+
+def register_embedder(
+    name: str, creator: Callable[[RiskGPTSettings], Embedder]
+) -> None:
+    """Register a new embedder.
+
+    Parameters
+    ----------
+    name:
+        Identifier for the embedder.
+    creator:
+        Callable that accepts :class:`RiskGPTSettings` and returns an
+        embedder instance.
+    """
+
+    _CREATORS[name] = creator
+
+
+register_embedder("hashing", lambda s: HashingEmbedder(s.DOCUMENT_INDEX_DIMENSION))
+register_embedder("openai", _openai_embedder)
+
+
+def get_embedder(settings: RiskGPTSettings) -> Embedder:
+    """Return the embedder configured by ``DOCUMENT_INDEX_EMBEDDER``."""
+
+    creator = _CREATORS.get(settings.DOCUMENT_INDEX_EMBEDDER)
+    if creator is None:
+        available = ", ".join(sorted(_CREATORS))
+        raise ValueError(
+            f"Unsupported embedder '{settings.DOCUMENT_INDEX_EMBEDDER}'. "
+            f"Available types: {available}"
+        )
+    return creator(settings)
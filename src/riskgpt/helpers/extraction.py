@@ -1,13 +1,55 @@
+from typing import List
+
 from langchain_core.output_parsers import PydanticOutputParser
 
 from riskgpt.chains.base import BaseChain
 from riskgpt.helpers.prompt_loader import load_prompt
+from riskgpt.models.utils.search import Source
 from riskgpt.models.workflows.context import (
     ExtractKeyPointsRequest,
     ExtractKeyPointsResponse,
+    ExtractPackedKeyPointsRequest,
+    ExtractPackedKeyPointsResponse,
 )
 
 
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of tokens of a text (~4 characters per token)."""
+
+    return len(text) // 4 + 1
+
+
+def pack_sources(sources: List[Source], token_budget: int) -> List[List[Source]]:
+    """Bin-pack sources into groups whose estimated size fits the token budget.
+
+    Sources are placed first-fit in decreasing size order. A source that
+    exceeds the budget on its own ends up in a group of its own. Within each
+    group sources keep their original order and groups are ordered by their
+    first source, so the packing is deterministic.
+    """
+
+    sizes = [
+        estimate_tokens(ExtractKeyPointsRequest.from_source(source).content)
+        for source in sources
+    ]
+    order = sorted(range(len(sources)), key=lambda i: (-sizes[i], i))
+
+    bins: List[List[int]] = []
+    loads: List[int] = []
+    for i in order:
+        for b, load in enumerate(loads):
+            if load + sizes[i] <= token_budget:
+                bins[b].append(i)
+                loads[b] += sizes[i]
+                break
+        else:
+            bins.append([i])
+            loads.append(sizes[i])
+
+    groups = sorted(sorted(b) for b in bins)
+    return [[sources[i] for i in group] for group in groups]
+
+
 async def extract_key_points(
     request: ExtractKeyPointsRequest,
 ) -> ExtractKeyPointsResponse:
@@ -25,3 +67,28 @@ async def extract_key_points(
     inputs = request.model_dump(mode="json", exclude_none=True)
     result = await chain.invoke(inputs)
     return result
+
+
+async def extract_packed_key_points(
+    request: ExtractPackedKeyPointsRequest,
+) -> ExtractPackedKeyPointsResponse:
+    """Extract key points from several sources in a single LLM request.
+
+    Each returned point is tagged with the index of the source in
+    ``request.contents`` it was extracted from.
+    """
+
+    parser = PydanticOutputParser(pydantic_object=ExtractPackedKeyPointsResponse)
+    prompt_data = load_prompt("extract_key_points_packed")
+
+    chain = BaseChain(
+        prompt_template=prompt_data["template"],
+        parser=parser,
+        prompt_name=f"extract_{request.source_type}_key_points_packed",
+    )
+
+    inputs = {
+        "source_type": request.source_type,
+        "contents": request.format_contents(),
+    }
+    return await chain.invoke(inputs)
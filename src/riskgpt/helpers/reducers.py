@@ -0,0 +1,81 @@
+"""Reducer functions for LangGraph workflow state.
+
+Reducers merge the updates returned by graph nodes into the workflow state.
+They mutate the existing value in place so that merging costs time
+proportional to the size of the update rather than the size of the state.
+
+LangGraph applies the updates of a node to a shallow copy of the state to
+evaluate conditional edges, which would merge them twice into the shared
+value. Graphs using these reducers therefore route from within their nodes
+with ``Command(goto=...)`` instead of conditional edges.
+"""
+
+from typing import Callable, Dict, Hashable, Iterable, List, Set, TypeVar
+
+K = TypeVar("K")
+T = TypeVar("T")
+
+
+class _KeyedList(List[T]):
+    """List that remembers the identity keys of the items it contains."""
+
+    def __init__(self, items: Iterable[T], key: Callable[[T], Hashable]) -> None:
+        super().__init__()
+        self.seen: Set[Hashable] = set()
+        self.add_all(items, key)
+
+    def add_all(self, items: Iterable[T], key: Callable[[T], Hashable]) -> None:
+        for item in items:
+            item_key = key(item)
+            if item_key not in self.seen:
+                self.seen.add(item_key)
+                self.append(item)
+
+
+def extend_list(existing: List[T] | None, new: List[T]) -> List[T]:
+    """Extend the existing list in place with the new items."""
+    if existing is None:
+        return list(new)
+    existing.extend(new)
+    return existing
+
+
+def merge_dict(existing: Dict[K, T] | None, new: Dict[K, T]) -> Dict[K, T]:
+    """Update the existing mapping in place with the new items."""
+    if existing is None:
+        return dict(new)
+    existing.update(new)
+    return existing
+
+
+def merge_unique(
+    key: Callable[[T], Hashable],
+) -> Callable[[List[T] | None, List[T]], List[T]]:
+    """Create a reducer that appends new items whose identity key is unseen.
+
+    The keys of the merged items are kept alongside the list, so each merge
+    only costs time proportional to the number of new items.
+    """
+
+    def reducer(existing: List[T] | None, new: List[T]) -> List[T]:
+        if not isinstance(existing, _KeyedList):
+            existing = _KeyedList(existing or [], key)
+        existing.add_all(new, key)
+        return existing
+
+    return reducer
+
+
+def append_to_list(existing: List[T] | None, new: T) -> List[T]:
+    """Append a single item to the existing list in place."""
+    if existing is None:
+        return [new]
+    existing.append(new)
+    return existing
+
+
+def combine_bool_or(existing: bool | None, new: bool) -> bool:
+    """Combine two boolean values using logical OR."""
+    if existing is None:
+        return new
+    return existing or new
@@ -0,0 +1,139 @@
+"""Local text similarity helpers.
+
+TF-IDF vectors and cosine similarity group near-identical texts of a batch;
+token-set and character shingle similarity match short texts such as risk
+titles against a reference list.
+"""
+
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w\w+")
+
+# Words ignored by the token-set similarity
+STOP_WORDS = frozenset(
+    "an and are as at be by due for from in is it its may of on or that the "
+    "this to with".split()
+)
+
+SHINGLE_SIZE = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a text into lowercase word tokens of at least two characters."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def tfidf_matrix(texts: Sequence[str]) -> np.ndarray:
+    """Return the L2 normalised TF-IDF vectors of the texts as matrix rows.
+
+    The inverse document frequency is smoothed as ``log((1 + n) / (1 + df)) + 1``
+    so that terms occurring in every text still carry some weight.
+    """
+    vocabulary: Dict[str, int] = {}
+    documents = [tokenize(text) for text in texts]
+    for tokens in documents:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+
+    matrix = np.zeros((len(documents), len(vocabulary)))
+    for row, tokens in enumerate(documents):
+        for token in tokens:
+            matrix[row, vocabulary[token]] += 1.0
+
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+    matrix *= idf
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_similarity_matrix(texts: Sequence[str]) -> np.ndarray:
+    """Return the pairwise cosine similarities of the TF-IDF vectors of the texts."""
+    vectors = tfidf_matrix(texts)
+    return vectors @ vectors.T
+
+
+def similarity_clusters(texts: Sequence[str], threshold: float) -> List[List[int]]:
+    """Group near-identical texts and return the clusters as lists of indices.
+
+    In order of appearance, every text not yet assigned starts a cluster with
+    all unassigned texts at least ``threshold`` similar to it. Each cluster
+    starts with its central member, the one most similar to all others,
+    followed by the remaining members in order of appearance.
+    """
+    if not texts:
+        return []
+
+    similarity = cosine_similarity_matrix(texts)
+    unassigned = np.ones(len(texts), dtype=bool)
+    clusters: List[List[int]] = []
+    for i in range(len(texts)):
+        if not unassigned[i]:
+            continue
+        members = np.flatnonzero(unassigned & (similarity[i] >= threshold))
+        members = np.union1d(members, [i])
+        unassigned[members] = False
+
+        central = members[np.argmax(similarity[np.ix_(members, members)].sum(axis=1))]
+        clusters.append(
+            [int(central), *(int(member) for member in members if member != central)]
+        )
+    return clusters
+
+
+FuzzyFeatures = Tuple[FrozenSet[str], FrozenSet[str]]
+
+
+def fuzzy_features(text: str) -> FuzzyFeatures:
+    """Return the content words and character shingles of a text."""
+    tokens = tokenize(text)
+    joined = " ".join(tokens)
+    shingles = frozenset(
+        joined[i : i + SHINGLE_SIZE]
+        for i in range(max(1, len(joined) - SHINGLE_SIZE + 1))
+    )
+    return frozenset(t for t in tokens if t not in STOP_WORDS), shingles
+
+
+def fuzzy_similarity(a: FuzzyFeatures, b: FuzzyFeatures) -> float:
+    """Mean of the token-set and shingle similarity of two texts' features.
+
+    The token-set similarity is the share of the smaller set of content words
+    found in the other text, so reordered and shortened phrasings still match.
+    The shingle similarity is the Jaccard index of the character shingles and
+    tolerates inflections and typos.
+    """
+    (tokens_a, shingles_a), (tokens_b, shingles_b) = a, b
+    token_set = (
+        len(tokens_a & tokens_b) / min(len(tokens_a), len(tokens_b))
+        if tokens_a and tokens_b
+        else 0.0
+    )
+    union = len(shingles_a | shingles_b)
+    shingle = len(shingles_a & shingles_b) / union if union else 0.0
+    return (token_set + shingle) / 2
+
+
+def best_fuzzy_matches(
+    texts: Sequence[str], references: Sequence[str]
+) -> List[Tuple[Optional[int], float]]:
+    """Return the index and similarity of the most similar reference of each text.
+
+    The index is None if no reference is similar at all.
+    """
+    reference_features = [fuzzy_features(reference) for reference in references]
+    matches: List[Tuple[Optional[int], float]] = []
+    for text in texts:
+        features = fuzzy_features(text)
+        best: Tuple[Optional[int], float] = (None, 0.0)
+        for index, reference in enumerate(reference_features):
+            score = fuzzy_similarity(features, reference)
+            if score > best[1]:
+                best = (index, score)
+        matches.append(best)
+    return matches
@@ -0,0 +1,385 @@
+"""Monte Carlo simulation of the loss distribution of a risk portfolio.
+
+All risks are sampled at once with NumPy: the impacts and Bernoulli
+occurrences of the risks sharing a distribution are drawn as one matrix per
+block of scenarios. The scenarios are simulated in blocks of at most
+``BLOCK_ELEMENTS`` risk samples so that the memory stays bounded; only the
+portfolio loss of every scenario and the risk losses of the worst scenarios
+seen so far are kept, which is enough for the percentiles, the VaR, the CVaR
+and the contributions of the risks to it.
+"""
+
+import math
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from riskgpt.helpers.correlation import CorrelationModel, iman_conover
+from riskgpt.logger import logger
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.utils.simulation import (
+    DISTRIBUTION_PARAMETERS,
+    PortfolioSimulation,
+    RiskContribution,
+    SimulatedRisk,
+)
+
+# Risk samples per block of scenarios
+BLOCK_ELEMENTS = 1 << 20
+# Below this mean probability impacts are only drawn where the risks occur
+SPARSE_PROBABILITY = 0.5
+
+# Minimum and maximum of three-point estimates are read as the 5th and 95th
+# percentile when a normal or lognormal distribution is fitted to them
+_Z = 1.6448536269514722  # standard normal quantile of 0.95
+
+_ALIASES = {
+    "triangle": "triangular",
+    "beta-pert": "pert",
+    "betapert": "pert",
+    "beta_pert": "pert",
+    "gaussian": "normal",
+    "log-normal": "lognormal",
+    "log_normal": "lognormal",
+    "constant": "fixed",
+    "point": "fixed",
+}
+
+Shape = Tuple[int, ...]
+Sampler = Callable[[np.random.Generator, np.ndarray, Shape], np.ndarray]
+
+
+def _triangular(
+    rng: np.random.Generator, params: np.ndarray, shape: Shape
+) -> np.ndarray:
+    # Inverse CDF; unlike Generator.triangular it allows min == max
+    low, mode, high = params
+    width = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        split = np.where(width > 0, (mode - low) / width, 0.5)
+    u = rng.random(shape)
+    left = u < split
+    offset = np.sqrt(
+        np.where(left, u * (mode - low), (1.0 - u) * (high - mode)) * width
+    )
+    return np.where(left, low + offset, high - offset)
+
+
+def _pert(rng: np.random.Generator, params: np.ndarray, shape: Shape) -> np.ndarray:
+    low, mode, high = params
+    width = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(width > 0, (mode - low) / width, 0.5)
+    return low + width * rng.beta(1 + 4 * relative, 5 - 4 * relative, shape)
+
+
+def _normal(rng: np.random.Generator, params: np.ndarray, shape: Shape) -> np.ndarray:
+    mean, std = params
+    return mean + std * rng.standard_normal(shape)
+
+
+def _lognormal(
+    rng: np.random.Generator, params: np.ndarray, shape: Shape
+) -> np.ndarray:
+    mu, sigma = params
+    return np.exp(mu + sigma * rng.standard_normal(shape))
+
+
+def _fixed(rng: np.random.Generator, params: np.ndarray, shape: Shape) -> np.ndarray:
+    return np.broadcast_to(params[0], shape)
+
+
+SAMPLERS: Dict[str, Sampler] = {
+    "triangular": _triangular,
+    "pert": _pert,
+    "normal": _normal,
+    "lognormal": _lognormal,
+    "fixed": _fixed,
+}
+
+
+class PortfolioSampler:
+    """Draws the losses of all risks of a portfolio for blocks of scenarios.
+
+    The risks are reordered so that the risks sharing a distribution form a
+    contiguous block of columns; ``risks`` holds them in this order. For
+    groups of unlikely risks impacts are only drawn for the scenarios in which
+    a risk occurs.
+    """
+
+    def __init__(self, risks: Sequence[SimulatedRisk]):
+        groups: Dict[str, List[int]] = {}
+        for index, risk in enumerate(risks):
+            groups.setdefault(risk.distribution, []).append(index)
+        # Position of every risk in the order of the columns
+        self.order = np.array([i for indices in groups.values() for i in indices])
+        self.risks = [risks[i] for i in self.order]
+        self.groups: List[Tuple[Sampler, slice, np.ndarray, np.ndarray]] = []
+        start = 0
+        for name, indices in groups.items():
+            members = [risks[i] for i in indices]
+            params = np.array(
+                [
+                    [risk.parameters[p] for risk in members]
+                    for p in DISTRIBUTION_PARAMETERS[name]
+                ]
+            )
+            probability = np.array([risk.probability for risk in members])
+            columns = slice(start, start + len(members))
+            self.groups.append((SAMPLERS[name], columns, params, probability))
+            start += len(members)
+
+    def sample(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        """Return the losses of the risks as a ``scenarios x risks`` matrix."""
+        losses = np.empty((scenarios, len(self.risks)))
+        for sampler, columns, params, probability in self.groups:
+            shape = (scenarios, probability.size)
+            if probability.min() >= 1.0:
+                losses[:, columns] = sampler(rng, params, shape)
+                continue
+            occurs = rng.random(shape) < probability
+            if probability.mean() >= SPARSE_PROBABILITY:
+                losses[:, columns] = sampler(rng, params, shape) * occurs
+                continue
+            block = losses[:, columns]
+            block.fill(0.0)
+            # Risk of every occurrence in row-major order, as assigned below
+            risk = np.nonzero(occurs)[1]
+            block[occurs] = sampler(rng, params[:, risk], (risk.size,))
+        return losses
+
+
+class _WorstScenarios:
+    """Collects the risk losses of the ``size`` scenarios with the largest loss.
+
+    Candidates are buffered and only reduced to the worst ``size`` once the
+    buffer holds twice as many; scenarios below the smallest loss kept so far
+    are not buffered at all.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.threshold = -np.inf
+        self.totals: List[np.ndarray] = []
+        self.losses: List[np.ndarray] = []
+        self.buffered = 0
+
+    def add(self, totals: np.ndarray, losses: np.ndarray) -> None:
+        worst = min(self.size, totals.size)
+        candidates = np.argpartition(totals, totals.size - worst)[-worst:]
+        candidates = candidates[totals[candidates] > self.threshold]
+        self.totals.append(totals[candidates])
+        self.losses.append(losses[candidates])
+        self.buffered += candidates.size
+        if self.buffered >= 2 * self.size:
+            self._reduce()
+
+    def _reduce(self) -> None:
+        totals = np.concatenate(self.totals)
+        losses = np.concatenate(self.losses)
+        if totals.size > self.size:
+            keep = np.argpartition(totals, totals.size - self.size)[-self.size :]
+            totals, losses = totals[keep], losses[keep]
+            self.threshold = totals.min()
+        self.totals, self.losses = [totals], [losses]
+        self.buffered = totals.size
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the losses and the risk losses of the worst scenarios."""
+        self._reduce()
+        return self.totals[0], self.losses[0]
+
+
+def simulate_portfolio(
+    risks: Sequence[SimulatedRisk],
+    iterations: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    correlation: Optional[CorrelationModel] = None,
+) -> PortfolioSimulation:
+    """Simulate the portfolio loss of the risks.
+
+    The risks are independent unless a ``correlation`` model of the same risks
+    is given; the losses of the correlated risks are then reordered within
+    every block of scenarios to the ranks of correlated normal scores
+    (Iman-Conover), which keeps their marginal distributions.
+
+    The VaR is the ``confidence`` quantile of the portfolio loss and the CVaR
+    the mean loss of the worst ``1 - confidence`` of the scenarios. The tail
+    loss of a risk is its mean loss in these scenarios, so the tail losses of
+    all risks add up to the CVaR.
+    """
+    if iterations < 1:
+        raise ValueError("iterations must be at least 1")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+
+    rng = np.random.default_rng(seed)
+    sampler = PortfolioSampler(risks)
+    correlated = np.empty(0, dtype=int)
+    if correlation is not None:
+        if correlation.risk_ids != [risk.risk_id for risk in risks]:
+            raise ValueError("The correlation model must be built from the same risks")
+        # Columns of the correlated risks in the order of the model's scores
+        correlated = np.argsort(sampler.order)[correlation.correlated]
+    count = len(risks)
+    tail_size = max(1, math.ceil((1 - confidence) * iterations - 1e-9))
+    block = max(1, min(iterations, BLOCK_ELEMENTS // max(1, count)))
+
+    totals = np.empty(iterations)
+    sums = np.zeros(count)
+    tail = _WorstScenarios(tail_size)
+    for start in range(0, iterations, block):
+        scenarios = min(block, iterations - start)
+        losses = sampler.sample(rng, scenarios)
+        if correlation is not None and correlated.size:
+            losses[:, correlated] = iman_conover(
+                losses[:, correlated].T, correlation.scores(rng, scenarios)
+            ).T
+        block_totals = losses.sum(axis=1)
+        totals[start : start + scenarios] = block_totals
+        sums += losses.sum(axis=0)
+        tail.add(block_totals, losses)
+    tail_totals, tail_losses = tail.result()
+
+    p50, p80, p95 = np.percentile(totals, [50, 80, 95])
+    cvar = float(tail_totals.mean())
+    tail_means = tail_losses.mean(axis=0)
+    contributions = [
+        RiskContribution(
+            risk_id=risk.risk_id,
+            expected_loss=float(sums[i] / iterations),
+            tail_loss=float(tail_means[i]),
+            tail_share=float(tail_means[i] / cvar) if cvar else 0.0,
+        )
+        for i, risk in enumerate(sampler.risks)
+    ]
+    contributions.sort(key=lambda c: -c.tail_loss)
+    return PortfolioSimulation(
+        iterations=iterations,
+        confidence=confidence,
+        expected_loss=float(totals.mean()),
+        p50=float(p50),
+        p80=float(p80),
+        p95=float(p95),
+        var=float(np.quantile(totals, confidence)),
+        cvar=cvar,
+        contributions=contributions,
+    )
+
+
+def _distribution_name(name: Optional[str]) -> str:
+    name = (name or "triangular").strip().lower()
+    name = _ALIASES.get(name, name)
+    if name not in SAMPLERS:
+        logger.warning("Unknown distribution '%s', using triangular", name)
+        return "triangular"
+    return name
+
+
+def _three_point_parameters(
+    name: str, low: float, mode: float, high: float
+) -> Optional[Dict[str, float]]:
+    if name in ("triangular", "pert"):
+        return {"min": low, "mode": mode, "max": high}
+    if name == "normal":
+        return {"mean": mode, "std": (high - low) / (2 * _Z)}
+    if name == "lognormal":
+        if low <= 0:
+            return None
+        return {
+            "mu": (math.log(low) + math.log(high)) / 2,
+            "sigma": (math.log(high) - math.log(low)) / (2 * _Z),
+        }
+    return {"value": mode}
+
+
+def risk_from_assessment(
+    risk_id: str, assessment: AssessmentResponse
+) -> Optional[SimulatedRisk]:
+    """Return the simulated risk of a quantitative assessment, if it has one.
+
+    A fitted distribution is used if its parameters are complete; otherwise the
+    distribution is fitted to the minimum, most likely and maximum value, whose
+    minimum and maximum are read as the 5th and 95th percentile for normal and
+    lognormal distributions. The risk occurs with the assessed probability, or
+    always if the assessment has none.
+    """
+    quantitative = assessment.quantitative
+    if quantitative is None:
+        return None
+    probability = assessment.probability
+    if probability is None or not 0 <= probability <= 1:
+        probability = 1.0
+
+    fit = quantitative.distribution_fit
+    tag = fit.correlation_tag if fit is not None else None
+    if fit is not None and fit.parameters:
+        try:
+            return SimulatedRisk(
+                risk_id=risk_id,
+                distribution=_distribution_name(fit.name),  # type: ignore[arg-type]
+                parameters=fit.parameters,
+                probability=probability,
+                correlation_tag=tag,
+            )
+        except ValueError as exc:
+            logger.warning("Ignoring distribution fit of '%s': %s", risk_id, exc)
+
+    low, mode, high = (
+        quantitative.minimum,
+        quantitative.most_likely,
+        quantitative.maximum,
+    )
+    if low is None or high is None:
+        if mode is None:
+            return None
+        name, params = "fixed", {"value": mode}
+    else:
+        low, high = min(low, high), max(low, high)
+        if mode is None or not low <= mode <= high:
+            mode = (low + high) / 2
+        name = _distribution_name(quantitative.distribution)
+        fitted = _three_point_parameters(name, low, mode, high)
+        if fitted is None:
+            name, fitted = "triangular", {"min": low, "mode": mode, "max": high}
+        params = fitted
+    return SimulatedRisk(
+        risk_id=risk_id,
+        distribution=name,  # type: ignore[arg-type]
+        parameters=params,
+        probability=probability,
+        correlation_tag=tag,
+    )
+
+
+def simulate_assessments(
+    assessments: Sequence[Tuple[str, AssessmentResponse]],
+    iterations: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    tags: Sequence[CorrelationTag] = (),
+    coefficient: float = 0.0,
+    coefficients: Optional[Mapping[str, float]] = None,
+) -> Optional[PortfolioSimulation]:
+    """Simulate the portfolio of the assessed risks with quantitative estimates.
+
+    The risks sharing one of the ``tags`` or the correlation tag of their
+    distribution fit are correlated with ``coefficients[tag]``, or
+    ``coefficient`` for tags without one; with no positive coefficient the
+    risks are independent.
+    Risks without quantitative estimates are left out; without any such risk
+    None is returned.
+    """
+    risks = [
+        risk
+        for risk_id, assessment in assessments
+        if (risk := risk_from_assessment(risk_id, assessment)) is not None
+    ]
+    if not risks:
+        return None
+    correlation = None
+    if coefficient > 0 or any(value > 0 for value in (coefficients or {}).values()):
+        correlation = CorrelationModel.from_tags(risks, tags, coefficient, coefficients)
+    return simulate_portfolio(risks, iterations, confidence, seed, correlation)
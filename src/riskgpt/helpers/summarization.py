@@ -0,0 +1,108 @@
+"""Helpers for summarizing large key point sets."""
+
+import re
+from typing import Dict, Iterable, List, Sequence
+
+from riskgpt.helpers.extraction import estimate_tokens
+from riskgpt.helpers.similarity import similarity_clusters
+from riskgpt.models.workflows.context import KeyPoint, KeyPointClusters
+
+CITATION_PATTERN = re.compile(r"\[(\d+(?:\s*[,;]\s*\d+)*)\]")
+
+
+def key_point_tokens(key_point: KeyPoint) -> int:
+    """Estimate the prompt size of a key point including its citation marker."""
+
+    return estimate_tokens(key_point.content) + 5
+
+
+def number_sources(key_points: Iterable[KeyPoint]) -> Dict[str, int]:
+    """Number the source URLs of the key points in order of first appearance."""
+
+    numbers: Dict[str, int] = {}
+    for kp in key_points:
+        for url in kp.all_source_urls():
+            if url not in numbers:
+                numbers[url] = len(numbers) + 1
+    return numbers
+
+
+def chunk_by_budget(sizes: Sequence[int], token_budget: int) -> List[List[int]]:
+    """Split consecutive items into chunks whose summed size fits the budget.
+
+    Returns the item indices of each chunk. An item exceeding the budget on
+    its own ends up in a chunk of its own.
+    """
+
+    chunks: List[List[int]] = []
+    load = 0
+    for i, size in enumerate(sizes):
+        if not chunks or load + size > token_budget:
+            chunks.append([])
+            load = 0
+        chunks[-1].append(i)
+        load += size
+    return chunks
+
+
+def partition_key_points(
+    key_points: List[KeyPoint], token_budget: int
+) -> List[List[KeyPoint]]:
+    """Partition key points by topic into groups fitting the token budget.
+
+    Topics keep the order of their first key point and key points keep their
+    order within a topic, so key points of the same source stay together.
+    """
+
+    by_topic: Dict[str, List[KeyPoint]] = {}
+    for kp in key_points:
+        by_topic.setdefault(kp.topic.value, []).append(kp)
+
+    groups: List[List[KeyPoint]] = []
+    for topic_points in by_topic.values():
+        sizes = [key_point_tokens(kp) for kp in topic_points]
+        for chunk in chunk_by_budget(sizes, token_budget):
+            groups.append([topic_points[i] for i in chunk])
+    return groups
+
+
+def cluster_key_points(
+    key_points: List[KeyPoint], threshold: float
+) -> KeyPointClusters:
+    """Collapse near-identical key points into representative key points.
+
+    Key points are compared by the cosine similarity of their TF-IDF vectors.
+    In order of appearance, every key point not yet assigned starts a cluster
+    with all unassigned key points at least ``threshold`` similar to it. The
+    representative of a cluster is its member most similar to all others and
+    carries the source URLs of all members.
+    """
+
+    representatives: List[KeyPoint] = []
+    for cluster in similarity_clusters([kp.content for kp in key_points], threshold):
+        urls: List[str] = []
+        for member in cluster:
+            for url in key_points[member].all_source_urls():
+                if url not in urls:
+                    urls.append(url)
+        representatives.append(
+            key_points[cluster[0]].model_copy(
+                update={
+                    "source_url": urls[0] if urls else None,
+                    "supporting_urls": urls[1:],
+                }
+            )
+        )
+
+    return KeyPointClusters(key_points=representatives, original_count=len(key_points))
+
+
+def cited_numbers(text: str) -> List[int]:
+    """Return the citation numbers of a text in order of first appearance."""
+
+    numbers: List[int] = []
+    for match in CITATION_PATTERN.finditer(text):
+        for number in re.split(r"\s*[,;]\s*", match.group(1)):
+            if int(number) not in numbers:
+                numbers.append(int(number))
+    return numbers
@@ -4,7 +4,7 @@ Base models and common utilities for RiskGPT.
 This module contains the base models and common utilities used throughout the RiskGPT system.
 """
 
-from typing import Optional
+from typing import Iterable, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -19,6 +19,9 @@ class ResponseInfo(BaseModel):
     prompt_name: str
     model_name: str
     error: Optional[str] = None
+    partial: bool = False
+    # Key points per summarized key point if near-identical ones were clustered
+    compression_ratio: Optional[float] = None
 
 
 def default_response_info(
@@ -38,6 +41,28 @@ def default_response_info(
     )
 
 
+def combine_response_info(
+    infos: Iterable[ResponseInfo],
+    prompt_name: str,
+    model_name: Optional[str] = None,
+) -> ResponseInfo:
+    """Combine the ResponseInfo objects of several chain calls into one.
+
+    Tokens and costs are summed up and the result is partial if any of the
+    calls was. If no model name is given, the model name of the last call is used.
+    """
+    infos = list(infos)
+    return ResponseInfo(
+        consumed_tokens=sum(info.consumed_tokens for info in infos),
+        total_cost=sum(info.total_cost for info in infos),
+        prompt_name=prompt_name,
+        model_name=model_name
+        if model_name is not None
+        else (infos[-1].model_name if infos else ""),
+        partial=any(info.partial for info in infos),
+    )
+
+
 class BaseResponse(BaseModel):
     """Base class for all response models."""
 
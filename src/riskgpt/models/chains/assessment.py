@@ -4,10 +4,11 @@ Assessment models for RiskGPT.
 This module contains models for risk assessment.
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
 
+from riskgpt.logger import logger
 from riskgpt.models.base import BaseRequest, BaseResponse
 from riskgpt.models.common import BusinessContext, Dist
 
@@ -30,6 +31,10 @@ class AssessmentRequest(BaseRequest):
         default=None,
         description="References to document UUIDs from the document microservice",
     )
+    document_excerpts: str = Field(
+        default="",
+        description="Excerpts of the referenced documents passed to the prompt",
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -134,3 +139,107 @@ class AssessmentResponse(BaseResponse):
             }
         }
     )
+
+
+class RiskToAssess(BaseModel):
+    """A single risk of a batched assessment request."""
+
+    risk_id: str = Field(description="Identifier of the risk within the batch")
+    risk_title: str = Field(description="Title of the risk being assessed")
+    risk_description: str = Field(description="Risk description to assess")
+
+
+class BatchAssessmentRequest(BaseRequest):
+    """Input model for assessing several risks sharing a business context at once."""
+
+    business_context: BusinessContext = Field(
+        description="Business context information"
+    )
+    risks: List[RiskToAssess] = Field(description="Risks to assess")
+    document_refs: Optional[List[str]] = Field(
+        default=None,
+        description="References to document UUIDs from the document microservice",
+    )
+    document_excerpts: str = Field(
+        default="",
+        description="Excerpts of the referenced documents passed to the prompt",
+    )
+
+    def format_risks(self) -> str:
+        """Format the risks as blocks tagged with their ids for the prompt."""
+        return "\n\n".join(
+            f"[Risk {risk.risk_id}]\n"
+            f"  - Title: {risk.risk_title}\n"
+            f"  - Description: {risk.risk_description}"
+            for risk in self.risks
+        )
+
+    def single_request(self, risk: RiskToAssess) -> AssessmentRequest:
+        """Return the individual assessment request of one of the risks."""
+        return AssessmentRequest(
+            business_context=self.business_context,
+            risk_title=risk.risk_title,
+            risk_description=risk.risk_description,
+            document_refs=self.document_refs,
+            document_excerpts=self.document_excerpts,
+            language=self.language,
+        )
+
+
+class BatchAssessmentItem(BaseModel):
+    """Assessment of one risk of a batch, tagged with the id of the risk."""
+
+    risk_id: str = Field(description="Identifier of the assessed risk")
+    quantitative: Optional[QuantitativeAssessment] = Field(
+        default=None, description="Quantitative assessment details"
+    )
+    impact: Optional[float] = Field(
+        default=None, description="Impact score (0-1 or monetary value)"
+    )
+    probability: Optional[float] = Field(
+        default=None, description="Probability score (0-1)"
+    )
+    evidence: Optional[str] = Field(
+        default=None, description="Evidence supporting the assessment"
+    )
+    references: Optional[List[str]] = Field(
+        default=None, description="References used for the assessment"
+    )
+
+
+class BatchAssessmentOutput(BaseResponse):
+    """Parsed model output of a batched assessment.
+
+    Malformed assessments are dropped while parsing, so that only the affected
+    risks have to be assessed again individually.
+    """
+
+    assessments: List[BatchAssessmentItem] = Field(
+        default_factory=list, description="One assessment per risk"
+    )
+
+    @field_validator("assessments", mode="before")
+    @classmethod
+    def drop_malformed(cls, value: Any) -> Any:
+        if not isinstance(value, list):
+            return value
+        items = []
+        for item in value:
+            try:
+                items.append(BatchAssessmentItem.model_validate(item))
+            except ValidationError as e:
+                logger.warning("Dropping malformed assessment: %s", e)
+        return items
+
+
+class BatchAssessmentResponse(BaseResponse):
+    """Output model of a batched assessment with one assessment per risk id."""
+
+    assessments: Dict[str, AssessmentResponse] = Field(
+        description="Assessments keyed by risk id"
+    )
+    fallback_risk_ids: List[str] = Field(
+        default_factory=list,
+        description="Risks that were assessed individually because the batched "
+        "output for them was missing or malformed",
+    )
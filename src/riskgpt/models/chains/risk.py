@@ -4,12 +4,14 @@ Risk models for RiskGPT.
 This module contains models for risk identification and representation.
 """
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
+from pydantic.json_schema import SkipJsonSchema
 
 from riskgpt.models.base import BaseRequest, BaseResponse
-from riskgpt.models.common import BusinessContext
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.common import BusinessContext, WorkflowBudget
 
 
 class Risk(BaseModel):
@@ -61,10 +63,46 @@ class RiskRequest(BaseRequest):
     existing_risks: Optional[List[Risk]] = Field(
         default=None, description="List of existing risks to consider"
     )
+    existing_risks_digest: bool = Field(
+        default=False,
+        description="Pass only the titles of the existing risks to the prompt",
+    )
+    duplicate_handling: Literal["drop", "flag"] = Field(
+        default="drop",
+        description="Whether identified risks similar to an existing risk are "
+        "dropped or returned with duplicate_of set",
+    )
     document_refs: Optional[List[str]] = Field(
         default=None,
         description="References to document UUIDs from the document microservice",
     )
+    document_excerpts: str = Field(
+        default="",
+        description="Excerpts of the referenced documents passed to the prompt",
+    )
+    budget: Optional[WorkflowBudget] = Field(
+        default=None,
+        description="Token, cost and time limits of the risk workflow; with a "
+        "time limit, steps still running near the deadline are cancelled",
+    )
+
+    def format_existing_risks(self, max_chars: int) -> str:
+        """Format the titles of the existing risks as a list for the prompt.
+
+        The list is cut off after ``max_chars`` characters with a note on the
+        number of risks left out.
+        """
+        lines: List[str] = []
+        used = 0
+        risks = self.existing_risks or []
+        for risk in risks:
+            line = f"- {risk.title}"
+            if used + len(line) > max_chars:
+                lines.append(f"- ... and {len(risks) - len(lines)} more")
+                break
+            lines.append(line)
+            used += len(line) + 1
+        return "\n".join(lines)
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -88,6 +126,11 @@ class IdentifiedRisk(BaseModel):
     reference: Optional[str] = Field(
         default=None, description="Reference to the source of the risk information"
     )
+    # Set locally after the identification, hence not part of the LLM schema
+    duplicate_of: SkipJsonSchema[Optional[str]] = Field(
+        default=None,
+        description="Id or title of the existing risk this risk duplicates",
+    )
 
 
 class RiskResponse(BaseResponse):
@@ -104,6 +147,12 @@ class RiskResponse(BaseResponse):
         default=None,
         description="References to document UUIDs from the document microservice",
     )
+    # Set by the risk workflow, hence not part of the LLM schema
+    assessments: SkipJsonSchema[Optional[List[AssessmentResponse]]] = Field(
+        default=None,
+        description="Assessments of the risks in the order of risks; a failed "
+        "assessment has its error in its response_info",
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -111,3 +111,23 @@ class Prompt(BaseModel):
             }
         }
     )
+
+
+class WorkflowBudget(BaseModel):
+    """Limits on what a single workflow run may spend."""
+
+    max_tokens: Optional[int] = Field(
+        default=None, ge=1, description="Maximum number of tokens consumed by the run"
+    )
+    max_cost: Optional[float] = Field(
+        default=None, gt=0, description="Maximum cost of the run in USD"
+    )
+    max_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Wall-clock deadline of the run in seconds"
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {"max_tokens": 50000, "max_cost": 0.25, "max_seconds": 120.0}
+        }
+    )
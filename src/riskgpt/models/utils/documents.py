@@ -0,0 +1,57 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class DocumentMatch(BaseModel):
+    """A document returned by the ``/search`` endpoint of the document service."""
+
+    uuid: str = Field(description="UUID of the document")
+    score: Optional[float] = Field(
+        default=None, description="Relevance score of the document, if available"
+    )
+    metadata: Dict[str, Any] = Field(
+        default_factory=dict, description="Additional metadata of the match"
+    )
+
+
+class Document(BaseModel):
+    """A document returned by the ``/get/{uuid}`` endpoint of the document service."""
+
+    uuid: str = Field(description="UUID of the document")
+    title: str = Field(default="", description="Title of the document")
+    content: str = Field(
+        default="", description="Text or content summary of the document"
+    )
+    url: Optional[str] = Field(default=None, description="Link to the document")
+    metadata: Dict[str, Any] = Field(
+        default_factory=dict, description="Additional metadata of the document"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "uuid": "doc-uuid-001",
+                "title": "Maintenance history 2022",
+                "content": "Summary of all maintenance events of production line A.",
+                "url": "https://documents.example.com/doc-uuid-001",
+                "metadata": {"project_id": "ACME-MFG-2023"},
+            }
+        }
+    }
+
+
+class DocumentInput(BaseModel):
+    """A document or document fragment to add to the document index."""
+
+    content: str = Field(description="Text of the document")
+    title: str = Field(default="", description="Title of the document")
+    url: Optional[str] = Field(default=None, description="Link to the document")
+    metadata: Dict[str, Any] = Field(
+        default_factory=dict, description="Additional metadata of the document"
+    )
+    uuid: Optional[str] = Field(
+        default=None,
+        description="UUID of the document; a new one is assigned if not given, "
+        "an existing document with the same UUID is replaced",
+    )
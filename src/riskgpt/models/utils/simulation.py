@@ -0,0 +1,110 @@
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+DistributionName = Literal["triangular", "pert", "normal", "lognormal", "fixed"]
+
+# Parameters required by each distribution of a simulated risk
+DISTRIBUTION_PARAMETERS: Dict[str, tuple[str, ...]] = {
+    "triangular": ("min", "mode", "max"),
+    "pert": ("min", "mode", "max"),
+    "normal": ("mean", "std"),
+    "lognormal": ("mu", "sigma"),
+    "fixed": ("value",),
+}
+
+
+class SimulatedRisk(BaseModel):
+    """A risk of a portfolio simulation: an impact distribution and its probability."""
+
+    risk_id: str = Field(description="ID of the risk")
+    distribution: DistributionName = Field(
+        description="Distribution of the impact if the risk occurs"
+    )
+    parameters: Dict[str, float] = Field(
+        description="Parameters of the distribution: min, mode and max for "
+        "triangular and PERT, mean and std for normal, mu and sigma of the "
+        "underlying normal for lognormal, value for fixed impacts"
+    )
+    probability: float = Field(
+        default=1.0, ge=0, le=1, description="Probability that the risk occurs"
+    )
+    correlation_tag: Optional[str] = Field(
+        default=None, description="Tag of the risks correlated with this risk"
+    )
+
+    @model_validator(mode="after")
+    def check_parameters(self) -> "SimulatedRisk":
+        missing = [
+            name
+            for name in DISTRIBUTION_PARAMETERS[self.distribution]
+            if name not in self.parameters
+        ]
+        if missing:
+            raise ValueError(
+                f"{self.distribution} distribution of risk '{self.risk_id}' "
+                f"requires {', '.join(missing)}"
+            )
+        params = self.parameters
+        if self.distribution in ("triangular", "pert") and not (
+            params["min"] <= params["mode"] <= params["max"]
+        ):
+            raise ValueError(
+                f"Risk '{self.risk_id}' requires min <= mode <= max, got {params}"
+            )
+        for name in ("std", "sigma"):
+            if params.get(name, 0.0) < 0:
+                raise ValueError(f"Risk '{self.risk_id}' requires {name} >= 0")
+        return self
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "risk_id": "RISK-001",
+                "distribution": "pert",
+                "parameters": {"min": 50000.0, "mode": 100000.0, "max": 200000.0},
+                "probability": 0.3,
+            }
+        }
+    }
+
+
+class RiskContribution(BaseModel):
+    """Contribution of a risk to the portfolio loss."""
+
+    risk_id: str = Field(description="ID of the risk")
+    expected_loss: float = Field(description="Mean loss of the risk")
+    tail_loss: float = Field(
+        description="Mean loss of the risk in the scenarios beyond the VaR; the "
+        "tail losses of all risks add up to the CVaR"
+    )
+    tail_share: float = Field(description="Share of the risk in the CVaR")
+
+
+class PortfolioSimulation(BaseModel):
+    """Loss distribution of a portfolio of risks from a Monte Carlo simulation."""
+
+    iterations: int = Field(description="Number of simulated scenarios")
+    confidence: float = Field(description="Confidence level of VaR and CVaR")
+    expected_loss: float = Field(description="Mean portfolio loss")
+    p50: float = Field(description="Median portfolio loss")
+    p80: float = Field(description="80th percentile of the portfolio loss")
+    p95: float = Field(description="95th percentile of the portfolio loss")
+    var: float = Field(description="Value at risk at the confidence level")
+    cvar: float = Field(
+        description="Conditional value at risk: mean loss of the scenarios "
+        "beyond the VaR"
+    )
+    contributions: List[RiskContribution] = Field(
+        default_factory=list,
+        description="Contributions of the risks, ordered by their tail loss",
+    )
+
+    def format_summary(self) -> str:
+        """Format the key figures as one line of a quantitative summary."""
+        level = f"{self.confidence:.0%}"
+        return (
+            f"Portfolio loss: P50={self.p50:,.0f}, P80={self.p80:,.0f}, "
+            f"P95={self.p95:,.0f}, VaR{level}={self.var:,.0f}, "
+            f"CVaR{level}={self.cvar:,.0f}"
+        )
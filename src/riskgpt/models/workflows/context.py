@@ -1,9 +1,9 @@
-from typing import List, Optional
+from typing import Annotated, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from riskgpt.models.base import BaseResponse
-from riskgpt.models.common import BusinessContext
+from riskgpt.models.common import BusinessContext, WorkflowBudget
 from riskgpt.models.enums import TopicEnum
 from riskgpt.models.utils.search import Source
 
@@ -14,6 +14,15 @@ class KeyPoint(BaseModel):
     content: str
     topic: TopicEnum
     source_url: Optional[str] = None
+    supporting_urls: List[str] = Field(
+        default_factory=list,
+        description="Further sources making the same statement",
+    )
+
+    def all_source_urls(self) -> List[str]:
+        """Return the source URL followed by the supporting URLs."""
+        urls = [self.source_url] if self.source_url else []
+        return urls + [url for url in self.supporting_urls if url not in urls]
 
 
 class ExtractKeyPointsRequest(BaseModel):
@@ -76,12 +85,63 @@ class ExtractKeyPointsResponse(BaseResponse):
     )
 
 
+class PackedKeyPoint(BaseModel):
+    """Key point tagged with the index of the packed source it stems from."""
+
+    source_index: int
+    content: str
+
+
+class ExtractPackedKeyPointsRequest(BaseModel):
+    """Input model for extracting key points from several sources at once."""
+
+    source_type: str
+    contents: List[str]
+
+    @classmethod
+    def from_sources(cls, sources: List[Source]) -> "ExtractPackedKeyPointsRequest":
+        """Create an ExtractPackedKeyPointsRequest from a list of Source objects."""
+        return ExtractPackedKeyPointsRequest(
+            source_type=sources[0].type if sources else "",
+            contents=[
+                ExtractKeyPointsRequest.from_source(source).content
+                for source in sources
+            ],
+        )
+
+    def format_contents(self) -> str:
+        """Format the contents as numbered source blocks for the prompt."""
+        return "\n\n".join(
+            f"[Source {index}]\n{content}"
+            for index, content in enumerate(self.contents)
+        )
+
+
+class ExtractPackedKeyPointsResponse(BaseResponse):
+    """Model for key points extracted from several packed sources."""
+
+    points: List[PackedKeyPoint] = []
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "points": [
+                    {"source_index": 0, "content": "Key point 1"},
+                    {"source_index": 0, "content": "Key point 2"},
+                    {"source_index": 1, "content": "Key point 3"},
+                ],
+            }
+        }
+    )
+
+
 class EnrichContextRequest(BaseModel):
     """Input model for external context enrichment."""
 
     business_context: BusinessContext
     focus_keywords: Optional[List[str]] = None
     time_horizon_months: Optional[int] = 12
+    budget: Optional[WorkflowBudget] = None
 
     def create_search_query(self) -> str:
         """Create a search query based on the business context and focus keywords."""
@@ -103,6 +163,20 @@ class KeyPointTextRequest(BaseModel):
     key_points: List[KeyPoint]
 
 
+class KeyPointClusters(BaseModel):
+    """Representative key points of clusters of near-identical key points."""
+
+    key_points: List[KeyPoint]
+    original_count: int
+
+    @property
+    def compression_ratio(self) -> float:
+        """Number of original key points per representative key point."""
+        if not self.key_points:
+            return 1.0
+        return self.original_count / len(self.key_points)
+
+
 class KeyPointTextResponse(BaseResponse):
     """Output model containing text generated from key points with Harvard-style citations."""
 
@@ -113,3 +187,114 @@ class KeyPointTextResponse(BaseResponse):
         """Format the output text with references."""
         formatted_references = "\n".join(self.references)
         return f"{self.text}\n\nReferences:\n{formatted_references}"
+
+
+class CitedKeyPointTextRequest(BaseModel):
+    """Request for a partial summary of key points with numbered citations."""
+
+    key_points: List[KeyPoint]
+    source_numbers: Dict[str, int] = Field(
+        description="Citation number of every source URL"
+    )
+
+    def format_key_points(self) -> str:
+        """Format the key points prefixed with the citation numbers of their sources."""
+        lines = []
+        for kp in self.key_points:
+            numbers = [
+                str(self.source_numbers[url])
+                for url in kp.all_source_urls()
+                if url in self.source_numbers
+            ]
+            marker = f"[{', '.join(numbers)}] " if numbers else ""
+            lines.append(f"- {marker}{kp.topic.value}: {kp.content}")
+        return "\n".join(lines)
+
+
+class CitedTextReduceRequest(BaseModel):
+    """Request for merging partial summaries with numbered citations."""
+
+    partial_texts: List[str]
+    sources: Dict[int, str] = Field(
+        default_factory=dict,
+        description="Source URL of every citation number, used by the final "
+        "merge to cite the sources in Harvard style",
+    )
+
+    def format_partial_texts(self) -> str:
+        """Format the partial summaries as numbered blocks for the prompt."""
+        return "\n\n".join(
+            f"[Summary {index + 1}]\n{text}"
+            for index, text in enumerate(self.partial_texts)
+        )
+
+    def format_sources(self) -> str:
+        """Format the sources as a list of citation numbers and URLs."""
+        return "\n".join(
+            f"[{number}] {url}" for number, url in sorted(self.sources.items())
+        )
+
+
+class CitedTextResponse(BaseResponse):
+    """Text citing its sources with numbered markers such as [1] or [2, 5]."""
+
+    text: str
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "text": "Interest rates remain high [1], while regulation tightens [2, 3].",
+            }
+        }
+    )
+
+
+class SearchCompletedEvent(BaseModel):
+    """Event emitted when the search of a topic has completed."""
+
+    type: Literal["search_completed"] = "search_completed"
+    topic: TopicEnum
+    result_count: int
+    success: bool
+
+
+class SourceAdmittedEvent(BaseModel):
+    """Event emitted for every new source admitted to the enrichment."""
+
+    type: Literal["source_admitted"] = "source_admitted"
+    source: Source
+
+
+class KeyPointsExtractedEvent(BaseModel):
+    """Event emitted when the key points of a batch of sources were extracted."""
+
+    type: Literal["key_points_extracted"] = "key_points_extracted"
+    topic: TopicEnum
+    source_urls: List[str]
+    key_points: List[KeyPoint]
+
+
+class PartialSummaryEvent(BaseModel):
+    """Event emitted for every partial summary of a large key point set."""
+
+    type: Literal["partial_summary"] = "partial_summary"
+    summary: KeyPointTextResponse
+
+
+class FinalResponseEvent(BaseModel):
+    """Event emitted with the final response of the enrichment."""
+
+    type: Literal["final_response"] = "final_response"
+    response: EnrichContextResponse
+
+
+EnrichContextEvent = Annotated[
+    Union[
+        SearchCompletedEvent,
+        SourceAdmittedEvent,
+        KeyPointsExtractedEvent,
+        PartialSummaryEvent,
+        FinalResponseEvent,
+    ],
+    Field(discriminator="type"),
+]
@@ -4,13 +4,14 @@ Presentation models for RiskGPT.
 This module contains models for presentation-oriented risk summaries.
 """
 
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from riskgpt.models.base import BaseRequest, BaseResponse
-from riskgpt.models.common import BusinessContext
+from riskgpt.models.common import BusinessContext, WorkflowBudget
 from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.utils.simulation import PortfolioSimulation
 
 
 class PresentationRequest(BaseRequest):
@@ -23,6 +24,11 @@ class PresentationRequest(BaseRequest):
     focus_areas: Optional[List[str]] = Field(
         default=None, description="Specific areas to focus on in the presentation"
     )
+    budget: Optional[WorkflowBudget] = Field(
+        default=None,
+        description="Token, cost and time limits of the run; lower-priority risks "
+        "are skipped when the budget runs low",
+    )
 
 
 class PresentationResponse(BaseResponse):
@@ -53,3 +59,102 @@ class PresentationResponse(BaseResponse):
     appendix: Optional[str] = Field(
         default=None, description="Additional technical details for appendix"
     )
+    portfolio_simulation: Optional[PortfolioSimulation] = Field(
+        default=None,
+        description="Simulated loss distribution of the risks with quantitative "
+        "assessments",
+    )
+    missing_sections: List[str] = Field(
+        default_factory=list,
+        description="Parts of the analysis that were skipped or cancelled to stay "
+        "within the budget or deadline of the run",
+    )
+
+
+class MultiAudiencePresentationRequest(BaseRequest):
+    """Input model for presentations for several audiences from one analysis."""
+
+    business_context: BusinessContext = Field(
+        description="Business context information"
+    )
+    audiences: List[AudienceEnum] = Field(
+        min_length=1, description="Target audiences of the presentations"
+    )
+    focus_areas: Optional[List[str]] = Field(
+        default=None, description="Specific areas to focus on in the presentations"
+    )
+    budget: Optional[WorkflowBudget] = Field(
+        default=None,
+        description="Token, cost and time limits of the run; lower-priority risks "
+        "are skipped when the budget runs low",
+    )
+
+
+class MultiAudiencePresentationResponse(BaseResponse):
+    """Presentations for several audiences sharing one analysis.
+
+    The ``response_info`` of each presentation covers the shared analysis and
+    its own summary; the ``response_info`` of this response covers the whole
+    run.
+    """
+
+    presentations: Dict[AudienceEnum, PresentationResponse] = Field(
+        description="Presentation for each audience"
+    )
+
+
+class AudiencePolicy(BaseModel):
+    """What the presentation for an audience shows and hence needs to analyse."""
+
+    max_risks: Optional[int] = Field(
+        default=None,
+        description="Number of highest-ranked risks shown; drivers, mitigations "
+        "and correlation tags are only identified for these",
+    )
+    correlation: bool = Field(
+        default=True, description="Whether correlation tags are identified"
+    )
+    chart_placeholders: List[str] = Field(
+        default_factory=lambda: ["risk_overview_chart"],
+        description="Charts suggested for the presentation",
+    )
+    open_questions: Optional[List[str]] = Field(
+        default_factory=list, description="Open questions for the audience"
+    )
+    appendix_section: Optional[str] = Field(
+        default=None, description="Section added to the appendix"
+    )
+
+
+AUDIENCE_POLICIES: Dict[AudienceEnum, AudiencePolicy] = {
+    AudienceEnum.executive: AudiencePolicy(
+        max_risks=3,
+        correlation=False,
+        chart_placeholders=["executive_overview_chart"],
+        open_questions=None,
+    ),
+    AudienceEnum.workshop: AudiencePolicy(
+        open_questions=["Discuss mitigation priorities"]
+    ),
+    AudienceEnum.risk_internal: AudiencePolicy(appendix_section="[Model parameters]"),
+    AudienceEnum.audit: AudiencePolicy(appendix_section="[Audit trail]"),
+    AudienceEnum.regulator: AudiencePolicy(appendix_section="[Compliance mapping]"),
+    AudienceEnum.project_owner: AudiencePolicy(appendix_section="[Project milestones]"),
+    AudienceEnum.investor: AudiencePolicy(appendix_section="[Financial impact]"),
+    AudienceEnum.operations: AudiencePolicy(appendix_section="[KRI dashboard]"),
+}
+
+
+def audience_policy(audience: AudienceEnum) -> AudiencePolicy:
+    """Return the policy of an audience; audiences without one show everything."""
+    return AUDIENCE_POLICIES.get(audience, AudiencePolicy())
+
+
+def combined_audience_policy(audiences: Iterable[AudienceEnum]) -> AudiencePolicy:
+    """Return a policy analysing everything that any of the audiences sees."""
+    policies = [audience_policy(audience) for audience in audiences]
+    limits = [policy.max_risks for policy in policies if policy.max_risks is not None]
+    return AudiencePolicy(
+        max_risks=max(limits) if limits and len(limits) == len(policies) else None,
+        correlation=any(policy.correlation for policy in policies),
+    )
@@ -0,0 +1,75 @@
+"""
+Risk sweep models for RiskGPT.
+
+This module contains models for building a risk register across all risk
+categories of a project.
+"""
+
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from riskgpt.models.base import BaseRequest, BaseResponse, ResponseInfo
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.risk import Risk
+from riskgpt.models.common import BusinessContext
+
+
+class RiskSweepRequest(BaseRequest):
+    """Input model for the multi-category risk sweep."""
+
+    business_context: BusinessContext = Field(
+        description="Business context information"
+    )
+    existing_categories: Optional[List[str]] = Field(
+        default=None, description="List of existing categories to consider"
+    )
+    max_risks_per_category: Optional[int] = Field(
+        default=5,
+        description="Maximum number of risks to identify per category",
+        ge=1,
+        le=20,
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "business_context": {
+                    "project_id": "CRM-2023",
+                    "project_description": "Implementation of a new CRM system",
+                },
+                "existing_categories": ["Technical", "Organizational"],
+                "max_risks_per_category": 5,
+            }
+        }
+    )
+
+
+class RiskRegisterEntry(BaseModel):
+    """A unique risk of the register with its assessment."""
+
+    risk: Risk = Field(description="The risk, with the category it is filed under")
+    assessment: Optional[AssessmentResponse] = Field(
+        default=None, description="Assessment of the risk"
+    )
+    duplicate_categories: List[str] = Field(
+        default_factory=list,
+        description="Other categories in which a near-identical risk was identified",
+    )
+
+
+class RiskSweepResponse(BaseResponse):
+    """Output model containing the consolidated risk register."""
+
+    categories: List[str] = Field(description="Risk categories that were swept")
+    risks: List[RiskRegisterEntry] = Field(
+        description="Unique risks across all categories, forming the register"
+    )
+    duplicates_removed: int = Field(
+        default=0, description="Number of near-identical risks merged into others"
+    )
+    category_costs: Dict[str, ResponseInfo] = Field(
+        default_factory=dict,
+        description="Tokens and cost of identifying and assessing the risks of "
+        "each category; a failed identification carries its error",
+    )
@@ -0,0 +1,212 @@
+"""Two-tier cache of the documents of the document service.
+
+Documents are kept in an in-memory LRU and, if a path is configured, in a
+SQLite database so that they survive restarts. Documents are fetched once:
+concurrent requests for the same UUIDs wait for the fetch already in flight,
+so that prefetching right after ``/search`` and reading excerpts later in a
+workflow cause a single round-trip per document.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.logger import logger
+from riskgpt.models.utils.documents import Document
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    uuid TEXT PRIMARY KEY,
+    document TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+"""
+
+DocumentLoader = Callable[[List[str]], Awaitable[Dict[str, Document]]]
+
+
+class DocumentCache:
+    """LRU cache of documents in memory with an optional SQLite disk tier.
+
+    ``max_entries`` documents are kept in memory; documents evicted from memory
+    are still found on disk. Documents older than ``ttl`` are fetched again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        path: Optional[str] = None,
+        ttl: Optional[timedelta] = None,
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[datetime, Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _expired(self, fetched_at: datetime, now: datetime) -> bool:
+        return self.ttl is not None and now - fetched_at > self.ttl
+
+    def get(self, uuid: str, now: Optional[datetime] = None) -> Optional[Document]:
+        """Return a cached document from memory or disk, or None."""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            entry = self._memory.get(uuid)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(uuid)
+                    return entry[1]
+                del self._memory[uuid]
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT document, fetched_at FROM documents WHERE uuid = ?", (uuid,)
+            ).fetchone()
+        if row is None:
+            return None
+        fetched_at = datetime.fromisoformat(row[1])
+        if self._expired(fetched_at, now):
+            return None
+        document = Document.model_validate_json(row[0])
+        self._remember(uuid, document, fetched_at)
+        return document
+
+    def put(self, document: Document, now: Optional[datetime] = None) -> None:
+        """Store a document in memory and on disk."""
+        fetched_at = now or datetime.now(timezone.utc)
+        self._remember(document.uuid, document, fetched_at)
+        if self._conn is not None:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (uuid, document, fetched_at) "
+                    "VALUES (?, ?, ?)",
+                    (document.uuid, document.model_dump_json(), fetched_at.isoformat()),
+                )
+
+    def _remember(self, uuid: str, document: Document, fetched_at: datetime) -> None:
+        with self._lock:
+            self._memory[uuid] = (fetched_at, document)
+            self._memory.move_to_end(uuid)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _in_flight(self, uuids: Iterable[str]) -> Dict[str, asyncio.Task]:
+        """Return the fetches of the running event loop for the given UUIDs."""
+        loop = asyncio.get_running_loop()
+        return {
+            uuid: self._pending[uuid]
+            for uuid in uuids
+            if uuid in self._pending and self._pending[uuid].get_loop() is loop
+        }
+
+    async def wait(self, uuids: Iterable[str]) -> None:
+        """Wait for the fetches in flight of the given UUIDs without starting any."""
+        tasks = set(self._in_flight(uuids).values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _schedule(self, uuids: List[str], loader: DocumentLoader) -> Set[asyncio.Task]:
+        """Start loading the missing documents and return all fetches to wait for."""
+        pending = self._in_flight(uuids)
+        tasks = set(pending.values())
+        missing = [
+            uuid for uuid in uuids if uuid not in pending and self.get(uuid) is None
+        ]
+        if missing:
+            task = asyncio.create_task(self._load(missing, loader))
+            for uuid in missing:
+                self._pending[uuid] = task
+            tasks.add(task)
+        return tasks
+
+    async def fetch(
+        self, uuids: Iterable[str], loader: DocumentLoader
+    ) -> Dict[str, Document]:
+        """Return the documents of the UUIDs, loading the missing ones once.
+
+        Documents that are neither cached nor in flight are loaded with a
+        single ``loader`` call. Documents that cannot be loaded are left out.
+        """
+        uuids = list(dict.fromkeys(uuids))
+        tasks = self._schedule(uuids, loader)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        documents = {}
+        for uuid in uuids:
+            document = self.get(uuid)
+            if document is not None:
+                documents[uuid] = document
+        return documents
+
+    async def _load(self, uuids: List[str], loader: DocumentLoader) -> None:
+        try:
+            documents = await loader(uuids)
+            for document in documents.values():
+                self.put(document)
+            logger.info("Cached %d of %d documents", len(documents), len(uuids))
+        except Exception as exc:
+            logger.warning("Fetching %d documents failed: %s", len(uuids), exc)
+        finally:
+            for uuid in uuids:
+                if self._pending.get(uuid) is asyncio.current_task():
+                    del self._pending[uuid]
+
+    def prefetch(self, uuids: Iterable[str], loader: DocumentLoader) -> None:
+        """Start loading the missing documents in the background.
+
+        The fetch is registered immediately, so that :meth:`wait` and
+        :meth:`fetch` called afterwards wait for it instead of loading again.
+        """
+        self._schedule(list(dict.fromkeys(uuids)), loader)
+
+    def excerpts(self, uuids: Iterable[str], max_chars: int) -> str:
+        """Format excerpts of the cached documents for a prompt.
+
+        Only cached documents are used; the characters are split evenly among
+        them. Returns an empty string if none of the documents is cached.
+        """
+        documents = [d for d in (self.get(uuid) for uuid in uuids) if d is not None]
+        if not documents:
+            return ""
+        per_document = max(1, max_chars // len(documents))
+        blocks = []
+        for document in documents:
+            text = " ".join(document.content.split())
+            if len(text) > per_document:
+                text = text[:per_document].rsplit(" ", 1)[0] + " …"
+            blocks.append(f"[{document.uuid}] {document.title or 'Untitled'}: {text}")
+        return "\n".join(blocks)
+
+
+@lru_cache(maxsize=None)
+def _document_cache(
+    max_entries: int, path: Optional[str], ttl_hours: float
+) -> DocumentCache:
+    return DocumentCache(max_entries, path, timedelta(hours=ttl_hours))
+
+
+def get_document_cache(settings: Optional[RiskGPTSettings] = None) -> DocumentCache:
+    """Return the shared document cache of the configured size, path and TTL."""
+    settings = settings or RiskGPTSettings()
+    return _document_cache(
+        settings.DOCUMENT_CACHE_SIZE,
+        settings.DOCUMENT_CACHE_PATH,
+        settings.DOCUMENT_CACHE_TTL_HOURS,
+    )
@@ -0,0 +1,407 @@
+"""Embeddable vector index of domain documents.
+
+The index implements the operations of the domain document vector service
+(``/vectorize``, ``/search`` and ``/get/{uuid}``) in process. Vectors are kept
+in a memory-mapped ``float32`` matrix, the documents in a SQLite database next
+to it. Searches are either exact or, in ``ivf`` mode, restricted to the
+vectors of the clusters closest to the query.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import uuid as uuid_lib
+from functools import lru_cache
+from typing import Dict, Iterator, List, Literal, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.embedding import Embedder, HashingEmbedder, get_embedder
+from riskgpt.logger import logger
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.documents import Document, DocumentInput, DocumentMatch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    row INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    document TEXT NOT NULL
+);
+"""
+
+DATABASE_FILE = "documents.db"
+VECTORS_FILE = "vectors.f32"
+
+INITIAL_CAPACITY = 1024
+# Compact the storage once more than this fraction of its rows are deleted
+COMPACT_RATIO = 0.5
+# Below this number of documents IVF searches fall back to exact searches
+IVF_MIN_DOCUMENTS = 256
+KMEANS_ITERATIONS = 10
+# Rows per block when comparing many vectors with the centroids
+BLOCK_SIZE = 65536
+# SQLite limits the number of parameters of a statement
+_MAX_PARAMETERS = 900
+
+
+def context_query(context: BusinessContext) -> str:
+    """Build the search query of a business context."""
+    parts = [
+        context.project_description,
+        context.domain_knowledge,
+        context.business_area,
+        context.industry_sector,
+    ]
+    return " ".join(part for part in parts if part) or context.project_id
+
+
+def _chunks(items: Sequence[str]) -> Iterator[Sequence[str]]:
+    for i in range(0, len(items), _MAX_PARAMETERS):
+        yield items[i : i + _MAX_PARAMETERS]
+
+
+class DocumentIndex:
+    """Vector index of documents with incremental add and delete.
+
+    With a ``path`` the vectors and documents are stored in that directory and
+    survive restarts; without one the index only lives in memory. In ``ivf``
+    mode the vectors are clustered into ``n_lists`` clusters (default: the
+    square root of the number of documents) and a search only compares the
+    query with the vectors of the ``n_probe`` closest clusters. The clusters
+    are computed on the first search and again once the index doubled.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        embedder: Optional[Embedder] = None,
+        *,
+        mode: Literal["exact", "ivf"] = "exact",
+        n_lists: Optional[int] = None,
+        n_probe: int = 4,
+    ):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unsupported index mode '{mode}'")
+        self.path = path
+        self.embedder = embedder or HashingEmbedder()
+        self.dimension = self.embedder.dimension
+        self.mode = mode
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self._lock = threading.RLock()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(path, DATABASE_FILE) if path else ":memory:",
+            check_same_thread=False,
+        )
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self._check_meta()
+
+        rows = self._conn.execute("SELECT row, uuid FROM documents").fetchall()
+        self._rows: Dict[str, int] = {uuid: row for row, uuid in rows}
+        self._size = max(self._rows.values(), default=-1) + 1
+        # UUID of every row of the storage, None for deleted rows
+        self._row_uuids: List[Optional[str]] = [None] * self._size
+        for uuid, row in self._rows.items():
+            self._row_uuids[row] = uuid
+        self._vectors = self._open_vectors(max(self._size, INITIAL_CAPACITY))
+        self._alive = np.zeros(len(self._vectors), dtype=bool)
+        self._alive[list(self._rows.values())] = True
+
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(len(self._vectors), dtype=np.int32)
+        self._trained_size = 0
+
+    def _check_meta(self) -> None:
+        """Refuse to open an index built with a different embedder."""
+        expected = {"embedder": self.embedder.name, "dimension": str(self.dimension)}
+        stored = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        if stored and stored != expected:
+            raise ValueError(
+                f"The document index at {self.path} was built with {stored}, "
+                f"not with {expected}"
+            )
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                expected.items(),
+            )
+
+    def _open_vectors(self, capacity: int) -> np.ndarray:
+        """Return the vector storage with room for at least ``capacity`` rows."""
+        if not self.path:
+            return np.zeros((capacity, self.dimension), dtype=np.float32)
+        file = os.path.join(self.path, VECTORS_FILE)
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        existing = os.path.getsize(file) // row_bytes if os.path.exists(file) else 0
+        if existing < capacity:
+            # Growing the file keeps the stored vectors, new rows are zeros
+            with open(file, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        capacity = max(existing, capacity)
+        return np.memmap(
+            file, dtype=np.float32, mode="r+", shape=(capacity, self.dimension)
+        )
+
+    def _ensure_capacity(self, size: int) -> None:
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+            del self._vectors
+            self._vectors = self._open_vectors(capacity)
+        else:
+            vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+            vectors[: self._size] = self._vectors[: self._size]
+            self._vectors = vectors
+        self._alive = np.resize(self._alive, capacity)
+        self._alive[self._size :] = False
+        self._assignments = np.resize(self._assignments, capacity)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            self._conn.close()
+
+    def vectorize(self, documents: Sequence[Union[DocumentInput, str]]) -> List[str]:
+        """Add documents to the index and return their UUIDs.
+
+        Documents given with the UUID of an indexed document replace it.
+        """
+        inputs = [
+            DocumentInput(content=d) if isinstance(d, str) else d for d in documents
+        ]
+        if not inputs:
+            return []
+        vectors = self.embedder.embed([f"{d.title}\n{d.content}" for d in inputs])
+        stored = [
+            Document(
+                uuid=d.uuid or str(uuid_lib.uuid4()),
+                title=d.title,
+                content=d.content,
+                url=d.url,
+                metadata=d.metadata,
+            )
+            for d in inputs
+        ]
+        uuids = [document.uuid for document in stored]
+        if len(set(uuids)) < len(uuids):
+            raise ValueError("The documents to add contain duplicate UUIDs")
+
+        with self._lock:
+            self._remove([uuid for uuid in uuids if uuid in self._rows])
+            start = self._size
+            self._ensure_capacity(start + len(stored))
+            rows = range(start, start + len(stored))
+            self._vectors[start : start + len(stored)] = vectors
+            self._alive[start : start + len(stored)] = True
+            if self._centroids is not None:
+                self._assignments[start : start + len(stored)] = self._assign(vectors)
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO documents (row, uuid, document) VALUES (?, ?, ?)",
+                    [
+                        (row, document.uuid, document.model_dump_json())
+                        for row, document in zip(rows, stored)
+                    ],
+                )
+            self._rows.update(zip(uuids, rows))
+            self._row_uuids.extend(uuids)
+            self._size += len(stored)
+        logger.info("Indexed %d documents", len(stored))
+        return uuids
+
+    def delete(self, uuids: Sequence[str]) -> int:
+        """Remove documents from the index and return the number removed."""
+        with self._lock:
+            removed = self._remove([uuid for uuid in uuids if uuid in self._rows])
+            if self._size > INITIAL_CAPACITY and len(self) < self._size * (
+                1 - COMPACT_RATIO
+            ):
+                self.compact()
+        return removed
+
+    def _remove(self, uuids: List[str]) -> int:
+        if not uuids:
+            return 0
+        rows = [self._rows.pop(uuid) for uuid in uuids]
+        self._alive[rows] = False
+        for row in rows:
+            self._row_uuids[row] = None
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM documents WHERE uuid = ?", [(uuid,) for uuid in uuids]
+            )
+        return len(rows)
+
+    def compact(self) -> None:
+        """Move the remaining documents to the front of the storage."""
+        with self._lock:
+            rows = np.flatnonzero(self._alive[: self._size])
+            self._vectors[: len(rows)] = self._vectors[rows]
+            self._alive[:] = False
+            self._alive[: len(rows)] = True
+            self._assignments[: len(rows)] = self._assignments[rows]
+            updates = [
+                (new, self._row_uuids[old]) for new, old in enumerate(rows.tolist())
+            ]
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            with self._conn:
+                # Rows only move to lower free positions in ascending order
+                self._conn.executemany(
+                    "UPDATE documents SET row = ? WHERE uuid = ?", updates
+                )
+            self._rows = {uuid: row for row, uuid in updates}
+            self._row_uuids = [uuid for _, uuid in updates]
+            self._size = len(rows)
+        logger.info("Compacted the document index to %d documents", len(rows))
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Return the index of the closest centroid of every vector."""
+        assert self._centroids is not None
+        return np.concatenate(
+            [
+                np.argmax(vectors[i : i + BLOCK_SIZE] @ self._centroids.T, axis=1)
+                for i in range(0, len(vectors), BLOCK_SIZE)
+            ]
+            or [np.zeros(0, dtype=np.int64)]
+        ).astype(np.int32)
+
+    def _train(self) -> None:
+        """Cluster the vectors with spherical k-means."""
+        rows = np.flatnonzero(self._alive[: self._size])
+        vectors = np.asarray(self._vectors[rows])
+        n_lists = min(len(rows), self.n_lists or max(1, int(math.sqrt(len(rows)))))
+        rng = np.random.default_rng(0)
+        self._centroids = vectors[rng.choice(len(rows), n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = self._assign(vectors)
+            order = np.argsort(labels, kind="stable")
+            clusters, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(self._centroids)
+            sums[clusters] = np.add.reduceat(vectors[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their centroid
+            self._centroids = np.where(
+                norms > 0, sums / np.maximum(norms, 1e-12), self._centroids
+            )
+        self._assignments[: self._size] = self._assign(
+            np.asarray(self._vectors[: self._size])
+        )
+        self._trained_size = len(rows)
+        logger.info("Clustered %d documents into %d lists", len(rows), n_lists)
+
+    def _scores(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the rows compared with the query and their similarity scores."""
+        alive = self._alive[: self._size]
+        if self.mode == "exact" or len(self) < IVF_MIN_DOCUMENTS:
+            # Scoring all rows in one product is cheaper than selecting rows first
+            rows = np.flatnonzero(alive)
+            return rows, (self._vectors[: self._size] @ query)[rows]
+        if self._centroids is None or len(self) > 2 * self._trained_size:
+            self._train()
+        assert self._centroids is not None
+        probes = np.argsort(-(self._centroids @ query))[: self.n_probe]
+        rows = np.flatnonzero(alive & np.isin(self._assignments[: self._size], probes))
+        return rows, self._vectors[rows] @ query
+
+    def search(
+        self, query: str, limit: int = 5, min_score: Optional[float] = None
+    ) -> List[DocumentMatch]:
+        """Return the documents most similar to the query, best first."""
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            rows, scores = self._scores(vector)
+            if not len(rows) or limit < 1:
+                return []
+            k = min(limit, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            matches = [
+                DocumentMatch(uuid=self._row_uuids[rows[i]], score=float(scores[i]))
+                for i in top
+                if min_score is None or scores[i] >= min_score
+            ]
+        documents = self.get_many([match.uuid for match in matches])
+        for match in matches:
+            match.metadata = documents[match.uuid].metadata
+        return matches
+
+    def search_context(
+        self, context: BusinessContext, limit: int = 5
+    ) -> List[DocumentMatch]:
+        """Return the documents most relevant to a business context."""
+        return self.search(context_query(context), limit=limit)
+
+    def get(self, uuid: str) -> Optional[Document]:
+        """Return an indexed document, or None."""
+        return self.get_many([uuid]).get(uuid)
+
+    def get_many(self, uuids: Sequence[str]) -> Dict[str, Document]:
+        """Return the indexed documents of the UUIDs; unknown UUIDs are left out."""
+        rows = []
+        with self._lock:
+            for chunk in _chunks(list(uuids)):
+                placeholders = ", ".join("?" for _ in chunk)
+                rows.extend(
+                    self._conn.execute(
+                        "SELECT uuid, document FROM documents "
+                        f"WHERE uuid IN ({placeholders})",
+                        list(chunk),
+                    ).fetchall()
+                )
+        found = {uuid: Document.model_validate(json.loads(doc)) for uuid, doc in rows}
+        return {uuid: found[uuid] for uuid in uuids if uuid in found}
+
+
+@lru_cache(maxsize=None)
+def _document_index(
+    path: str,
+    mode: Literal["exact", "ivf"],
+    n_lists: Optional[int],
+    n_probe: int,
+    embedder: str,
+    dimension: int,
+) -> DocumentIndex:
+    settings = RiskGPTSettings(
+        DOCUMENT_INDEX_EMBEDDER=embedder, DOCUMENT_INDEX_DIMENSION=dimension
+    )
+    return DocumentIndex(
+        path, get_embedder(settings), mode=mode, n_lists=n_lists, n_probe=n_probe
+    )
+
+
+def get_document_index(
+    settings: Optional[RiskGPTSettings] = None,
+) -> Optional[DocumentIndex]:
+    """Return the shared local document index, or None if no path is configured."""
+    settings = settings or RiskGPTSettings()
+    if not settings.DOCUMENT_INDEX_PATH:
+        return None
+    return _document_index(
+        settings.DOCUMENT_INDEX_PATH,
+        settings.DOCUMENT_INDEX_MODE,
+        settings.DOCUMENT_INDEX_IVF_LISTS,
+        settings.DOCUMENT_INDEX_IVF_PROBES,
+        settings.DOCUMENT_INDEX_EMBEDDER,
+        settings.DOCUMENT_INDEX_DIMENSION,
+    )
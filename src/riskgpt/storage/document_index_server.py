@@ -0,0 +1,159 @@
+"""Local HTTP app serving a document index with the document service API.
+
+The app implements ``POST /vectorize``, ``POST /search`` and
+``GET /get/{uuid}`` of ``DomainDocumentVectorServiceSpecification.md`` on top
+of :class:`~riskgpt.storage.document_index.DocumentIndex`, using only the
+standard library. Point ``DOCUMENT_SERVICE_URL`` at it to use it from RiskGPT.
+
+Run with ``python -m riskgpt.storage.document_index_server --port 8765``.
+"""
+
+import argparse
+import hmac
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.embedding import get_embedder
+from riskgpt.logger import logger
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.documents import DocumentInput
+from riskgpt.storage.document_index import (
+    DocumentIndex,
+    context_query,
+    get_document_index,
+)
+
+_DOCUMENTS = TypeAdapter(List[DocumentInput])
+
+
+def _documents(body: Any) -> List[DocumentInput]:
+    """Parse a ``/vectorize`` body: a document, a list or ``{"documents": [...]}``."""
+    if isinstance(body, dict):
+        if "documents" in body:
+            body = body["documents"]
+        elif "text" in body:
+            body = [{**body, "content": body["text"]}]
+        else:
+            body = [body]
+    if isinstance(body, list):
+        body = [{"content": item} if isinstance(item, str) else item for item in body]
+    return _DOCUMENTS.validate_python(body)
+
+
+def _query(body: Any) -> str:
+    """Parse a ``/search`` body: ``{"query": ...}`` or business context fields."""
+    if isinstance(body, str):
+        return body
+    if not isinstance(body, dict):
+        raise ValueError("The search request must be a query or a business context")
+    if "query" in body:
+        return str(body["query"])
+    return context_query(BusinessContext.model_validate(body))
+
+
+def create_server(
+    index: DocumentIndex,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    api_key: Optional[str] = None,
+) -> ThreadingHTTPServer:
+    """Create the HTTP server of a document index; call ``serve_forever`` to run it.
+
+    If ``api_key`` is given, requests must send it as bearer token.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.info("Document index %s - %s", self.address_string(), format % args)
+
+        def _send(self, status: HTTPStatus, body: Any) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            if not api_key:
+                return True
+            header = self.headers.get("Authorization", "")
+            if hmac.compare_digest(header, f"Bearer {api_key}"):
+                return True
+            self._send(HTTPStatus.UNAUTHORIZED, {"detail": "Unauthorized"})
+            return False
+
+        def _body(self) -> Any:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"null")
+
+        def do_GET(self) -> None:
+            if not self._authorized():
+                return
+            if not self.path.startswith("/get/"):
+                self._send(HTTPStatus.NOT_FOUND, {"detail": "Not found"})
+                return
+            document = index.get(self.path[len("/get/") :])
+            if document is None:
+                self._send(HTTPStatus.NOT_FOUND, {"detail": "Unknown document"})
+                return
+            self._send(HTTPStatus.OK, document.model_dump(mode="json"))
+
+        def do_POST(self) -> None:
+            if not self._authorized():
+                return
+            path = self.path.partition("?")[0]
+            try:
+                body = self._body()
+                if path == "/vectorize":
+                    uuids = index.vectorize(_documents(body))
+                    self._send(HTTPStatus.OK, {"uuids": uuids})
+                elif path == "/search":
+                    limit = int(body.get("limit", 5)) if isinstance(body, dict) else 5
+                    matches = index.search(_query(body), limit=limit)
+                    self._send(
+                        HTTPStatus.OK, [m.model_dump(mode="json") for m in matches]
+                    )
+                else:
+                    self._send(HTTPStatus.NOT_FOUND, {"detail": "Not found"})
+            except (ValueError, ValidationError) as exc:
+                logger.warning("Invalid document index request to %s: %s", path, exc)
+                self._send(HTTPStatus.BAD_REQUEST, {"detail": str(exc)})
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    settings = RiskGPTSettings()
+    index = get_document_index(settings)
+    if index is None:
+        logger.warning("DOCUMENT_INDEX_PATH not configured, serving an in-memory index")
+        index = DocumentIndex(
+            embedder=get_embedder(settings), mode=settings.DOCUMENT_INDEX_MODE
+        )
+    api_key = settings.DOCUMENT_SERVICE_API_KEY
+    server = create_server(
+        index, args.host, args.port, api_key.get_secret_value() if api_key else None
+    )
+    logger.info("Serving the document index on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
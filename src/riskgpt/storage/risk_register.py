@@ -0,0 +1,428 @@
+"""Persistent per-project register of risks and their analysis results.
+
+The register keeps risks, their latest assessments, drivers, mitigations and
+correlation tags between runs, so that workflows can look up the known risks
+of a project instead of receiving the whole register with every request.
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from pydantic import BaseModel
+
+from riskgpt.logger import logger
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.chains.drivers import RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation
+from riskgpt.models.chains.risk import IdentifiedRisk, Risk
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS risks (
+    project_id TEXT NOT NULL,
+    risk_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    description TEXT NOT NULL,
+    category TEXT,
+    risk TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (project_id, risk_id)
+);
+CREATE INDEX IF NOT EXISTS risks_category ON risks (project_id, category, risk_id);
+CREATE INDEX IF NOT EXISTS risks_title ON risks (project_id, title_key);
+CREATE TABLE IF NOT EXISTS assessments (
+    project_id TEXT NOT NULL,
+    risk_id TEXT NOT NULL,
+    assessment TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (project_id, risk_id)
+);
+CREATE TABLE IF NOT EXISTS drivers (
+    project_id TEXT NOT NULL,
+    risk_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    driver TEXT NOT NULL,
+    PRIMARY KEY (project_id, risk_id, position)
+);
+CREATE TABLE IF NOT EXISTS mitigations (
+    project_id TEXT NOT NULL,
+    risk_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    mitigation TEXT NOT NULL,
+    PRIMARY KEY (project_id, risk_id, position)
+);
+CREATE TABLE IF NOT EXISTS correlation_tags (
+    project_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    risk_id TEXT NOT NULL,
+    justification TEXT NOT NULL,
+    PRIMARY KEY (project_id, tag, risk_id)
+);
+CREATE INDEX IF NOT EXISTS correlation_tags_risk
+    ON correlation_tags (project_id, risk_id);
+"""
+
+_RISK_ID = re.compile(r"^RISK-(\d+)$")
+
+# SQLite limits the number of parameters of a statement
+_MAX_PARAMETERS = 900
+
+
+def title_key(title: str) -> str:
+    """Normalised title used to recognise a risk identified again."""
+    return " ".join(title.lower().split())
+
+
+def _chunks(items: Sequence[str]) -> Iterator[Sequence[str]]:
+    for i in range(0, len(items), _MAX_PARAMETERS):
+        yield items[i : i + _MAX_PARAMETERS]
+
+
+class RiskRegisterStore:
+    """SQLite backed register of risks keyed by ``project_id``.
+
+    Risks are identified by their ``id`` within a project. Risks stored
+    without an id are matched to a stored risk by their normalised title, or
+    get the next free ``RISK-<n>`` id. Pass ``":memory:"`` as path for a store
+    that only lives as long as the object.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _next_number(self, project_id: str) -> int:
+        rows = self._conn.execute(
+            "SELECT risk_id FROM risks WHERE project_id = ? AND risk_id LIKE 'RISK-%'",
+            (project_id,),
+        ).fetchall()
+        numbers = [int(m.group(1)) for (rid,) in rows if (m := _RISK_ID.match(rid))]
+        return max(numbers, default=0) + 1
+
+    def upsert_risks(
+        self,
+        project_id: str,
+        risks: Sequence[Union[Risk, IdentifiedRisk]],
+        category: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> List[Risk]:
+        """Insert or update risks and return them with their ids.
+
+        ``category`` is used for risks without a category of their own.
+        """
+        timestamp = (now or datetime.now(timezone.utc)).isoformat()
+        stored: List[Risk] = []
+        with self._lock, self._conn:
+            number = self._next_number(project_id)
+            for item in risks:
+                if isinstance(item, IdentifiedRisk):
+                    risk = Risk(
+                        title=item.title, description=item.description, category=None
+                    )
+                else:
+                    risk = item.model_copy()
+                risk.category = risk.category or category
+                key = title_key(risk.title)
+                if risk.id is None:
+                    row = self._conn.execute(
+                        "SELECT risk_id FROM risks "
+                        "WHERE project_id = ? AND title_key = ? LIMIT 1",
+                        (project_id, key),
+                    ).fetchone()
+                    if row is not None:
+                        risk.id = row[0]
+                    else:
+                        risk.id = f"RISK-{number:03d}"
+                        number += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO risks (project_id, risk_id, title, "
+                    "title_key, description, category, risk, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        project_id,
+                        risk.id,
+                        risk.title,
+                        key,
+                        risk.description,
+                        risk.category,
+                        risk.model_dump_json(),
+                        timestamp,
+                    ),
+                )
+                stored.append(risk)
+        logger.info("Stored %d risks of project %s", len(stored), project_id)
+        return stored
+
+    def upsert_assessments(
+        self,
+        project_id: str,
+        assessments: Mapping[str, AssessmentResponse],
+        now: Optional[datetime] = None,
+    ) -> None:
+        """Store the latest assessment of each risk id."""
+        timestamp = (now or datetime.now(timezone.utc)).isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO assessments "
+                "(project_id, risk_id, assessment, updated_at) VALUES (?, ?, ?, ?)",
+                [
+                    (project_id, risk_id, assessment.model_dump_json(), timestamp)
+                    for risk_id, assessment in assessments.items()
+                ],
+            )
+
+    def _replace_items(
+        self,
+        table: str,
+        column: str,
+        project_id: str,
+        items: Mapping[str, Sequence[BaseModel]],
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"DELETE FROM {table} WHERE project_id = ? AND risk_id = ?",
+                [(project_id, risk_id) for risk_id in items],
+            )
+            self._conn.executemany(
+                f"INSERT INTO {table} (project_id, risk_id, position, {column}) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (project_id, risk_id, position, item.model_dump_json())
+                    for risk_id, values in items.items()
+                    for position, item in enumerate(values)
+                ],
+            )
+
+    def upsert_drivers(
+        self, project_id: str, drivers: Mapping[str, Sequence[RiskDriver]]
+    ) -> None:
+        """Replace the drivers of each risk id."""
+        self._replace_items("drivers", "driver", project_id, drivers)
+
+    def upsert_mitigations(
+        self, project_id: str, mitigations: Mapping[str, Sequence[Mitigation]]
+    ) -> None:
+        """Replace the mitigations of each risk id."""
+        self._replace_items("mitigations", "mitigation", project_id, mitigations)
+
+    def replace_correlation_tags(
+        self,
+        project_id: str,
+        tags: Sequence[CorrelationTag],
+        risk_ids: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Replace the correlation tags of a project.
+
+        With ``risk_ids`` only the tags of these risks are replaced and the
+        tags of the other risks are kept.
+        """
+        with self._lock, self._conn:
+            if risk_ids is None:
+                self._conn.execute(
+                    "DELETE FROM correlation_tags WHERE project_id = ?", (project_id,)
+                )
+            else:
+                self._conn.executemany(
+                    "DELETE FROM correlation_tags WHERE project_id = ? AND risk_id = ?",
+                    [(project_id, risk_id) for risk_id in risk_ids],
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO correlation_tags "
+                "(project_id, tag, risk_id, justification) VALUES (?, ?, ?, ?)",
+                [
+                    (project_id, tag.tag, risk_id, tag.justification)
+                    for tag in tags
+                    for risk_id in tag.risk_ids
+                ],
+            )
+
+    def get_risk(self, project_id: str, risk_id: str) -> Optional[Risk]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT risk FROM risks WHERE project_id = ? AND risk_id = ?",
+                (project_id, risk_id),
+            ).fetchone()
+        return Risk.model_validate_json(row[0]) if row else None
+
+    def count_risks(self, project_id: str, category: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM risks WHERE project_id = ?"
+        params: list = [project_id]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def list_risks(
+        self,
+        project_id: str,
+        category: Optional[str] = None,
+        tag: Optional[str] = None,
+        limit: int = 100,
+        after: Optional[str] = None,
+    ) -> List[Risk]:
+        """Return a page of the risks of a project ordered by id.
+
+        Pass the id of the last risk of a page as ``after`` to get the next
+        page. Risks can be filtered by category and correlation tag.
+        """
+        query = "SELECT r.risk FROM risks r"
+        params: list = []
+        if tag is not None:
+            query += (
+                " JOIN correlation_tags t ON t.project_id = r.project_id "
+                "AND t.risk_id = r.risk_id AND t.tag = ?"
+            )
+            params.append(tag)
+        query += " WHERE r.project_id = ?"
+        params.append(project_id)
+        if category is not None:
+            query += " AND r.category = ?"
+            params.append(category)
+        if after is not None:
+            query += " AND r.risk_id > ?"
+            params.append(after)
+        query += " ORDER BY r.risk_id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [Risk.model_validate_json(row[0]) for row in rows]
+
+    def iter_risks(
+        self,
+        project_id: str,
+        category: Optional[str] = None,
+        tag: Optional[str] = None,
+        page_size: int = 500,
+    ) -> Iterator[Risk]:
+        """Stream all matching risks of a project page by page."""
+        after = None
+        while True:
+            page = self.list_risks(project_id, category, tag, page_size, after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1].id
+
+    def _select(
+        self, sql: str, project_id: str, risk_ids: Optional[Sequence[str]]
+    ) -> List[Tuple]:
+        with self._lock:
+            if risk_ids is None:
+                return self._conn.execute(sql, (project_id,)).fetchall()
+            rows: List[Tuple] = []
+            for chunk in _chunks(list(risk_ids)):
+                placeholders = ", ".join("?" for _ in chunk)
+                rows.extend(
+                    self._conn.execute(
+                        f"{sql} AND risk_id IN ({placeholders})", [project_id, *chunk]
+                    ).fetchall()
+                )
+            return rows
+
+    def get_assessments(
+        self, project_id: str, risk_ids: Optional[Sequence[str]] = None
+    ) -> Dict[str, AssessmentResponse]:
+        """Return the stored assessments of a project, optionally of some risks."""
+        rows = self._select(
+            "SELECT risk_id, assessment FROM assessments WHERE project_id = ?",
+            project_id,
+            risk_ids,
+        )
+        return {rid: AssessmentResponse.model_validate_json(a) for rid, a in rows}
+
+    def _get_items(
+        self,
+        table: str,
+        column: str,
+        model,
+        project_id: str,
+        risk_ids: Optional[Sequence[str]],
+    ) -> Dict[str, list]:
+        rows = self._select(
+            f"SELECT risk_id, position, {column} FROM {table} WHERE project_id = ?",
+            project_id,
+            risk_ids,
+        )
+        items: Dict[str, list] = {}
+        for risk_id, _, data in sorted(rows, key=lambda row: (row[0], row[1])):
+            items.setdefault(risk_id, []).append(model.model_validate_json(data))
+        return items
+
+    def get_drivers(
+        self, project_id: str, risk_ids: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[RiskDriver]]:
+        return self._get_items("drivers", "driver", RiskDriver, project_id, risk_ids)
+
+    def get_mitigations(
+        self, project_id: str, risk_ids: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[Mitigation]]:
+        return self._get_items(
+            "mitigations", "mitigation", Mitigation, project_id, risk_ids
+        )
+
+    def get_correlation_tags(
+        self, project_id: str, risk_id: Optional[str] = None
+    ) -> List[CorrelationTag]:
+        """Return the correlation tags of a project, optionally of one risk."""
+        query = "SELECT tag, justification, risk_id FROM correlation_tags "
+        if risk_id is None:
+            query += "WHERE project_id = ?"
+            params: tuple = (project_id,)
+        else:
+            query += (
+                "WHERE project_id = ? AND tag IN (SELECT tag FROM correlation_tags "
+                "WHERE project_id = ? AND risk_id = ?)"
+            )
+            params = (project_id, project_id, risk_id)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY tag, risk_id", params)
+            tags: Dict[str, CorrelationTag] = {}
+            for tag, justification, rid in rows:
+                tags.setdefault(
+                    tag,
+                    CorrelationTag(tag=tag, justification=justification, risk_ids=[]),
+                ).risk_ids.append(rid)
+        return list(tags.values())
+
+    def delete_risks(self, project_id: str, risk_ids: Sequence[str]) -> int:
+        """Delete risks with all their results and return the number deleted."""
+        deleted = 0
+        with self._lock, self._conn:
+            for table in ("assessments", "drivers", "mitigations", "correlation_tags"):
+                self._conn.executemany(
+                    f"DELETE FROM {table} WHERE project_id = ? AND risk_id = ?",
+                    [(project_id, risk_id) for risk_id in risk_ids],
+                )
+            for risk_id in risk_ids:
+                deleted += self._conn.execute(
+                    "DELETE FROM risks WHERE project_id = ? AND risk_id = ?",
+                    (project_id, risk_id),
+                ).rowcount
+        return deleted
+
+
+@lru_cache(maxsize=None)
+def get_risk_register(path: str) -> RiskRegisterStore:
+    """Return the shared risk register for a SQLite database path."""
+    return RiskRegisterStore(path)
@@ -0,0 +1,306 @@
+"""Persistent per-project store of external sources and their key points.
+
+The store allows the context enrichment to run incrementally: only sources
+that are new or whose content changed since the last run are extracted again,
+and the summary is only regenerated when the set of key points changed.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from riskgpt.logger import logger
+from riskgpt.models.base import default_response_info
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.utils.search import Source
+from riskgpt.models.workflows.context import KeyPoint, KeyPointTextResponse
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    project_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (project_id, url)
+);
+CREATE TABLE IF NOT EXISTS key_points (
+    project_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (project_id, url, position)
+);
+CREATE TABLE IF NOT EXISTS source_queries (
+    project_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    query TEXT NOT NULL,
+    PRIMARY KEY (project_id, url, query)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    project_id TEXT PRIMARY KEY,
+    key_points_hash TEXT NOT NULL,
+    text TEXT NOT NULL,
+    refs TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# Average length of a month used to convert the time horizon into days
+DAYS_PER_MONTH = 30.44
+
+
+def content_hash(source: Source) -> str:
+    """Hash of the title and content of a source."""
+    return hashlib.sha256(f"{source.title}\n{source.content}".encode()).hexdigest()
+
+
+def key_points_hash(key_points: Iterable[KeyPoint]) -> str:
+    """Order independent hash of a set of key points."""
+    lines = sorted(
+        f"{kp.source_url or ''}\t{kp.topic.value}\t{kp.content}" for kp in key_points
+    )
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class SourceStore:
+    """SQLite backed store of sources, content hashes and extracted key points.
+
+    Sources are stored per ``project_id`` and URL. Pass ``":memory:"`` as path
+    for a store that only lives as long as the object.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get_content_hashes(self, project_id: str, urls: List[str]) -> Dict[str, str]:
+        """Return the stored content hashes of the given URLs."""
+        if not urls:
+            return {}
+        placeholders = ", ".join("?" for _ in urls)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT url, content_hash FROM sources "
+                f"WHERE project_id = ? AND url IN ({placeholders})",
+                [project_id, *urls],
+            ).fetchall()
+        return dict(rows)
+
+    def get_key_points(
+        self,
+        project_id: str,
+        urls: Optional[List[str]] = None,
+        query: Optional[str] = None,
+    ) -> List[KeyPoint]:
+        """Return the stored key points of a project, optionally only of some URLs.
+
+        With ``query`` only the key points of sources found by this search
+        query are returned. Key points are ordered by the time their source
+        was first stored.
+        """
+        sql = (
+            "SELECT k.url, k.topic, k.content FROM key_points k "
+            "JOIN sources s ON s.project_id = k.project_id AND s.url = k.url "
+            "WHERE k.project_id = ?"
+        )
+        params: list = [project_id]
+        if urls is not None:
+            if not urls:
+                return []
+            sql += f" AND k.url IN ({', '.join('?' for _ in urls)})"
+            params.extend(urls)
+        if query is not None:
+            sql += (
+                " AND k.url IN (SELECT url FROM source_queries "
+                "WHERE project_id = ? AND query = ?)"
+            )
+            params.extend([project_id, query])
+        sql += " ORDER BY s.first_seen, s.url, k.position"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            KeyPoint(content=content, topic=TopicEnum(topic), source_url=url)
+            for url, topic, content in rows
+        ]
+
+    def save_source(
+        self,
+        project_id: str,
+        source: Source,
+        key_points: List[KeyPoint],
+        query: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> None:
+        """Store a source with its key points, replacing previous key points.
+
+        ``query`` is recorded as a search query that found the source.
+        """
+        timestamp = (now or datetime.now(timezone.utc)).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sources (project_id, url, topic, title, date, "
+                "content_hash, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (project_id, url) DO UPDATE SET "
+                "topic = excluded.topic, title = excluded.title, "
+                "date = excluded.date, content_hash = excluded.content_hash, "
+                "last_seen = excluded.last_seen",
+                (
+                    project_id,
+                    source.url,
+                    source.topic.value,
+                    source.title,
+                    source.date,
+                    content_hash(source),
+                    timestamp,
+                    timestamp,
+                ),
+            )
+            self._conn.execute(
+                "DELETE FROM key_points WHERE project_id = ? AND url = ?",
+                (project_id, source.url),
+            )
+            self._conn.executemany(
+                "INSERT INTO key_points (project_id, url, position, topic, content) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (project_id, source.url, i, kp.topic.value, kp.content)
+                    for i, kp in enumerate(key_points)
+                ],
+            )
+            if query is not None:
+                self._add_query(project_id, [source.url], query)
+
+    def touch_sources(
+        self,
+        project_id: str,
+        urls: List[str],
+        query: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> None:
+        """Mark unchanged sources as seen again, optionally found by ``query``."""
+        timestamp = (now or datetime.now(timezone.utc)).isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE sources SET last_seen = ? WHERE project_id = ? AND url = ?",
+                [(timestamp, project_id, url) for url in urls],
+            )
+            if query is not None:
+                self._add_query(project_id, urls, query)
+
+    def _add_query(self, project_id: str, urls: List[str], query: str) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO source_queries (project_id, url, query) "
+            "VALUES (?, ?, ?)",
+            [(project_id, url, query) for url in urls],
+        )
+
+    def prune(
+        self, project_id: str, horizon_months: int, now: Optional[datetime] = None
+    ) -> int:
+        """Delete sources older than the time horizon and return their number.
+
+        The age of a source is taken from its publication date, or from the
+        time it was first stored if the date is unknown.
+        """
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(
+            days=DAYS_PER_MONTH * horizon_months
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, date, first_seen FROM sources WHERE project_id = ?",
+                (project_id,),
+            ).fetchall()
+        expired = []
+        for url, date, first_seen in rows:
+            published = _parse_date(date) or _parse_date(first_seen)
+            if published is not None and published < cutoff:
+                expired.append((project_id, url))
+        if expired:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "DELETE FROM key_points WHERE project_id = ? AND url = ?", expired
+                )
+                self._conn.executemany(
+                    "DELETE FROM source_queries WHERE project_id = ? AND url = ?",
+                    expired,
+                )
+                self._conn.executemany(
+                    "DELETE FROM sources WHERE project_id = ? AND url = ?", expired
+                )
+            logger.info(
+                "Pruned %d expired sources of project %s", len(expired), project_id
+            )
+        return len(expired)
+
+    def get_summary(
+        self, project_id: str, key_points_hash: str
+    ) -> Optional[KeyPointTextResponse]:
+        """Return the stored summary if it was generated from the same key points."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, refs FROM summaries "
+                "WHERE project_id = ? AND key_points_hash = ?",
+                (project_id, key_points_hash),
+            ).fetchone()
+        if row is None:
+            return None
+        return KeyPointTextResponse(
+            text=row[0],
+            references=json.loads(row[1]),
+            response_info=default_response_info(prompt_name="keypoint_text"),
+        )
+
+    def save_summary(
+        self,
+        project_id: str,
+        key_points_hash: str,
+        response: KeyPointTextResponse,
+        now: Optional[datetime] = None,
+    ) -> None:
+        """Store the summary generated from the key points with the given hash."""
+        timestamp = (now or datetime.now(timezone.utc)).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(project_id, key_points_hash, text, refs, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    project_id,
+                    key_points_hash,
+                    response.text,
+                    json.dumps(response.references),
+                    timestamp,
+                ),
+            )
+
+
+@lru_cache(maxsize=None)
+def get_source_store(path: str) -> SourceStore:
+    """Return the shared source store for a SQLite database path."""
+    return SourceStore(path)
@@ -1,55 +1,86 @@
 from __future__ import annotations
 
-from typing import Annotated, List, TypedDict, TypeVar
+import asyncio
+from datetime import timedelta
+from functools import lru_cache
+from typing import Annotated, Any, AsyncIterator, List, Set, Tuple, TypedDict
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph, add_messages
 
-from riskgpt.chains.keypoint_text import keypoint_text_chain
-from riskgpt.helpers.extraction import extract_key_points
+from riskgpt.chains.keypoint_text import (
+    keypoint_text_chain,
+    keypoint_text_map_reduce_chain,
+)
+from riskgpt.helpers.budget import (
+    BudgetExceededError,
+    budget_nearly_exhausted,
+    current_budget,
+    track_budget,
+)
+from riskgpt.helpers.checkpointing import (
+    get_checkpointer,
+    run_with_checkpoint,
+    stream_with_checkpoint,
+    with_checkpointer,
+)
+from riskgpt.helpers.concurrency import gather_bounded
+from riskgpt.helpers.extraction import (
+    estimate_tokens,
+    extract_key_points,
+    extract_packed_key_points,
+    pack_sources,
+)
+from riskgpt.helpers.reducers import combine_bool_or, extend_list, merge_unique
 from riskgpt.helpers.search import search, settings
-from riskgpt.models.base import ResponseInfo
+from riskgpt.helpers.summarization import cluster_key_points
+from riskgpt.logger import logger
+from riskgpt.models.base import ResponseInfo, combine_response_info
 from riskgpt.models.enums import TopicEnum
 from riskgpt.models.utils.search import SearchRequest, SearchResponse, Source
 from riskgpt.models.workflows.context import (
+    EnrichContextEvent,
     EnrichContextRequest,
     EnrichContextResponse,
     ExtractKeyPointsRequest,
     ExtractKeyPointsResponse,
+    ExtractPackedKeyPointsRequest,
+    ExtractPackedKeyPointsResponse,
+    FinalResponseEvent,
     KeyPoint,
+    KeyPointsExtractedEvent,
     KeyPointTextRequest,
     KeyPointTextResponse,
+    PartialSummaryEvent,
+    SearchCompletedEvent,
+    SourceAdmittedEvent,
+)
+from riskgpt.storage.source_store import (
+    SourceStore,
+    content_hash,
+    get_source_store,
+    key_points_hash,
 )
-
-# Define reducer functions for lists
-T = TypeVar("T")
-
-
-def extend_list(existing: List[T] | None, new: List[T]) -> List[T]:
-    """Combine two lists by extending the existing list with the new one."""
-    if existing is None:
-        return new
-    return existing + new
 
 
-def append_to_list(existing: List[T] | None, new: T) -> List[T]:
-    """Append a single item to a list."""
-    if existing is None:
-        return [new]
-    return existing + [new]
+def source_key(source: Source) -> str:
+    """Identity key of a source."""
+    return source.url
 
 
-def combine_bool_or(existing: bool | None, new: bool) -> bool:
-    """Combine two boolean values using logical OR."""
-    if existing is None:
-        return new
-    return existing or new
+def key_point_key(key_point: KeyPoint) -> int:
+    """Identity key of a key point, a hash of its source, topic and content."""
+    content = " ".join(key_point.content.split()).lower()
+    return hash((key_point.source_url, key_point.topic.value, content))
 
 
-class State(TypedDict):
+class State(TypedDict, total=False):
+    request: EnrichContextRequest
     messages: Annotated[list, add_messages]
 
-    sources: Annotated[List[Source], extend_list]
-    key_points: Annotated[List[KeyPoint], extend_list]
+    sources: Annotated[List[Source], merge_unique(source_key)]
+    key_points: Annotated[List[KeyPoint], merge_unique(key_point_key)]
     response_info_list: Annotated[List[ResponseInfo], extend_list]
 
     search_failed: Annotated[bool, combine_bool_or]
@@ -57,16 +88,25 @@ class State(TypedDict):
     response: EnrichContextResponse
 
 
+def emit(event: EnrichContextEvent) -> None:
+    """Send an event to the stream of enrich_context_stream, if the graph is streamed."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # Called outside of a graph run
+        return
+    writer(event)
+
+
 def topic_search(
     state: State,
-    request: EnrichContextRequest,
     topic: TopicEnum,
     max_results: int | None = None,
 ) -> State:
     if max_results is None:
         max_results = settings.MAX_SEARCH_RESULTS
 
-    query = request.create_search_query()
+    query = state["request"].create_search_query()
     search_request = SearchRequest(
         query=query,
         source_type=topic.value,
@@ -74,180 +114,370 @@ def topic_search(
     )
     search_response: SearchResponse = search(search_request)
 
-    sources: List[Source] = state.get("sources", [])
-    existing_urls = {source.url for source in sources}
-
-    # Convert SearchResult objects to Source objects
+    # Convert SearchResult objects to Source objects; sources already
+    # collected by another topic are dropped by the reducer
     new_sources = [
-        Source.from_search_result(item, topic)
-        for item in search_response.results
-        if item.url not in existing_urls
+        Source.from_search_result(item, topic) for item in search_response.results
     ]
 
-    state["sources"] = new_sources
-
-    if not search_response.success:
-        state["search_failed"] = True
-    return state
+    return {"sources": new_sources, "search_failed": not search_response.success}
 
 
-async def extract_topic_key_points(state: State, topic: TopicEnum) -> State:
-    # Filter sources by topic
-    sources: List[Source] = state.get("sources", [])
-    topic_sources = [source for source in sources if source.topic == topic]
+async def _extract_batch_key_points(batch: List[Source]) -> ExtractKeyPointsResponse:
+    """Extract key points from a batch of sources and attach their source URLs.
 
-    for source in topic_sources:
+    A single source is extracted with the regular prompt, several sources are
+    packed into one request and the tagged points are mapped back by index.
+    """
+    if len(batch) == 1:
+        source = batch[0]
         request = ExtractKeyPointsRequest.from_source(source)
         response: ExtractKeyPointsResponse = await extract_key_points(request)
 
         # Attach source.url to each point in response.points
         for point in response.points:
             point.source_url = source.url
+        return response
+
+    packed: ExtractPackedKeyPointsResponse = await extract_packed_key_points(
+        ExtractPackedKeyPointsRequest.from_sources(batch)
+    )
+    points = []
+    for packed_point in packed.points:
+        if not 0 <= packed_point.source_index < len(batch):
+            logger.warning(
+                "Dropping key point with unknown source index %s",
+                packed_point.source_index,
+            )
+            continue
+        source = batch[packed_point.source_index]
+        points.append(
+            KeyPoint(
+                content=packed_point.content,
+                topic=source.topic,
+                source_url=source.url,
+            )
+        )
+    return ExtractKeyPointsResponse(points=points, response_info=packed.response_info)
+
+
+def _source_store() -> SourceStore | None:
+    """Return the configured source store, or None if enrichment is not incremental."""
+    if not settings.SOURCE_STORE_PATH:
+        return None
+    return get_source_store(settings.SOURCE_STORE_PATH)
+
+
+def _reuse_stored_sources(
+    store: SourceStore, project_id: str, query: str, sources: List[Source]
+) -> Tuple[Set[str], List[KeyPoint]]:
+    """Return the URLs of the unchanged sources and their stored key points."""
+    known = store.get_content_hashes(project_id, [source.url for source in sources])
+    unchanged = {s.url for s in sources if known.get(s.url) == content_hash(s)}
+    store.touch_sources(project_id, list(unchanged), query)
+    return unchanged, store.get_key_points(project_id, list(unchanged))
+
+
+def _save_sources(
+    store: SourceStore,
+    project_id: str,
+    query: str,
+    sources: List[Source],
+    key_points: List[KeyPoint],
+) -> None:
+    for source in sources:
+        store.save_source(
+            project_id,
+            source,
+            [kp for kp in key_points if kp.source_url == source.url],
+            query,
+        )
+
+
+async def extract_topic_key_points(state: State, topic: TopicEnum) -> State:
+    # Filter sources by topic
+    sources: List[Source] = state.get("sources", [])
+    topic_sources = [source for source in sources if source.topic == topic]
+
+    # With a source store only new or changed sources are extracted
+    store = _source_store()
+    request = state.get("request")
+    stored_points: List[KeyPoint] = []
+    if store is not None and request is not None:
+        project_id = request.business_context.project_id
+        query = request.create_search_query()
+        unchanged, stored_points = await asyncio.to_thread(
+            _reuse_stored_sources, store, project_id, query, topic_sources
+        )
+        pending = [s for s in topic_sources if s.url not in unchanged]
+        logger.info(
+            "Reusing key points of %d unchanged %s sources", len(unchanged), topic.value
+        )
+    else:
+        pending = topic_sources
+
+    # With a budget the most relevant sources are extracted first, so that the
+    # sources skipped when the budget runs low are the least relevant ones
+    if current_budget() is not None:
+        pending = sorted(pending, key=lambda s: s.score, reverse=True)
+
+    if settings.EXTRACTION_PACKING:
+        batches = pack_sources(pending, settings.EXTRACTION_PACK_TOKEN_BUDGET)
+    else:
+        batches = [[source] for source in pending]
+
+    async def extract_batch(batch: List[Source]) -> ExtractKeyPointsResponse | None:
+        if budget_nearly_exhausted(
+            "extraction of " + ", ".join(f"'{source.url}'" for source in batch)
+        ):
+            return None
+        response = await _extract_batch_key_points(batch)
+        emit(
+            KeyPointsExtractedEvent(
+                topic=topic,
+                source_urls=[source.url for source in batch],
+                key_points=response.points,
+            )
+        )
+        return response
+
+    # Extract all batches concurrently; results keep the order of the batches
+    results = await gather_bounded(
+        batches,
+        extract_batch,
+        limit=settings.EXTRACTION_CONCURRENCY,
+        timeout=settings.EXTRACTION_TIMEOUT,
+    )
 
-        state.setdefault("response_info_list", []).append(response.response_info)
-        state.setdefault("key_points", []).extend(response.points)
+    key_points: List[KeyPoint] = []
+    response_info_list: List[ResponseInfo] = []
+    for batch, result in zip(batches, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning(
+                "Key point extraction for %s timed out, skipping",
+                ", ".join(f"'{source.url}'" for source in batch),
+            )
+            continue
+        if result is None or isinstance(result, BudgetExceededError):
+            # Skipped to stay within the budget of the run
+            continue
+        if isinstance(result, BaseException):
+            raise result
+
+        response_info_list.append(result.response_info)
+        key_points.extend(result.points)
+
+        if store is not None and request is not None:
+            await asyncio.to_thread(
+                _save_sources,
+                store,
+                request.business_context.project_id,
+                request.create_search_query(),
+                batch,
+                result.points,
+            )
 
-    return state
+    key_points.extend(stored_points)
+
+    # Packing may reorder sources, so restore the order of the sources
+    position = {source.url: i for i, source in enumerate(topic_sources)}
+    key_points.sort(key=lambda kp: position.get(kp.source_url or "", 0))
+
+    return {"key_points": key_points, "response_info_list": response_info_list}
 
 
 def aggregate_response_info(state):
-    total_tokens = 0
-    total_cost = 0.0
-    model_name = ""
-    response_info_list = state.get("response_info_list", [])
-    if response_info_list:
-        total_cost = sum(info.total_cost for info in response_info_list)
-        total_tokens = sum(info.consumed_tokens for info in response_info_list)
-        model_name = response_info_list[-1].model_name
-    return ResponseInfo(
-        consumed_tokens=total_tokens,
-        total_cost=total_cost,
+    return combine_response_info(
+        state.get("response_info_list", []),
         prompt_name="external_context_enrichment",
-        model_name=model_name,
     )
 
 
-def get_enrich_context_graph(request: EnrichContextRequest):
-    """
-    Returns the uncompiled graph for visualization purposes.
+def news_search(state: State) -> State:
+    return topic_search(state, TopicEnum.NEWS)
 
-    This method can be used in Jupyter notebooks to visualize the graph structure.
 
-    Example:
-        ```python
-        from IPython.display import Image, display
-        from src.workflows.enrich_context import get_enrich_context_graph
-        from src.models.workflows.context import ExternalContextRequest
-        from src.models.common import BusinessContext
-
-        # Create a request
-        request = ExternalContextRequest(
-            business_context=BusinessContext(
-                project_id="Sample Project",
-                project_description="A sample project for visualization",
-                domain_knowledge="sample domain",
-            ),
-            focus_keywords=["sample", "keywords"],
-        )
+def professional_search(state: State) -> State:
+    return topic_search(state, TopicEnum.LINKEDIN)
 
-        # Get the graph
-        graph = get_enrich_context_graph(request)
 
-        # Visualize the graph
-        try:
-            display(Image(graph.get_graph().draw_mermaid_png()))
-        except Exception as e:
-            print(f"Could not visualize graph: {e}")
-            print("Make sure you have graphviz installed.")
-        ```
-    """
-    graph = StateGraph(State)
+def regulatory_search(state: State) -> State:
+    return topic_search(state, TopicEnum.REGULATORY)
 
-    def news_search(state: State) -> State:
-        return topic_search(state, request, TopicEnum.NEWS)
 
-    def professional_search(state: State) -> State:
-        return topic_search(state, request, TopicEnum.LINKEDIN)
+async def extract_news_key_points(state: State) -> State:
+    return await extract_topic_key_points(state, TopicEnum.NEWS)
 
-    def regulatory_search(state: State) -> State:
-        return topic_search(state, request, TopicEnum.REGULATORY)
 
-    async def extract_news_key_points(state: State) -> State:
-        return await extract_topic_key_points(state, TopicEnum.NEWS)
+async def extract_professional_key_points(state: State) -> State:
+    return await extract_topic_key_points(state, TopicEnum.LINKEDIN)
 
-    async def extract_professional_key_points(state: State) -> State:
-        return await extract_topic_key_points(state, TopicEnum.LINKEDIN)
 
-    async def extract_regulatory_key_points(state: State) -> State:
-        return await extract_topic_key_points(state, TopicEnum.REGULATORY)
+async def extract_regulatory_key_points(state: State) -> State:
+    return await extract_topic_key_points(state, TopicEnum.REGULATORY)
 
-    async def summarize_key_points(state: State) -> State:
-        """Summarize key points for a specific topic."""
 
-        kp_text_request = KeyPointTextRequest(key_points=state.get("key_points", []))
+def _load_stored_key_points(
+    store: SourceStore, request: EnrichContextRequest
+) -> List[KeyPoint]:
+    project_id = request.business_context.project_id
+    if request.time_horizon_months:
+        store.prune(project_id, request.time_horizon_months)
+    return store.get_key_points(project_id, query=request.create_search_query())
 
-        try:
-            response: KeyPointTextResponse = await keypoint_text_chain(kp_text_request)
-            state["keypoint_text_response"] = response
 
-            if response.response_info:
-                state.setdefault("response_info_list", []).append(
-                    response.response_info
-                )
-        except Exception as e:
-            # Create a fallback response with error information
-            fallback_response = KeyPointTextResponse(
-                text="Unable to generate summary text due to parsing error.",
-                references=["Error occurred during text generation."],
-                response_info=ResponseInfo(
-                    consumed_tokens=0,
-                    total_cost=0.0,
-                    prompt_name="keypoint_text",
-                    model_name="unknown",
-                    error=str(e),
-                ),
-            )
-            state["keypoint_text_response"] = fallback_response
-            state.setdefault("response_info_list", []).append(
-                fallback_response.response_info
+async def load_stored_key_points(state: State) -> State:
+    """Prune expired sources and add the key points of stored sources.
+
+    Only sources found by the search query of the request are added, so
+    sources stored by other queries of the project do not leak into the
+    summary.
+    """
+
+    store = _source_store()
+    if store is None:
+        return {}
+    key_points = await asyncio.to_thread(
+        _load_stored_key_points, store, state["request"]
+    )
+    return {"key_points": key_points}
+
+
+async def summarize_key_points(state: State) -> State:
+    """Summarize the key points of all topics."""
+
+    kp_text_request = KeyPointTextRequest(key_points=state.get("key_points", []))
+
+    # Reuse the stored summary if the key points did not change
+    store = _source_store()
+    if store is not None:
+        project_id = state["request"].business_context.project_id
+        points_hash = key_points_hash(kp_text_request.key_points)
+        stored = await asyncio.to_thread(store.get_summary, project_id, points_hash)
+        if stored is not None:
+            logger.info("Key points unchanged, reusing the stored summary")
+            return {"keypoint_text_response": stored}
+
+    # Collapse near-identical key points from different sources
+    compression_ratio = None
+    if settings.KEYPOINT_DEDUP_THRESHOLD is not None:
+        clusters = cluster_key_points(
+            kp_text_request.key_points, settings.KEYPOINT_DEDUP_THRESHOLD
+        )
+        logger.info(
+            "Clustered %d key points into %d (compression ratio %.2f)",
+            clusters.original_count,
+            len(clusters.key_points),
+            clusters.compression_ratio,
+        )
+        kp_text_request = KeyPointTextRequest(key_points=clusters.key_points)
+        compression_ratio = clusters.compression_ratio
+
+    # Large key point sets are summarized in groups and merged afterwards
+    threshold = settings.SUMMARY_MAP_REDUCE_THRESHOLD
+    size = sum(estimate_tokens(kp.content) for kp in kp_text_request.key_points)
+    try:
+        if threshold is not None and size > threshold:
+            response: KeyPointTextResponse = await keypoint_text_map_reduce_chain(
+                kp_text_request,
+                on_partial=lambda partial: emit(PartialSummaryEvent(summary=partial)),
             )
-        return state
-
-    async def aggregate(state: State) -> State:
-        sources: List[Source] = state.get("sources", [])
-
-        if not sources:
-            if state.get("search_failed"):
-                summary = "No external data retrieved due to network restrictions or missing dependencies"
-            else:
-                summary = "No recent relevant information found"
-            full_report = None
-            recommendation = None
         else:
-            summary = f"Collected {len(sources)} external sources for {request.business_context.project_id}."
+            response = await keypoint_text_chain(kp_text_request)
+    except Exception as e:
+        # Create a fallback response with error information
+        response = KeyPointTextResponse(
+            text="Unable to generate summary text due to parsing error.",
+            references=["Error occurred during text generation."],
+            response_info=ResponseInfo(
+                consumed_tokens=0,
+                total_cost=0.0,
+                prompt_name="keypoint_text",
+                model_name="unknown",
+                error=str(e),
+            ),
+        )
 
-            kp_text_response = state.get("keypoint_text_response")
-            full_report = kp_text_response.format_output() if kp_text_response else None
+    response.response_info.compression_ratio = compression_ratio
+    if store is not None and not response.response_info.error:
+        await asyncio.to_thread(store.save_summary, project_id, points_hash, response)
 
-            sorted_sources = sorted(sources, key=lambda s: s.score, reverse=True)
-            recommendation = [
-                f"Review source: {s.title} ({s.url})" for s in sorted_sources[:2]
-            ]
+    update: State = {"keypoint_text_response": response}
+    if response.response_info:
+        update["response_info_list"] = [response.response_info]
+    return update
+
+
+async def aggregate(state: State) -> State:
+    request = state["request"]
+    sources: List[Source] = state.get("sources", [])
 
-        response = EnrichContextResponse(
-            sector_summary=summary,
-            workshop_recommendations=recommendation if recommendation else [],
-            full_report=full_report,
+    if not sources:
+        if state.get("search_failed"):
+            summary = "No external data retrieved due to network restrictions or missing dependencies"
+        else:
+            summary = "No recent relevant information found"
+        full_report = None
+        recommendation = None
+    else:
+        summary = f"Collected {len(sources)} external sources for {request.business_context.project_id}."
+
+        kp_text_response = state.get("keypoint_text_response")
+        full_report = kp_text_response.format_output() if kp_text_response else None
+
+        sorted_sources = sorted(sources, key=lambda s: s.score, reverse=True)
+        recommendation = [
+            f"Review source: {s.title} ({s.url})" for s in sorted_sources[:2]
+        ]
+
+    response = EnrichContextResponse(
+        sector_summary=summary,
+        workshop_recommendations=recommendation if recommendation else [],
+        full_report=full_report,
+    )
+    response.response_info = aggregate_response_info(state)
+    kp_text_response = state.get("keypoint_text_response")
+    if kp_text_response is not None:
+        response.response_info.compression_ratio = (
+            kp_text_response.response_info.compression_ratio
         )
-        response.response_info = aggregate_response_info(state)
+    budget = current_budget()
+    if budget is not None and budget.partial:
+        response.response_info.partial = True
+
+    return {"response": response}
+
+
+def start(state: State) -> State:
+    # Nothing to initialize, the start node only fans out to the searches
+    return {}
+
+
+def get_enrich_context_graph() -> StateGraph:
+    """
+    Returns the uncompiled graph for visualization purposes.
+
+    This method can be used in Jupyter notebooks to visualize the graph structure.
+    The request is not part of the graph, it is passed in the initial state
+    when the graph is invoked.
+
+    Example:
+        ```python
+        from IPython.display import Image, display
+        from riskgpt.workflows.enrich_context import get_enrich_context_graph
 
-        state["response"] = response
-        return state
+        # Get the graph
+        graph = get_enrich_context_graph()
 
-    # Define a start node that will be the entry point
-    def start(state: State) -> State:
-        # Initialize state if needed
-        return state
+        # Visualize the graph
+        try:
+            display(Image(graph.compile().get_graph().draw_mermaid_png()))
+        except Exception as e:
+            print(f"Could not visualize graph: {e}")
+            print("Make sure you have graphviz installed.")
+        ```
+    """
+    graph = StateGraph(State)
 
     # Add nodes to the graph
     graph.add_node("start", start)
@@ -257,6 +487,7 @@ def get_enrich_context_graph(request: EnrichContextRequest):
     graph.add_node("extract_news_key_points", extract_news_key_points)
     graph.add_node("extract_professional_key_points", extract_professional_key_points)
     graph.add_node("extract_regulatory_key_points", extract_regulatory_key_points)
+    graph.add_node("load_stored_key_points", load_stored_key_points)
     graph.add_node("aggregate", aggregate)
     graph.add_node("summarize_key_points", summarize_key_points)
 
@@ -273,10 +504,11 @@ def get_enrich_context_graph(request: EnrichContextRequest):
     graph.add_edge("professional", "extract_professional_key_points")
     graph.add_edge("regulatory", "extract_regulatory_key_points")
 
-    # Join all extraction results to summarize key points
-    graph.add_edge("extract_news_key_points", "summarize_key_points")
-    graph.add_edge("extract_professional_key_points", "summarize_key_points")
-    graph.add_edge("extract_regulatory_key_points", "summarize_key_points")
+    # Join all extraction results and add the stored key points
+    graph.add_edge("extract_news_key_points", "load_stored_key_points")
+    graph.add_edge("extract_professional_key_points", "load_stored_key_points")
+    graph.add_edge("extract_regulatory_key_points", "load_stored_key_points")
+    graph.add_edge("load_stored_key_points", "summarize_key_points")
 
     # Final steps
     graph.add_edge("summarize_key_points", "aggregate")
@@ -285,15 +517,114 @@ def get_enrich_context_graph(request: EnrichContextRequest):
     return graph
 
 
-def _build_graph(request: EnrichContextRequest):
-    return get_enrich_context_graph(request).compile()
+@lru_cache(maxsize=None)
+def _build_graph():
+    """Compile the workflow graph once and reuse it for every request."""
+    return get_enrich_context_graph().compile()
 
 
 async def enrich_context(
     request: EnrichContextRequest,
+    run_id: str | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
 ) -> EnrichContextResponse:
-    """Run the external context enrichment workflow asynchronously."""
+    """Run the external context enrichment workflow asynchronously.
+
+    If a ``run_id`` is given, the run is checkpointed with ``checkpointer``
+    (default: the configured ``CHECKPOINT_BACKEND``) and a failed or cancelled
+    run with the same ID resumes from the last completed node.
 
-    app = _build_graph(request)
-    result = await app.ainvoke({})
+    If the request has a ``budget``, the least relevant sources are skipped
+    when it runs low and the response is flagged as partial.
+    """
+
+    if run_id is not None and checkpointer is None:
+        checkpointer = get_checkpointer(settings)
+    app = with_checkpointer(_build_graph(), checkpointer)
+    with track_budget(request.budget, settings.BUDGET_RESERVE):
+        result = await run_with_checkpoint(
+            app,
+            {"request": request},
+            run_id,
+            max_age=timedelta(hours=settings.CHECKPOINT_TTL_HOURS),
+        )
     return result["response"]
+
+
+SEARCH_NODES = {
+    "news": TopicEnum.NEWS,
+    "professional": TopicEnum.LINKEDIN,
+    "regulatory": TopicEnum.REGULATORY,
+}
+
+
+async def enrich_context_stream(
+    request: EnrichContextRequest,
+    run_id: str | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> AsyncIterator[EnrichContextEvent]:
+    """Run the external context enrichment and yield events as they happen.
+
+    The events report the completed search of every topic, every admitted
+    source, the extracted key points, partial summaries of large key point
+    sets and finally the response. Closing the generator early cancels the
+    remaining work of the workflow.
+
+    Checkpointing and budgets work as in :func:`enrich_context`. A resumed
+    run only yields the events of the nodes that run again; a finished run
+    only yields its final response.
+    """
+
+    if run_id is not None and checkpointer is None:
+        checkpointer = get_checkpointer(settings)
+    app = with_checkpointer(_build_graph(), checkpointer)
+    chunks: asyncio.Queue[Tuple[str, Any] | None] = asyncio.Queue()
+
+    async def run() -> None:
+        # The graph runs in its own task, so the budget is set and reset in
+        # that task and not across the yields of this generator
+        with track_budget(request.budget, settings.BUDGET_RESERVE):
+            async for chunk in stream_with_checkpoint(
+                app,
+                {"request": request},
+                ["updates", "custom"],
+                run_id,
+                max_age=timedelta(hours=settings.CHECKPOINT_TTL_HOURS),
+            ):
+                chunks.put_nowait(chunk)
+
+    task = asyncio.create_task(run())
+    task.add_done_callback(lambda _: chunks.put_nowait(None))
+    admitted: Set[str] = set()
+    try:
+        while (item := await chunks.get()) is not None:
+            mode, chunk = item
+            if mode == "custom":
+                yield chunk
+                continue
+            if mode == "values":
+                # Stored result of a finished run
+                yield FinalResponseEvent(response=chunk["response"])
+                continue
+
+            for node, update in chunk.items():
+                update = update or {}
+                if node in SEARCH_NODES:
+                    sources = update.get("sources", [])
+                    yield SearchCompletedEvent(
+                        topic=SEARCH_NODES[node],
+                        result_count=len(sources),
+                        success=not update.get("search_failed", False),
+                    )
+                    for source in sources:
+                        # Sources found by several topics are only admitted once
+                        if source.url not in admitted:
+                            admitted.add(source.url)
+                            yield SourceAdmittedEvent(source=source)
+                elif "response" in update:
+                    yield FinalResponseEvent(response=update["response"])
+        # Raise the error of a failed run
+        task.result()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -1,34 +1,82 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, TypedDict
+import asyncio
+import hashlib
+from datetime import timedelta
+from functools import lru_cache
+from typing import (
+    Annotated,
+    Any,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
 
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
+from langgraph.types import Command, Send
 
 from riskgpt.chains.communicate_risks import communicate_risks_chain
 from riskgpt.chains.correlation_tags import correlation_tags_chain
-from riskgpt.chains.risk_assessment import risk_assessment_chain
+from riskgpt.chains.risk_assessment import (
+    batch_assessment_saves_tokens,
+    risk_assessment_batch_chain,
+    risk_assessment_chain,
+)
 from riskgpt.chains.risk_drivers import risk_drivers_chain
 from riskgpt.chains.risk_identification import risk_identification_chain
 from riskgpt.chains.risk_mitigations import risk_mitigations_chain
 from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.budget import (
+    BudgetExceededError,
+    before_deadline,
+    budget_nearly_exhausted,
+    current_budget,
+    track_budget,
+)
+from riskgpt.helpers.checkpointing import (
+    get_checkpointer,
+    run_with_checkpoint,
+    with_checkpointer,
+)
+from riskgpt.helpers.reducers import extend_list, merge_dict
+from riskgpt.helpers.simulation import simulate_assessments
 from riskgpt.logger import logger
-from riskgpt.models.base import ResponseInfo
-from riskgpt.models.chains import (
+from riskgpt.models.base import (
+    ResponseInfo,
+    combine_response_info,
+    default_response_info,
+)
+from riskgpt.models.chains.assessment import (
+    AssessmentRequest,
+    AssessmentResponse,
+    BatchAssessmentRequest,
+    RiskToAssess,
+)
+from riskgpt.models.chains.communication import (
     CommunicationRequest,
-    CorrelationTag,
-    CorrelationTagRequest,
-    Mitigation,
-    MitigationRequest,
-    Risk,
-    RiskRequest,
+    CommunicationResponse,
 )
-from riskgpt.models.chains.assessment import AssessmentRequest
+from riskgpt.models.chains.correlation import CorrelationTag, CorrelationTagRequest
 from riskgpt.models.chains.drivers import DriverRequest, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationRequest
+from riskgpt.models.chains.risk import IdentifiedRisk, Risk, RiskRequest
 from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.utils.simulation import PortfolioSimulation
 from riskgpt.models.workflows.presentation import (
+    MultiAudiencePresentationRequest,
+    MultiAudiencePresentationResponse,
     PresentationRequest,
     PresentationResponse,
+    audience_policy,
+    combined_audience_policy,
 )
+from riskgpt.storage.risk_register import RiskRegisterStore, get_risk_register
 
 settings = RiskGPTSettings()
 
@@ -36,205 +84,686 @@ settings = RiskGPTSettings()
 def apply_audience_formatting(
     resp: PresentationResponse, audience: AudienceEnum
 ) -> PresentationResponse:
-    """Adjust output fields based on the target audience."""
-    if audience == AudienceEnum.executive:
-        resp.main_risks = resp.main_risks[:3]
-        resp.chart_placeholders = ["executive_overview_chart"]
-        resp.open_questions = None
-    elif audience == AudienceEnum.workshop:
-        resp.open_questions = ["Discuss mitigation priorities"]
-    elif audience == AudienceEnum.risk_internal:
-        resp.appendix = (resp.appendix or "") + "\n[Model parameters]"
-    elif audience == AudienceEnum.audit:
-        resp.appendix = (resp.appendix or "") + "\n[Audit trail]"
-    elif audience == AudienceEnum.regulator:
-        resp.appendix = (resp.appendix or "") + "\n[Compliance mapping]"
-    elif audience == AudienceEnum.project_owner:
-        resp.appendix = (resp.appendix or "") + "\n[Project milestones]"
-    elif audience == AudienceEnum.investor:
-        resp.appendix = (resp.appendix or "") + "\n[Financial impact]"
-    elif audience == AudienceEnum.operations:
-        resp.appendix = (resp.appendix or "") + "\n[KRI dashboard]"
+    """Adjust output fields based on the policy of the target audience."""
+    policy = audience_policy(audience)
+    if policy.max_risks is not None:
+        resp.main_risks = resp.main_risks[: policy.max_risks]
+    resp.chart_placeholders = list(policy.chart_placeholders)
+    resp.open_questions = (
+        list(policy.open_questions) if policy.open_questions is not None else None
+    )
+    if policy.appendix_section:
+        resp.appendix = (resp.appendix or "") + "\n" + policy.appendix_section
     return resp
 
 
-class State(TypedDict):
-    request: PresentationRequest
+def rank_risks(assessments: Sequence[AssessmentResponse]) -> List[int]:
+    """Return the indices of the assessed risks ordered by probability x impact.
+
+    Risks without probability or impact rank last, in their original order.
+    """
+
+    def score(index: int) -> float:
+        assessment = assessments[index]
+        if assessment.probability is None or assessment.impact is None:
+            return -1.0
+        return assessment.probability * assessment.impact
+
+    return sorted(range(len(assessments)), key=lambda i: -score(i))
+
+
+class State(TypedDict, total=False):
+    request: PresentationRequest | MultiAudiencePresentationRequest
     risks: List[Risk]
-    assessments: List[AssessmentRequest]
+    assessments: List[AssessmentResponse]
     drivers: List[List[RiskDriver]]
     mitigations: List[List[Mitigation]]
     correlation_tags: List[CorrelationTag]
-    response: PresentationResponse
-    response_info: ResponseInfo
+    assessment_by_risk: Annotated[Dict[str, AssessmentResponse], merge_dict]
+    # None marks drivers or mitigations that were skipped
+    drivers_by_risk: Annotated[Dict[str, Optional[List[RiskDriver]]], merge_dict]
+    mitigations_by_risk: Annotated[Dict[str, Optional[List[Mitigation]]], merge_dict]
+    response_info_list: Annotated[List[ResponseInfo], extend_list]
+    missing: Annotated[List[str], extend_list]
+    responses: Dict[AudienceEnum, PresentationResponse]
 
 
-def _build_graph(request: PresentationRequest):
-    graph = StateGraph(State)
+def _audiences(
+    request: PresentationRequest | MultiAudiencePresentationRequest,
+) -> List[AudienceEnum]:
+    """Return the distinct audiences of a request."""
+    if isinstance(request, PresentationRequest):
+        return [AudienceEnum(request.audience)]
+    return list(dict.fromkeys(AudienceEnum(a) for a in request.audiences))
+
+
+async def _gather_all(steps: Sequence[Awaitable[Any]]) -> List[Any]:
+    """Run the steps concurrently and raise the first failure once all are done.
 
-    totals: Dict[str, float | int] = {"tokens": 0, "cost": 0.0}
-
-    def initialize_state(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Initialize the state with the request if it exists in the input."""
-        if "request" in state and isinstance(state["request"], PresentationRequest):
-            # Use the request from the input state
-            pass
-        else:
-            # Use the request passed to _build_graph
-            state["request"] = request
-        return state
-
-    async def identify_risks(state: Dict[str, Any]) -> Dict[str, Any]:
-        req = state["request"]
-        category = (req.focus_areas or ["General"])[0]
-        logger.info("Identify risks for category '%s'", category)
-        res = await risk_identification_chain(
+    A failed chain fails the node so that a checkpointed run can resume it.
+    """
+    results = await asyncio.gather(*steps, return_exceptions=True)
+    for res in results:
+        if isinstance(res, BaseException):
+            raise res
+    return list(results)
+
+
+def to_risk(identified: IdentifiedRisk, index: int, category: str) -> Risk:
+    """Convert an identified risk into a risk with a stable id."""
+    return Risk(
+        id=f"RISK-{index + 1:03d}",
+        title=identified.title,
+        description=identified.description,
+        category=category,
+    )
+
+
+def initialize_state(state: State) -> State:
+    """Entry point of the workflow; the request is passed in the input state."""
+    if not isinstance(
+        state.get("request"),
+        (PresentationRequest, MultiAudiencePresentationRequest),
+    ):
+        raise ValueError(
+            "The presentation workflow requires a PresentationRequest in its state"
+        )
+    return {}
+
+
+async def identify_risks(state: State) -> Command:
+    """Identify the risks and fan out their analysis."""
+    req = state["request"]
+    category = (req.focus_areas or ["General"])[0]
+    logger.info("Identify risks for category '%s'", category)
+    res = await before_deadline(
+        risk_identification_chain(
             RiskRequest(
                 business_context=req.business_context,
                 category=category,
             )
+        ),
+        "risk identification",
+    )
+    if res is None:
+        return Command(
+            update={"risks": [], "missing": ["risk identification"]},
+            goto="select_risks",
         )
-        if res.response_info:
-            totals["tokens"] += res.response_info.consumed_tokens
-            totals["cost"] += res.response_info.total_cost
-        state["risks"] = res.risks
-        return state
-
-    async def assess_risks(state: Dict[str, Any]) -> Dict[str, Any]:
-        req = state["request"]
-        assessments = []
-        for risk in state.get("risks", []):
-            logger.info("Assess risk '%s'", risk.title)
-            assess = await risk_assessment_chain(
-                AssessmentRequest(
-                    business_context=req.business_context,
-                    risk_description=risk.description,
-                    risk_title=risk.title,
-                )
-            )
-            if assess.response_info:
-                totals["tokens"] += assess.response_info.consumed_tokens
-                totals["cost"] += assess.response_info.total_cost
-            assessments.append(assess)
-        state["assessments"] = assessments
-        return state
-
-    async def drivers(state: Dict[str, Any]) -> Dict[str, Any]:
-        req = state["request"]
-        driver_lists: List[List[str]] = []
-        for risk in state.get("risks", []):
-            logger.info("Get drivers for '%s'", risk.title)
-            res = await risk_drivers_chain(
-                DriverRequest(
-                    business_context=req.business_context,
-                    risk=risk,
-                )
-            )
-            if res.response_info:
-                totals["tokens"] += res.response_info.consumed_tokens
-                totals["cost"] += res.response_info.total_cost
-            driver_lists.append(res.drivers)
-        state["drivers"] = driver_lists
-        return state
-
-    async def mitigations(state: Dict[str, Any]) -> Dict[str, Any]:
-        req = state["request"]
-        mitigation_lists: List[List[str]] = []
-        for risk, drv in zip(state.get("risks", []), state.get("drivers", [])):
-            logger.info("Get mitigations for '%s'", risk.title)
-            res = await risk_mitigations_chain(
-                MitigationRequest(
-                    business_context=req.business_context,
-                    risk=risk,
-                    risk_drivers=drv,
-                )
+    risks = [to_risk(risk, i, category) for i, risk in enumerate(res.risks)]
+    return Command(
+        update={"risks": risks, "response_info_list": [res.response_info]},
+        goto=plan_analysis(req, risks),
+    )
+
+
+class RiskTask(TypedDict):
+    """Input of the nodes analysing a single risk."""
+
+    request: PresentationRequest | MultiAudiencePresentationRequest
+    risk: Risk
+
+
+class BatchTask(TypedDict):
+    """Input of the node assessing the risks in batches."""
+
+    request: PresentationRequest | MultiAudiencePresentationRequest
+    risks: List[Risk]
+
+
+def _key(risk: Risk) -> str:
+    return risk.id or risk.title
+
+
+def _batch_request(
+    request: PresentationRequest | MultiAudiencePresentationRequest,
+    risks: Sequence[Risk],
+) -> BatchAssessmentRequest:
+    return BatchAssessmentRequest(
+        business_context=request.business_context,
+        risks=[
+            RiskToAssess(
+                risk_id=_key(risk),
+                risk_title=risk.title,
+                risk_description=risk.description,
             )
-            if res.response_info:
-                totals["tokens"] += res.response_info.consumed_tokens
-                totals["cost"] += res.response_info.total_cost
-            mitigation_lists.append(res.mitigations)
-        state["mitigations"] = mitigation_lists
-        return state
-
-    async def correlation(state: Dict[str, Any]) -> Dict[str, Any]:
-        req = state["request"]
-        known = [d for lst in state.get("drivers", []) for d in lst]
-        logger.info("Define correlation tags")
-        res = await correlation_tags_chain(
+            for risk in risks
+        ],
+    )
+
+
+async def _call(what: str, chain, request, missing: List[str]):
+    """Call a chain unless the budget runs low or the deadline cancels it.
+
+    Returns None and records ``what`` as missing if the call is skipped or
+    cancelled.
+    """
+    if budget_nearly_exhausted(what):
+        missing.append(what)
+        return None
+    logger.info("Get %s", what)
+    res = await before_deadline(chain(request), what)
+    if res is None:
+        missing.append(what)
+    return res
+
+
+async def assess_risk(task: RiskTask) -> State:
+    """Assess a single risk; a skipped assessment is only recorded as missing."""
+    req, risk = task["request"], task["risk"]
+    missing: List[str] = []
+    res = await _call(
+        f"assessment of '{risk.title}'",
+        risk_assessment_chain,
+        AssessmentRequest(
+            business_context=req.business_context,
+            risk_description=risk.description,
+            risk_title=risk.title,
+        ),
+        missing,
+    )
+    if res is None:
+        return {"missing": missing}
+    return {
+        "assessment_by_risk": {_key(risk): res},
+        "response_info_list": [res.response_info],
+    }
+
+
+async def assess_batch(task: BatchTask) -> State:
+    """Assess all risks with the risk_assessment_batch_chain."""
+    risks = task["risks"]
+    missing: List[str] = []
+    res = await _call(
+        f"assessment of {len(risks)} risks",
+        risk_assessment_batch_chain,
+        _batch_request(task["request"], risks),
+        missing,
+    )
+    if res is None:
+        return {"missing": missing}
+    assessments = list(res.assessments.values())
+    return {
+        "assessment_by_risk": {
+            _key(risk): assessment for risk, assessment in zip(risks, assessments)
+        },
+        "response_info_list": [a.response_info for a in assessments],
+    }
+
+
+async def analyze_risk(task: RiskTask) -> State:
+    """Identify the drivers of a risk, followed by the mitigations of these drivers.
+
+    Skipped drivers or mitigations are recorded as None.
+    """
+    req, risk = task["request"], task["risk"]
+    missing: List[str] = []
+    response_info_list: List[ResponseInfo] = []
+    drivers: Optional[List[RiskDriver]] = None
+    mitigations: Optional[List[Mitigation]] = None
+    res = await _call(
+        f"drivers of '{risk.title}'",
+        risk_drivers_chain,
+        DriverRequest(business_context=req.business_context, risk=risk),
+        missing,
+    )
+    if res is None:
+        missing.append(f"mitigations of '{risk.title}'")
+    else:
+        drivers = res.drivers
+        response_info_list.append(res.response_info)
+        mitigated = await _call(
+            f"mitigations of '{risk.title}'",
+            risk_mitigations_chain,
+            MitigationRequest(
+                business_context=req.business_context,
+                risk=risk,
+                risk_drivers=drivers,
+            ),
+            missing,
+        )
+        if mitigated is not None:
+            mitigations = mitigated.mitigations
+            response_info_list.append(mitigated.response_info)
+    return {
+        "drivers_by_risk": {_key(risk): drivers},
+        "mitigations_by_risk": {_key(risk): mitigations},
+        "response_info_list": response_info_list,
+        "missing": missing,
+    }
+
+
+def _limits_risks(
+    request: PresentationRequest | MultiAudiencePresentationRequest, count: int
+) -> bool:
+    """Whether the audiences only see some of the ``count`` identified risks."""
+    policy = combined_audience_policy(_audiences(request))
+    return policy.max_risks is not None and count > policy.max_risks
+
+
+def plan_analysis(
+    req: PresentationRequest | MultiAudiencePresentationRequest,
+    risks: List[Risk],
+) -> List[Send] | str:
+    """Fan out the analysis of the identified risks into one node per step.
+
+    Every risk runs through its own pipeline: its assessment runs in parallel
+    with the identification of its drivers and mitigations. If batching is
+    enabled and needs fewer tokens, the risks are assessed in one batched call
+    alongside the pipelines instead. If the audiences only see the
+    highest-ranked risks, the risks are only assessed here and
+    :func:`plan_selected_analysis` analyses the selected risks afterwards.
+
+    Each node is checkpointed on its own, so a resumed run only repeats the
+    steps that failed.
+    """
+    if not risks:
+        return "select_risks"
+    sends: List[Send] = []
+    if batch_assessment_saves_tokens(_batch_request(req, risks)):
+        logger.info("Assess %d risks in batches", len(risks))
+        sends.append(Send("assess_batch", {"request": req, "risks": risks}))
+    if _limits_risks(req, len(risks)):
+        return sends or [
+            Send("assess_risk", {"request": req, "risk": risk}) for risk in risks
+        ]
+    for risk in risks:
+        task = {"request": req, "risk": risk}
+        if not sends or sends[0].node != "assess_batch":
+            sends.append(Send("assess_risk", task))
+        sends.append(Send("analyze_risk", task))
+    return sends
+
+
+def select_risks(state: State) -> Command:
+    """Order the assessments by risk and keep the risks the audiences see.
+
+    If the policy of the audiences limits the number of risks shown and more
+    risks were identified, the risks are ranked by probability x impact and
+    only the highest-ranked are kept, in the order of their rank. A risk
+    whose assessment was skipped gets an empty assessment. The selected risks
+    not analysed yet are analysed next.
+    """
+    req = state["request"]
+    risks = state.get("risks", [])
+    assessed = state.get("assessment_by_risk", {})
+    assessments = [assessed.get(_key(risk), AssessmentResponse()) for risk in risks]
+    if _limits_risks(req, len(risks)):
+        audiences = _audiences(req)
+        limit = combined_audience_policy(audiences).max_risks
+        selected = rank_risks(assessments)[:limit]
+        logger.info(
+            "Analyse the %d highest-ranked of %d risks for %s",
+            len(selected),
+            len(risks),
+            ", ".join(audience.value for audience in audiences),
+        )
+        risks = [risks[i] for i in selected]
+        assessments = [assessments[i] for i in selected]
+    analysed = state.get("drivers_by_risk", {})
+    sends = [
+        Send("analyze_selected_risk", {"request": req, "risk": risk})
+        for risk in risks
+        if _key(risk) not in analysed
+    ]
+    return Command(
+        update={"risks": risks, "assessments": assessments},
+        goto=sends or "collect_analysis",
+    )
+
+
+def collect_analysis(state: State) -> State:
+    """Order the drivers and mitigations like the selected risks."""
+    risks = state.get("risks", [])
+    drivers = state.get("drivers_by_risk", {})
+    mitigations = state.get("mitigations_by_risk", {})
+    return {
+        "drivers": [drivers.get(_key(risk)) or [] for risk in risks],
+        "mitigations": [mitigations.get(_key(risk)) or [] for risk in risks],
+    }
+
+
+async def correlation(state: State) -> State:
+    req = state["request"]
+    if not combined_audience_policy(_audiences(req)).correlation:
+        return {}
+    if budget_nearly_exhausted("correlation tags"):
+        return {"missing": ["correlation tags"]}
+    known = [d.driver for lst in state.get("drivers", []) for d in lst]
+    logger.info("Define correlation tags")
+    res = await before_deadline(
+        correlation_tags_chain(
             CorrelationTagRequest(
                 business_context=req.business_context,
                 risks=state.get("risks", []),
                 known_drivers=known or None,
             )
+        ),
+        "correlation tags",
+    )
+    if res is None:
+        return {"missing": ["correlation tags"]}
+    return {
+        "correlation_tags": res.correlation_tags,
+        "response_info_list": [res.response_info],
+    }
+
+
+def _risk_register() -> RiskRegisterStore | None:
+    """Return the configured risk register, or None if risks are not persisted."""
+    path = RiskGPTSettings().RISK_REGISTER_PATH
+    if not path:
+        return None
+    return get_risk_register(path)
+
+
+def _store_analysis(state: State) -> None:
+    """Store the selected risks and their analysis in the risk register.
+
+    Skipped assessments, drivers, mitigations and correlation tags are not
+    stored so that they do not replace earlier results of the risks.
+    """
+    store = _risk_register()
+    risks = state.get("risks", [])
+    if store is None or not risks:
+        return
+    project_id = state["request"].business_context.project_id
+    # The ids of the presentation only number its own risks; the register
+    # matches the risks by title and assigns its ids
+    stored = store.upsert_risks(
+        project_id,
+        [IdentifiedRisk(title=r.title, description=r.description) for r in risks],
+        category=risks[0].category,
+    )
+    ids = {_key(risk): s.id for risk, s in zip(risks, stored) if s.id}
+    assessed = state.get("assessment_by_risk", {})
+    drivers = state.get("drivers_by_risk", {})
+    mitigations = state.get("mitigations_by_risk", {})
+    store.upsert_assessments(
+        project_id, {ids[k]: a for k, a in assessed.items() if k in ids}
+    )
+    store.upsert_drivers(
+        project_id,
+        {ids[k]: d for k, d in drivers.items() if k in ids and d is not None},
+    )
+    store.upsert_mitigations(
+        project_id,
+        {ids[k]: m for k, m in mitigations.items() if k in ids and m is not None},
+    )
+    if "correlation_tags" in state:
+        # Tags refer to risks by their ID or title
+        keys = {risk.title: ids[_key(risk)] for risk in risks if _key(risk) in ids}
+        keys.update(ids)
+        store.replace_correlation_tags(
+            project_id,
+            [
+                tag.model_copy(
+                    update={"risk_ids": [keys[r] for r in tag.risk_ids if r in keys]}
+                )
+                for tag in state["correlation_tags"]
+            ],
+            risk_ids=list(ids.values()),
         )
-        if res.response_info:
-            totals["tokens"] += res.response_info.consumed_tokens
-            totals["cost"] += res.response_info.total_cost
-        state["correlation_tags"] = res.tags
-        return state
-
-    async def summary(state: Dict[str, Any]) -> Dict[str, Any]:
-        req = state["request"]
-        lines = []
-        for risk, assess in zip(state.get("risks", []), state.get("assessments", [])):
-            line = f"{risk.title}: P={assess.probability or 'n/a'}, I={assess.impact or 'n/a'}"
-            lines.append(line)
-        text = "\n".join(lines)
-        com = await communicate_risks_chain(
-            CommunicationRequest(
-                business_context=req.business_context,
-                audience=req.audience,
-                risks=state.get("risks", []),
-            )
+
+
+async def store_analysis(state: State) -> State:
+    """Persist the analysis if ``RISK_REGISTER_PATH`` is set."""
+    await asyncio.to_thread(_store_analysis, state)
+    return {}
+
+
+async def present(
+    state: State,
+    audience: AudienceEnum,
+    portfolio: PortfolioSimulation | None = None,
+) -> Tuple[PresentationResponse, ResponseInfo]:
+    """Create the presentation of the analysed risks for one audience.
+
+    The key figures of the simulated ``portfolio`` are added to the
+    quantitative summary. The summary may use the reserve of the deadline;
+    if it is not done by the deadline, the presentation is returned without
+    it. Returns the presentation and the response info of its summary.
+    """
+    req = state["request"]
+    risks = state.get("risks", [])
+    assessments = state.get("assessments", [])
+    drivers = state.get("drivers", [])
+    mitigations = state.get("mitigations", [])
+
+    policy = audience_policy(audience)
+    shown = list(range(len(risks)))
+    if policy.max_risks is not None:
+        shown = rank_risks(assessments)[: policy.max_risks]
+
+    lines = []
+    for i in shown:
+        assess = assessments[i]
+        line = f"{risks[i].title}: P={assess.probability or 'n/a'}, I={assess.impact or 'n/a'}"
+        lines.append(line)
+    if portfolio is not None:
+        lines.append(portfolio.format_summary())
+    text = "\n".join(lines)
+    missing = list(state.get("missing", []))
+    try:
+        com = await before_deadline(
+            communicate_risks_chain(
+                CommunicationRequest(
+                    business_context=req.business_context,
+                    audience=audience,
+                    risks=[risks[i] for i in shown],
+                )
+            ),
+            f"executive summary for {audience.value}",
+            keep_reserve=False,
         )
-        if com.response_info:
-            totals["tokens"] += com.response_info.consumed_tokens
-            totals["cost"] += com.response_info.total_cost
-        resp = PresentationResponse(
-            executive_summary=com.executive_summary,
-            main_risks=[r.title for r in state.get("risks", [])],
-            quantitative_summary=text,
-            key_drivers=[d for lst in state.get("drivers", []) for d in lst],
-            correlation_tags=state.get("../prompts/correlation_tags"),
-            mitigations=[m for lst in state.get("mitigations", []) for m in lst],
-            open_questions=[],
-            chart_placeholders=["risk_overview_chart"],
-            appendix=com.technical_annex,
+        reason = "the deadline of the run was reached"
+    except BudgetExceededError:
+        com = None
+        reason = "the budget of the run was exhausted"
+    if com is None:
+        # Keep the analysis results, only the summary text is missing
+        missing.append("executive summary")
+        com = CommunicationResponse(
+            summary=f"Summary not generated, {reason}.",
+            response_info=default_response_info(
+                prompt_name="communicate_risks", model_name=settings.OPENAI_MODEL_NAME
+            ),
         )
-        resp.response_info = ResponseInfo(
-            consumed_tokens=int(totals["tokens"]),
-            total_cost=float(totals["cost"]),
-            prompt_name="prepare_presentation_output",
-            model_name=settings.OPENAI_MODEL_NAME,
+    resp = PresentationResponse(
+        executive_summary=com.summary,
+        main_risks=[risks[i].title for i in shown],
+        quantitative_summary=text,
+        key_drivers=[d.driver for i in shown for d in drivers[i]],
+        correlation_tags=[t.tag for t in state.get("correlation_tags", [])],
+        mitigations=[m.mitigation for i in shown for m in mitigations[i]],
+        open_questions=[],
+        chart_placeholders=["risk_overview_chart"],
+        appendix=com.technical_annex,
+        portfolio_simulation=portfolio,
+        missing_sections=missing,
+    )
+    # Each presentation accounts for the shared analysis and its own summary
+    resp.response_info = combine_response_info(
+        [*state.get("response_info_list", []), com.response_info],
+        prompt_name="prepare_presentation_output",
+        model_name=settings.OPENAI_MODEL_NAME,
+    )
+    budget = current_budget()
+    if budget is not None and budget.partial:
+        resp.response_info.partial = True
+    return apply_audience_formatting(resp, audience), com.response_info
+
+
+def simulation_seed(run_id: str | None) -> int | None:
+    """Return the seed of the portfolio simulation of a run.
+
+    ``SIMULATION_SEED`` is used if set. Otherwise a checkpointed run derives
+    the seed from its run ID, so that the figures of a resumed run do not
+    change; other runs are not seeded.
+    """
+    if settings.SIMULATION_SEED is not None:
+        return settings.SIMULATION_SEED
+    if run_id is None:
+        return None
+    return int.from_bytes(hashlib.sha256(run_id.encode()).digest()[:8], "big")
+
+
+def simulate_portfolio_loss(
+    state: State, seed: int | None = None
+) -> PortfolioSimulation | None:
+    """Simulate the portfolio loss of the risks with quantitative assessments.
+
+    Risks sharing a correlation tag are correlated with its coefficient in
+    ``SIMULATION_TAG_COEFFICIENTS``, or ``SIMULATION_TAG_CORRELATION``.
+    """
+    risks = state.get("risks", [])
+    assessments = state.get("assessments", [])
+    # Tags refer to risks by their ID or title
+    keys = {}
+    for risk in risks:
+        keys[risk.title] = keys[risk.id or risk.title] = risk.id or risk.title
+    tags = [
+        tag.model_copy(
+            update={"risk_ids": [keys[r] for r in tag.risk_ids if r in keys]}
         )
-        state["response"] = apply_audience_formatting(resp, req.audience)
-        return state
+        for tag in state.get("correlation_tags", [])
+    ]
+    return simulate_assessments(
+        [(risk.id or risk.title, a) for risk, a in zip(risks, assessments)],
+        iterations=settings.SIMULATION_ITERATIONS,
+        confidence=settings.SIMULATION_CONFIDENCE,
+        seed=seed,
+        tags=tags,
+        coefficient=settings.SIMULATION_TAG_CORRELATION,
+        coefficients=settings.SIMULATION_TAG_COEFFICIENTS,
+    )
+
+
+async def summary(state: State, config: RunnableConfig) -> State:
+    """Create the presentations of all audiences concurrently.
+
+    The portfolio loss is simulated once and shared by all presentations.
+    """
+    audiences = _audiences(state["request"])
+    run_id = config.get("configurable", {}).get("thread_id")
+    portfolio = simulate_portfolio_loss(state, simulation_seed(run_id))
+    results = await _gather_all([present(state, a, portfolio) for a in audiences])
+    return {
+        "responses": {a: resp for a, (resp, _) in zip(audiences, results)},
+        "response_info_list": [info for _, info in results],
+    }
+
+
+def get_presentation_graph() -> StateGraph:
+    """Return the uncompiled presentation workflow graph."""
+    graph = StateGraph(State)
 
     graph.add_node("initialize", initialize_state)
-    graph.add_node("identify_risks", identify_risks)
-    graph.add_node("assess_risks", assess_risks)
-    graph.add_node("drivers", drivers)
-    graph.add_node("mitigations", mitigations)
+    graph.add_node(
+        "identify_risks",
+        identify_risks,
+        destinations=("assess_risk", "assess_batch", "analyze_risk", "select_risks"),
+    )
+    graph.add_node("assess_risk", assess_risk)
+    graph.add_node("assess_batch", assess_batch)
+    graph.add_node("analyze_risk", analyze_risk)
+    graph.add_node(
+        "select_risks",
+        select_risks,
+        destinations=("analyze_selected_risk", "collect_analysis"),
+    )
+    graph.add_node("analyze_selected_risk", analyze_risk)
+    graph.add_node("collect_analysis", collect_analysis)
     graph.add_node("correlation", correlation)
+    graph.add_node("store_analysis", store_analysis)
     graph.add_node("summary", summary)
 
     graph.set_entry_point("initialize")
     graph.add_edge("initialize", "identify_risks")
-    graph.add_edge("identify_risks", "assess_risks")
-    graph.add_edge("assess_risks", "drivers")
-    graph.add_edge("drivers", "mitigations")
-    graph.add_edge("mitigations", "correlation")
-    graph.add_edge("correlation", "summary")
+    # identify_risks and select_risks fan out one node per risk and step,
+    # joined once all of them are done
+    for node in ("assess_risk", "assess_batch", "analyze_risk"):
+        graph.add_edge(node, "select_risks")
+    graph.add_edge("analyze_selected_risk", "collect_analysis")
+    graph.add_edge("collect_analysis", "correlation")
+    graph.add_edge("correlation", "store_analysis")
+    graph.add_edge("store_analysis", "summary")
     graph.add_edge("summary", END)
 
-    return graph.compile()
+    return graph
+
+
+@lru_cache(maxsize=None)
+def _build_graph():
+    """Compile the presentation graph once and reuse it."""
+    return get_presentation_graph().compile()
+
+
+async def _run(
+    request: PresentationRequest | MultiAudiencePresentationRequest,
+    run_id: str | None,
+    checkpointer: BaseCheckpointSaver | None,
+) -> Dict[str, Any]:
+    if run_id is not None and checkpointer is None:
+        checkpointer = get_checkpointer(settings)
+    app = with_checkpointer(_build_graph(), checkpointer)
+    with track_budget(request.budget, settings.BUDGET_RESERVE):
+        return await run_with_checkpoint(
+            app,
+            {"request": request},
+            run_id,
+            max_age=timedelta(hours=settings.CHECKPOINT_TTL_HOURS),
+            # Every analysis node has at most one chain call in flight
+            max_concurrency=settings.PRESENTATION_CONCURRENCY,
+        )
 
 
 async def prepare_presentation_output(
     request: PresentationRequest,
+    run_id: str | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
 ) -> PresentationResponse:
-    """Run the presentation workflow asynchronously and return a structured response."""
+    """Run the presentation workflow asynchronously and return a structured response.
+
+    If a ``run_id`` is given, the run is checkpointed with ``checkpointer``
+    (default: the configured ``CHECKPOINT_BACKEND``) and a failed or cancelled
+    run with the same ID resumes from the last completed node, reusing the
+    outputs of the chains that already completed.
+
+    If the request has a ``budget``, drivers, mitigations and assessments of
+    the later risks and the correlation tags are skipped when it runs low, and
+    the response is flagged as partial. With a time limit in the budget, calls
+    still running when its reserve starts are cancelled and the summary is
+    created from the results completed so far, so that the response is
+    returned by the deadline; what is missing is listed in
+    ``missing_sections``.
+    """
+
+    result = await _run(request, run_id, checkpointer)
+    return result["responses"][AudienceEnum(request.audience)]
+
+
+async def prepare_presentation_outputs(
+    request: MultiAudiencePresentationRequest,
+    run_id: str | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> MultiAudiencePresentationResponse:
+    """Create presentations for several audiences from one shared analysis.
+
+    The risks are identified, assessed and analysed once, covering what any
+    of the audiences sees; only the summaries are created per audience,
+    concurrently. Checkpointing and budgets work as in
+    :func:`prepare_presentation_output`.
+    """
 
-    app = _build_graph(request)
-    result = await app.ainvoke({"request": request})
-    return result["response"]
+    result = await _run(request, run_id, checkpointer)
+    response = MultiAudiencePresentationResponse(presentations=result["responses"])
+    response.response_info = combine_response_info(
+        result.get("response_info_list", []),
+        prompt_name="prepare_presentation_outputs",
+        model_name=settings.OPENAI_MODEL_NAME,
+    )
+    response.response_info.partial = any(
+        p.response_info.partial for p in response.presentations.values()
+    )
+    return response
@@ -0,0 +1,369 @@
+"""Workflow building a risk register across all risk categories of a project."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from functools import lru_cache
+from typing import Annotated, Dict, List, TypedDict
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, StateGraph
+
+from riskgpt.chains.risk_assessment import (
+    batch_assessment_saves_tokens,
+    risk_assessment_batch_chain,
+    risk_assessment_chain,
+)
+from riskgpt.chains.risk_categories import risk_categories_chain
+from riskgpt.chains.risk_identification import risk_identification_chain
+from riskgpt.config.settings import RiskGPTSettings
+from riskgpt.helpers.checkpointing import (
+    get_checkpointer,
+    run_with_checkpoint,
+    with_checkpointer,
+)
+from riskgpt.helpers.concurrency import gather_bounded
+from riskgpt.helpers.reducers import extend_list
+from riskgpt.helpers.similarity import similarity_clusters
+from riskgpt.logger import logger
+from riskgpt.models.base import (
+    ResponseInfo,
+    combine_response_info,
+    default_response_info,
+)
+from riskgpt.models.chains.assessment import (
+    AssessmentRequest,
+    AssessmentResponse,
+    BatchAssessmentRequest,
+    RiskToAssess,
+)
+from riskgpt.models.chains.categorization import CategoryRequest
+from riskgpt.models.chains.risk import Risk, RiskRequest, RiskResponse
+from riskgpt.models.workflows.risk_sweep import (
+    RiskRegisterEntry,
+    RiskSweepRequest,
+    RiskSweepResponse,
+)
+from riskgpt.storage.risk_register import RiskRegisterStore, get_risk_register
+
+settings = RiskGPTSettings()
+
+
+def _risk_register() -> RiskRegisterStore | None:
+    """Return the configured risk register, or None if risks are not persisted."""
+    if not settings.RISK_REGISTER_PATH:
+        return None
+    return get_risk_register(settings.RISK_REGISTER_PATH)
+
+
+class State(TypedDict, total=False):
+    request: RiskSweepRequest
+    categories: List[str]
+    identified: Dict[str, RiskResponse]
+    register: List[RiskRegisterEntry]
+    duplicates_removed: int
+    response_info_list: Annotated[List[ResponseInfo], extend_list]
+    response: RiskSweepResponse
+
+
+def initialize_state(state: State) -> State:
+    """Entry point of the workflow; the request is passed in the input state."""
+    if not isinstance(state.get("request"), RiskSweepRequest):
+        raise ValueError("The risk sweep requires a RiskSweepRequest in its state")
+    return {}
+
+
+async def identify_categories(state: State) -> State:
+    req = state["request"]
+    logger.info("Identify risk categories for '%s'", req.business_context.project_id)
+    res = await risk_categories_chain(
+        CategoryRequest(
+            business_context=req.business_context,
+            existing_categories=req.existing_categories,
+        )
+    )
+    # The model may repeat a category; every category is swept once
+    categories = list(dict.fromkeys(c.strip() for c in res.categories if c.strip()))
+    return {"categories": categories, "response_info_list": [res.response_info]}
+
+
+async def identify_category_risks(state: State) -> State:
+    """Identify the risks of all categories concurrently.
+
+    A failed identification is recorded for its category with the error in
+    its ``response_info`` and does not abort the sweep.
+    """
+    req = state["request"]
+    categories = state.get("categories", [])
+    store = _risk_register()
+
+    async def identify(category: str) -> RiskResponse:
+        logger.info("Identify risks for category '%s'", category)
+        existing_risks = None
+        if store is not None:
+            # Read in a worker thread so that the categories do not queue up
+            # on the event loop
+            existing_risks = (
+                await asyncio.to_thread(
+                    lambda: list(
+                        store.iter_risks(req.business_context.project_id, category)
+                    )
+                )
+                or None
+            )
+        return await risk_identification_chain(
+            RiskRequest(
+                business_context=req.business_context,
+                category=category,
+                max_risks=req.max_risks_per_category,
+                existing_risks=existing_risks,
+                existing_risks_digest=True,
+            )
+        )
+
+    results = await gather_bounded(
+        categories, identify, limit=settings.CATEGORY_CONCURRENCY
+    )
+
+    identified: Dict[str, RiskResponse] = {}
+    for category, res in zip(categories, results):
+        if isinstance(res, BaseException):
+            if not isinstance(res, Exception):
+                raise res
+            logger.error("Risk identification for '%s' failed: %s", category, res)
+            res = RiskResponse(
+                risks=[],
+                response_info=default_response_info(
+                    prompt_name="risk_identification",
+                    model_name=settings.OPENAI_MODEL_NAME,
+                    error=str(res) or type(res).__name__,
+                ),
+            )
+        identified[category] = res
+    return {"identified": identified}
+
+
+def deduplicate_risks(state: State) -> State:
+    """Merge near-identical risks identified in different categories.
+
+    Risks are compared by the cosine similarity of the TF-IDF vectors of their
+    titles and descriptions. Each group of near-identical risks is represented
+    by its most central risk, filed under that risk's category.
+    """
+    candidates = [
+        (category, risk)
+        for category, res in state.get("identified", {}).items()
+        for risk in res.risks
+    ]
+    clusters = similarity_clusters(
+        [f"{risk.title}. {risk.description}" for _, risk in candidates],
+        settings.RISK_DEDUP_THRESHOLD,
+    )
+    # Keep the order in which the risks were identified
+    clusters.sort(key=min)
+
+    register: List[RiskRegisterEntry] = []
+    for index, cluster in enumerate(clusters):
+        category, risk = candidates[cluster[0]]
+        duplicates = [candidates[member][0] for member in cluster[1:]]
+        register.append(
+            RiskRegisterEntry(
+                risk=Risk(
+                    id=f"RISK-{index + 1:03d}",
+                    title=risk.title,
+                    description=risk.description,
+                    category=category,
+                ),
+                duplicate_categories=[
+                    c for c in dict.fromkeys(duplicates) if c != category
+                ],
+            )
+        )
+
+    removed = len(candidates) - len(register)
+    logger.info(
+        "Merged %d near-identical risks, %d unique risks remain",
+        removed,
+        len(register),
+    )
+    return {"register": register, "duplicates_removed": removed}
+
+
+async def assess_unique_risks(state: State) -> State:
+    """Assess the unique risks of the register concurrently.
+
+    If batching is enabled and needs fewer tokens, the risks are assessed with
+    the risk_assessment_batch_chain instead.
+    """
+    req = state["request"]
+    register = state.get("register", [])
+
+    async def assess(entry: RiskRegisterEntry) -> AssessmentResponse:
+        logger.info("Assess risk '%s'", entry.risk.title)
+        return await risk_assessment_chain(
+            AssessmentRequest(
+                business_context=req.business_context,
+                risk_title=entry.risk.title,
+                risk_description=entry.risk.description,
+            )
+        )
+
+    batch = BatchAssessmentRequest(
+        business_context=req.business_context,
+        risks=[
+            RiskToAssess(
+                risk_id=entry.risk.id or str(i),
+                risk_title=entry.risk.title,
+                risk_description=entry.risk.description,
+            )
+            for i, entry in enumerate(register)
+        ],
+    )
+    results: List[AssessmentResponse | BaseException]
+    if batch_assessment_saves_tokens(batch):
+        logger.info("Assess %d risks in batches", len(register))
+        results = list((await risk_assessment_batch_chain(batch)).assessments.values())
+    else:
+        results = await gather_bounded(
+            register, assess, limit=settings.ASSESSMENT_CONCURRENCY
+        )
+
+    assessed: List[RiskRegisterEntry] = []
+    for entry, res in zip(register, results):
+        if isinstance(res, BaseException):
+            if not isinstance(res, Exception):
+                raise res
+            logger.error("Assessment of risk '%s' failed: %s", entry.risk.title, res)
+            res = AssessmentResponse(
+                response_info=default_response_info(
+                    prompt_name="risk_assessment",
+                    model_name=settings.OPENAI_MODEL_NAME,
+                    error=str(res) or type(res).__name__,
+                )
+            )
+        assessed.append(entry.model_copy(update={"assessment": res}))
+    return {"register": assessed}
+
+
+def _store_register(
+    project_id: str, register: List[RiskRegisterEntry]
+) -> List[RiskRegisterEntry]:
+    """Store the register in the risk register and return it with the stored ids.
+
+    Risks are matched to the stored risks of the project by title, so a risk
+    found again keeps its id across sweeps. Failed assessments are not stored.
+    """
+    store = _risk_register()
+    if store is None or not register:
+        return register
+    stored = store.upsert_risks(
+        project_id, [entry.risk.model_copy(update={"id": None}) for entry in register]
+    )
+    store.upsert_assessments(
+        project_id,
+        {
+            risk.id: entry.assessment
+            for risk, entry in zip(stored, register)
+            if risk.id
+            and entry.assessment is not None
+            and not entry.assessment.response_info.error
+        },
+    )
+    return [
+        entry.model_copy(update={"risk": risk}) for entry, risk in zip(register, stored)
+    ]
+
+
+def build_register(state: State) -> State:
+    """Combine the register with the costs per category and in total.
+
+    If ``RISK_REGISTER_PATH`` is set, the register is stored as well.
+    """
+    identified = state.get("identified", {})
+    register = _store_register(
+        state["request"].business_context.project_id, state.get("register", [])
+    )
+
+    category_costs: Dict[str, ResponseInfo] = {}
+    for category, res in identified.items():
+        infos = [res.response_info]
+        infos.extend(
+            entry.assessment.response_info
+            for entry in register
+            if entry.risk.category == category and entry.assessment is not None
+        )
+        info = combine_response_info(
+            infos, prompt_name="risk_sweep", model_name=settings.OPENAI_MODEL_NAME
+        )
+        info.error = res.response_info.error
+        category_costs[category] = info
+
+    response = RiskSweepResponse(
+        categories=state.get("categories", []),
+        risks=register,
+        duplicates_removed=state.get("duplicates_removed", 0),
+        category_costs=category_costs,
+    )
+    response.response_info = combine_response_info(
+        [*state.get("response_info_list", []), *category_costs.values()],
+        prompt_name="risk_sweep",
+        model_name=settings.OPENAI_MODEL_NAME,
+    )
+    return {"response": response}
+
+
+def get_risk_sweep_graph() -> StateGraph:
+    """Return the uncompiled risk sweep graph."""
+    graph = StateGraph(State)
+
+    graph.add_node("initialize", initialize_state)
+    graph.add_node("identify_categories", identify_categories)
+    graph.add_node("identify_category_risks", identify_category_risks)
+    graph.add_node("deduplicate_risks", deduplicate_risks)
+    graph.add_node("assess_unique_risks", assess_unique_risks)
+    graph.add_node("build_register", build_register)
+
+    graph.set_entry_point("initialize")
+    graph.add_edge("initialize", "identify_categories")
+    graph.add_edge("identify_categories", "identify_category_risks")
+    graph.add_edge("identify_category_risks", "deduplicate_risks")
+    graph.add_edge("deduplicate_risks", "assess_unique_risks")
+    graph.add_edge("assess_unique_risks", "build_register")
+    graph.add_edge("build_register", END)
+
+    return graph
+
+
+@lru_cache(maxsize=None)
+def _build_graph():
+    """Compile the risk sweep graph once and reuse it."""
+    return get_risk_sweep_graph().compile()
+
+
+async def risk_sweep(
+    request: RiskSweepRequest,
+    run_id: str | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> RiskSweepResponse:
+    """Identify and assess the risks of all categories of a project.
+
+    The categories are identified first, then the risks of all categories are
+    identified concurrently. Near-identical risks found in several categories
+    are merged locally, so that only the unique risks are assessed.
+
+    If a ``run_id`` is given, the run is checkpointed with ``checkpointer``
+    (default: the configured ``CHECKPOINT_BACKEND``) and a failed or cancelled
+    run with the same ID resumes from the last completed node.
+    """
+
+    if run_id is not None and checkpointer is None:
+        checkpointer = get_checkpointer(settings)
+    app = with_checkpointer(_build_graph(), checkpointer)
+    result = await run_with_checkpoint(
+        app,
+        {"request": request},
+        run_id,
+        max_age=timedelta(hours=settings.CHECKPOINT_TTL_HOURS),
+    )
+    return result["response"]
@@ -2,246 +2,367 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+from datetime import timedelta
+from functools import lru_cache
+from typing import Annotated, List, TypedDict
 
-import requests
-from api import fetch_documents
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
-from models import BusinessContext
 
-from riskgpt.chains.risk_assessment import risk_assessment_chain
+from riskgpt.api import afetch_documents
+from riskgpt.chains.risk_assessment import (
+    batch_assessment_saves_tokens,
+    risk_assessment_batch_chain,
+    risk_assessment_chain,
+)
 from riskgpt.chains.risk_identification import risk_identification_chain
 from riskgpt.config.settings import RiskGPTSettings
-from riskgpt.helpers.circuit_breaker import document_service_breaker, with_fallback
+from riskgpt.helpers.budget import before_deadline, current_budget, track_budget
+from riskgpt.helpers.checkpointing import (
+    get_checkpointer,
+    run_with_checkpoint,
+    with_checkpointer,
+)
+from riskgpt.helpers.concurrency import gather_bounded
+from riskgpt.helpers.document_service import document_excerpts, fetch_document_refs
+from riskgpt.helpers.reducers import extend_list
 from riskgpt.helpers.search import search
 from riskgpt.logger import logger
-from riskgpt.models.base import ResponseInfo
-from riskgpt.models.chains import RiskRequest, RiskResponse
-from riskgpt.models.chains.assessment import AssessmentRequest
-
-
-def _documents_fallback(context: BusinessContext) -> List[str]:
-    """Fallback when the document service is unavailable."""
-    logger.warning("Document service unavailable, returning empty list")
-    return []
-
-
-@document_service_breaker
-@with_fallback(_documents_fallback)
-def fetch_relevant_documents(context: BusinessContext) -> List[str]:
-    """Fetch relevant document UUIDs from the document service."""
-    logger.info("Fetching relevant documents for project %s", context.project_id)
-    settings = RiskGPTSettings()
-    if not settings.DOCUMENT_SERVICE_URL:
-        logger.warning("DOCUMENT_SERVICE_URL not configured")
-        return []
-
-    url = f"{settings.DOCUMENT_SERVICE_URL.rstrip('/')}/search"
-    try:
-        resp = requests.post(url, json=context.model_dump(), timeout=10)
-        resp.raise_for_status()
-    except Exception as exc:
-        logger.error("Document service request failed: %s", exc)
-        raise
-
-    try:
-        data = resp.json()
-    except Exception:
-        logger.warning("Invalid JSON response from document service")
-        return []
-
-    if isinstance(data, dict):
-        docs = data.get("documents")
-    else:
-        docs = data
-
-    if not isinstance(docs, list):
-        logger.warning("Unexpected document service response format")
-        return []
-
-    return [str(d) for d in docs]
-
-
-def _build_risk_workflow_graph(request: RiskRequest, use_full_workflow: bool = True):
+from riskgpt.models.base import (
+    ResponseInfo,
+    combine_response_info,
+    default_response_info,
+)
+from riskgpt.models.chains.assessment import (
+    AssessmentRequest,
+    AssessmentResponse,
+    BatchAssessmentRequest,
+    RiskToAssess,
+)
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskRequest, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.search import SearchRequest, SearchResult
+from riskgpt.storage.risk_register import RiskRegisterStore, get_risk_register
+
+
+async def fetch_relevant_documents(context: BusinessContext) -> List[str]:
+    """Fetch relevant document UUIDs from the document service.
+
+    Returns an empty list if the service is not configured or unavailable.
     """
-    Build and compile the risk workflow graph.
-
-    Args:
-        request: The risk request containing business context and category
+    return await fetch_document_refs(context)
+
+
+def _risk_register() -> RiskRegisterStore | None:
+    """Return the configured risk register, or None if risks are not persisted."""
+    path = RiskGPTSettings().RISK_REGISTER_PATH
+    if not path:
+        return None
+    return get_risk_register(path)
+
+
+class State(TypedDict, total=False):
+    request: RiskRequest
+    search_results: List[SearchResult]
+    references: List[str]
+    document_refs: List[str]
+    document_excerpts: str
+    risks: List[IdentifiedRisk]
+    risk_response: RiskResponse
+    assessments: List[AssessmentResponse]
+    response_info_list: Annotated[List[ResponseInfo], extend_list]
+    response: RiskResponse
+
+
+async def search_for_context(state: State) -> State:
+    """Search for relevant context using the search provider."""
+    req = state["request"]
+    logger.info("Searching for context related to '%s'", req.category)
+
+    # Build search query from business context and category
+    query = f"{req.business_context.project_description or req.business_context.project_id} {req.business_context.domain_knowledge or ''} {req.category} risks"
+    search_request = SearchRequest(
+        query=" ".join(query.split()),
+        source_type="risk_context",
+        max_results=RiskGPTSettings().MAX_SEARCH_RESULTS,
+    )
+
+    # The search providers are synchronous; run them in a thread so that the
+    # document retrieval running in parallel is not blocked
+    search_response = await before_deadline(
+        asyncio.to_thread(search, search_request), "context search"
+    )
+    if search_response is None:
+        return {"search_results": [], "references": []}
+    if search_response.success and search_response.results:
+        logger.info("Found %d search results", len(search_response.results))
+
+        # Extract references from search results
+        references = [result.title for result in search_response.results]
+        return {"search_results": search_response.results, "references": references}
+
+    logger.warning("Search failed or returned no results")
+    return {"search_results": [], "references": []}
+
+
+async def fetch_documents_step(state: State) -> State:
+    """Fetch relevant documents and their excerpts for the business context.
+
+    The content of the documents is prefetched as soon as the document service
+    returns their UUIDs, while the web search is still running, so that the
+    chains receive the excerpts without further requests.
     """
+    req = state["request"]
+    logger.info("Fetching documents for project '%s'", req.business_context.project_id)
 
-    if StateGraph is None:
-        raise ImportError("langgraph is required for this workflow")
-
-    graph = StateGraph(Dict[str, Any])
-
+    async def fetch() -> tuple[List[str], str]:
+        # Call the API helper that integrates with the document service
+        document_refs = await afetch_documents(req.business_context)
+        return document_refs, await document_excerpts(document_refs)
+
+    fetched = await before_deadline(fetch(), "document retrieval")
+    if fetched is None:
+        return {"document_refs": [], "document_excerpts": ""}
+    document_refs, excerpts = fetched
+
+    logger.info("Found %d relevant documents", len(document_refs))
+    return {"document_refs": document_refs, "document_excerpts": excerpts}
+
+
+async def identify_risks(state: State) -> State:
+    """Identify risks using direct implementation to avoid circular dependency."""
+    req = state["request"]
+    logger.info("Identify risks for category '%s'", req.category)
+
+    # Without explicit existing risks, the stored risks of the category are
+    # passed so that they are not identified again; only their titles go into
+    # the prompt as duplicates are filtered out locally
+    existing_risks = req.existing_risks
+    digest = req.existing_risks_digest
+    store = _risk_register()
+    if existing_risks is None and store is not None:
+        existing_risks = (
+            await asyncio.to_thread(
+                lambda: list(
+                    store.iter_risks(req.business_context.project_id, req.category)
+                )
+            )
+            or None
+        )
+        digest = True
+
+    # Create a copy of the request with document_refs if available
+    risk_request = RiskRequest(
+        business_context=req.business_context,
+        category=req.category,
+        max_risks=req.max_risks,
+        existing_risks=existing_risks,
+        existing_risks_digest=digest,
+        duplicate_handling=req.duplicate_handling,
+        document_excerpts=state.get("document_excerpts", ""),
+    )
+
+    # If we have document_refs in the state, add them to the request
+    if state.get("document_refs"):
+        risk_request.document_refs = state["document_refs"]
+
+    res = await before_deadline(
+        risk_identification_chain(risk_request), "risk identification"
+    )
+    if res is None:
+        return {"risks": []}
+
+    # Add document_refs if they exist in the state
+    if state.get("document_refs") and not res.document_refs:
+        res.document_refs = state["document_refs"]
+
+    update: State = {"risks": res.risks, "risk_response": res}
+    if res.response_info:
+        update["response_info_list"] = [res.response_info]
+    return update
+
+
+async def assess_risks(state: State) -> State:
+    """Assess the identified risks concurrently using the risk_assessment_chain.
+
+    At most ``ASSESSMENT_CONCURRENCY`` assessments run at the same time and the
+    assessments keep the order of the risks. If batching is enabled and needs
+    fewer tokens, the risks are assessed with the risk_assessment_batch_chain
+    instead. A failed assessment, or one cancelled at the deadline of the run,
+    is recorded as an empty assessment with the error in its ``response_info``
+    instead of aborting the workflow.
+    """
+    req = state["request"]
     settings = RiskGPTSettings()
-    totals: Dict[str, float | int] = {"tokens": 0, "cost": 0.0}
-
-    def initialize_state(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Initialize the state with the request if it exists in the input."""
-        if "request" in state and isinstance(state["request"], RiskRequest):
-            # Use the request from the input state
-            pass
-        else:
-            # Use the request passed to _build_graph
-            state["request"] = request
-
-        return state
+    references = state.get("references")
 
-    async def search_for_context(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Search for relevant context using the search provider."""
-        req = state["request"]
-        logger.info("Searching for context related to '%s'", req.category)
-
-        # Build search query from business context and category
-        query = f"{req.business_context.project_description or req.business_context.project_id} {req.business_context.domain_knowledge or ''} {req.category} risks"
-
-        # Perform search
-        search_results, success = search(query, "risk_context")
-        if success and search_results:
-            state["search_results"] = search_results
-            logger.info("Found %d search results", len(search_results))
+    def assessment_request(risk: IdentifiedRisk) -> AssessmentRequest:
+        # Create assessment request
+        assessment_request = AssessmentRequest(
+            business_context=req.business_context,
+            risk_description=risk.description,
+            risk_title=risk.title,
+            document_excerpts=state.get("document_excerpts", ""),
+        )
 
-            # Extract references from search results
-            references = [result.get("title", "") for result in search_results]
-            state["references"] = references
+        # If we have document_refs in the state, add them to the request
+        if state.get("document_refs"):
+            assessment_request.document_refs = state["document_refs"]
+
+        # If we have references in the state, add them to the request context
+        if references:
+            # We can't directly add references to the request, but we can enhance the context
+            additional_context = f"\nRelevant references: {', '.join(references)}"
+            assessment_request.risk_description += additional_context
+
+        return assessment_request
+
+    async def assess(request: AssessmentRequest) -> AssessmentResponse:
+        logger.info("Assess risk '%s'", request.risk_title)
+        what = f"assessment of '{request.risk_title}'"
+        res = await before_deadline(risk_assessment_chain(request), what)
+        if res is None:
+            raise asyncio.TimeoutError(f"Deadline of the run reached, cancelled {what}")
+        return res
+
+    risks = state.get("risks", [])
+    requests = [assessment_request(risk) for risk in risks]
+    # A batch shares the references of all its risks, so they are sent once
+    # with the document excerpts instead of in every risk description
+    excerpts = state.get("document_excerpts", "")
+    if references:
+        excerpts += f"\nRelevant references: {', '.join(references)}"
+    batch = BatchAssessmentRequest(
+        business_context=req.business_context,
+        risks=[
+            RiskToAssess(
+                risk_id=str(i),
+                risk_title=risk.title,
+                risk_description=risk.description,
+            )
+            for i, risk in enumerate(risks)
+        ],
+        document_refs=state.get("document_refs") or None,
+        document_excerpts=excerpts,
+    )
+    results: List[AssessmentResponse | BaseException]
+    if batch_assessment_saves_tokens(batch):
+        logger.info("Assess %d risks in batches", len(risks))
+        what = f"assessment of {len(risks)} risks"
+        batched = await before_deadline(risk_assessment_batch_chain(batch), what)
+        if batched is None:
+            cancelled = asyncio.TimeoutError(
+                f"Deadline of the run reached, cancelled {what}"
+            )
+            results = [cancelled for _ in risks]
         else:
-            logger.warning("Search failed or returned no results")
-            state["search_results"] = []
-            state["references"] = []
-
-        return state
-
-    def fetch_documents_step(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Fetch relevant documents for the business context."""
-        req = state["request"]
-        logger.info(
-            "Fetching documents for project '%s'", req.business_context.project_id
+            results = list(batched.assessments.values())
+    else:
+        results = await gather_bounded(
+            requests, assess, limit=settings.ASSESSMENT_CONCURRENCY
         )
 
-        # Call the API helper that integrates with the document service
-        document_refs = fetch_documents(req.business_context)
-        state["document_refs"] = document_refs
+    assessments: List[AssessmentResponse] = []
+    response_info_list = []
+    for risk, result in zip(risks, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logger.error("Assessment of risk '%s' failed: %s", risk.title, result)
+            assessment = AssessmentResponse(
+                response_info=default_response_info(
+                    prompt_name="risk_assessment",
+                    model_name=settings.OPENAI_MODEL_NAME,
+                    error=str(result) or type(result).__name__,
+                )
+            )
+        else:
+            assessment = result
+            if assessment.response_info:
+                response_info_list.append(assessment.response_info)
 
-        logger.info("Found %d relevant documents", len(document_refs))
-        return state
+        # Add document_refs to the response if they exist in the state
+        if state.get("document_refs") and not assessment.document_refs:
+            assessment.document_refs = state["document_refs"]
 
-    async def identify_risks(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Identify risks using direct implementation to avoid circular dependency."""
-        req = state["request"]
-        logger.info("Identify risks for category '%s'", req.category)
+        assessments.append(assessment)
 
-        # Create a copy of the request with document_refs if available
-        risk_request = RiskRequest(
-            business_context=req.business_context,
-            category=req.category,
-            max_risks=req.max_risks,
-            existing_risks=req.existing_risks,
-        )
+    return {"assessments": assessments, "response_info_list": response_info_list}
 
-        # If we have document_refs in the state, add them to the request
-        if "document_refs" in state and state["document_refs"]:
-            risk_request.document_refs = state["document_refs"]
-
-        res = await risk_identification_chain(risk_request)
-
-        if res.response_info:
-            totals["tokens"] += res.response_info.consumed_tokens
-            totals["cost"] += res.response_info.total_cost
-
-        # Add search references if they exist in the state
-        if "references" in state and state["references"]:
-            res.references = state["references"]
-
-        # Add document_refs if they exist in the state
-        if (
-            "document_refs" in state
-            and state["document_refs"]
-            and not hasattr(res, "document_refs")
-        ):
-            res.document_refs = state["document_refs"]
-
-        state["risks"] = res.risks
-        state["risk_response"] = res
-        return state
-
-    async def assess_risks(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Assess each identified risk using the get_assessment_chain."""
-        req = state["request"]
-        assessments = []
-
-        for risk in state.get("risks", []):
-            logger.info("Assess risk '%s'", risk.title)
-
-            # Create assessment request
-            assessment_request = AssessmentRequest(
-                business_context=req.business_context,
-                risk_description=risk.description,
-                risk_title=risk.title,
-            )
 
-            # If we have document_refs in the state, add them to the request
-            if "document_refs" in state and state["document_refs"]:
-                assessment_request.document_refs = state["document_refs"]
+def _store_risks(state: State) -> None:
+    """Store the identified risks and their assessments in the risk register.
 
-            # If we have references in the state, add them to the request context
-            if "references" in state and state["references"]:
-                # We can't directly add references to the request, but we can enhance the context
-                additional_context = (
-                    f"\nRelevant references: {', '.join(state['references'])}"
-                )
-                assessment_request.risk_description += additional_context
-
-            assess = await risk_assessment_chain(assessment_request)
+    Failed assessments are not stored so that they do not replace an earlier
+    assessment of the risk.
+    """
+    store = _risk_register()
+    risks = state.get("risks", [])
+    if store is None or not risks:
+        return
+    req = state["request"]
+    project_id = req.business_context.project_id
+    stored = store.upsert_risks(project_id, risks, category=req.category)
+    store.upsert_assessments(
+        project_id,
+        {
+            risk.id: assessment
+            for risk, assessment in zip(stored, state.get("assessments", []))
+            if risk.id and not assessment.response_info.error
+        },
+    )
+
+
+def prepare_response(state: State) -> State:
+    """Prepare the final response."""
+    _store_risks(state)
+    risk_response = state.get("risk_response")
+
+    # Create a new response with the same risks
+    # Check if risk_response is None before accessing its attributes
+    if risk_response is None:
+        # If risk_response is None, create a response with empty lists
+        response = RiskResponse(
+            risks=[],
+        )
+    else:
+        response = RiskResponse(
+            risks=risk_response.risks,
+        )
 
-            if assess.response_info:
-                totals["tokens"] += assess.response_info.consumed_tokens
-                totals["cost"] += assess.response_info.total_cost
+    # Add document_refs if they exist in the state
+    if state.get("document_refs"):
+        response.document_refs = state["document_refs"]
 
-            # Add document_refs to the response if they exist in the state
-            if (
-                "document_refs" in state
-                and state["document_refs"]
-                and not hasattr(assess, "document_refs")
-            ):
-                assess.document_refs = state["document_refs"]
+    # The assessments follow the risks; failed ones carry their error
+    if state.get("assessments"):
+        response.assessments = state["assessments"]
 
-            assessments.append(assess)
+    # Add response info
+    response.response_info = combine_response_info(
+        state.get("response_info_list", []),
+        prompt_name="risk_workflow",
+        model_name=RiskGPTSettings().OPENAI_MODEL_NAME,
+    )
+    budget = current_budget()
+    if budget is not None and budget.partial:
+        response.response_info.partial = True
 
-        state["assessments"] = assessments
-        return state
+    return {"response": response}
 
-    def prepare_response(state: Dict[str, Any]) -> Dict[str, Any]:
-        """Prepare the final response."""
-        risk_response = state.get("risk_response")
 
-        # Create a new response with the same risks
-        # Check if risk_response is None before accessing its attributes
-        if risk_response is None:
-            # If risk_response is None, create a response with empty lists
-            response = RiskResponse(
-                risks=[],
-            )
-        else:
-            response = RiskResponse(
-                risks=risk_response.risks,
-            )
+def initialize_state(state: State) -> State:
+    """Entry point of the workflow; the request is passed in the input state."""
+    if not isinstance(state.get("request"), RiskRequest):
+        raise ValueError("The risk workflow requires a RiskRequest in its state")
+    return {}
 
-        # Add document_refs if they exist in the state
-        if "document_refs" in state and state["document_refs"]:
-            response.document_refs = state["document_refs"]
 
-        # Add response info
-        response.response_info = ResponseInfo(
-            consumed_tokens=int(totals["tokens"]),
-            total_cost=float(totals["cost"]),
-            prompt_name="risk_workflow",
-            model_name=settings.OPENAI_MODEL_NAME,
-        )
+def get_risk_workflow_graph() -> StateGraph:
+    """Return the uncompiled risk workflow graph."""
 
-        state["response"] = response
-        return state
+    graph = StateGraph(State)
 
     # Add nodes to the graph
     graph.add_node("initialize", initialize_state)
@@ -254,28 +375,55 @@ def _build_risk_workflow_graph(request: RiskRequest, use_full_workflow: bool = T
     # Set the entry point
     graph.set_entry_point("initialize")
 
-    # Add edges to define the flow (always full workflow)
+    # Context search and document retrieval are independent and run in
+    # parallel; identify_risks waits for both
     graph.add_edge("initialize", "search_for_context")
-    graph.add_edge("search_for_context", "fetch_documents")
-    graph.add_edge("fetch_documents", "identify_risks")
+    graph.add_edge("initialize", "fetch_documents")
+    graph.add_edge(["search_for_context", "fetch_documents"], "identify_risks")
     graph.add_edge("identify_risks", "assess_risks")
     graph.add_edge("assess_risks", "prepare_response")
 
     graph.add_edge("prepare_response", END)
 
-    return graph.compile()
+    return graph
+
 
+@lru_cache(maxsize=None)
+def _build_risk_workflow_graph():
+    """Compile the risk workflow graph once and reuse it."""
+    return get_risk_workflow_graph().compile()
 
-async def risk_workflow(request: RiskRequest) -> RiskResponse:
+
+async def risk_workflow(
+    request: RiskRequest,
+    run_id: str | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> RiskResponse:
     """
     Asynchronous version of the risk workflow.
 
     Args:
-        request: The risk request containing business context and category
+        request: The risk request containing business context and category;
+            with ``max_seconds`` in its ``budget``, steps still running when
+            the reserve of the deadline starts are cancelled and the response
+            is built from the completed steps and flagged as partial
+        run_id: Optional ID of the run; a failed or cancelled run with the
+            same ID resumes from the last completed node
+        checkpointer: Checkpointer storing the runs, defaults to the
+            configured ``CHECKPOINT_BACKEND``
 
     Returns:
         A risk response containing identified risks and document references
     """
-    app = _build_risk_workflow_graph(request)
-    result = await app.ainvoke({"request": request})
+    settings = RiskGPTSettings()
+    if run_id is not None and checkpointer is None:
+        checkpointer = get_checkpointer(settings)
+    app = with_checkpointer(_build_risk_workflow_graph(), checkpointer)
+    with track_budget(request.budget, settings.BUDGET_RESERVE):
+        result = await run_with_checkpoint(
+            app,
+            {"request": request},
+            run_id,
+            max_age=timedelta(hours=settings.CHECKPOINT_TTL_HOURS),
+        )
     return result["response"]
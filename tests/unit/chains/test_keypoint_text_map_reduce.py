@@ -0,0 +1,154 @@
+import re
+from pathlib import Path
+
+import pytest
+import yaml
+from riskgpt.chains.keypoint_text import keypoint_text_map_reduce_chain
+from riskgpt.helpers.summarization import (
+    cluster_key_points,
+    partition_key_points,
+)
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.workflows.context import (
+    CitedTextResponse,
+    KeyPoint,
+    KeyPointTextRequest,
+    KeyPointTextResponse,
+)
+from tests.utils.responses import fake_response_info
+
+DATA = Path(__file__).resolve().parents[2] / "data" / "long_keypoints.yaml"
+
+
+@pytest.fixture
+def long_key_points():
+    with open(DATA, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    key_points = []
+    for line in data["inputs"]["key_points"].split("\n"):
+        match = re.match(
+            r"-\s*(news|regulatory|linkedin):\s*(.+?)\s+(https?://\S+)", line
+        )
+        if match:
+            topic, content, url = match.groups()
+            key_points.append(
+                KeyPoint(content=content, topic=TopicEnum(topic), source_url=url)
+            )
+    return key_points
+
+
+def test_partition_key_points_by_topic_and_budget():
+    key_points = [
+        KeyPoint(content="x" * 40, topic=topic, source_url=f"https://{i}")
+        for i, topic in enumerate(
+            [TopicEnum.NEWS, TopicEnum.REGULATORY, TopicEnum.NEWS, TopicEnum.NEWS]
+        )
+    ]
+
+    groups = partition_key_points(key_points, token_budget=35)
+
+    assert [[kp.source_url for kp in group] for group in groups] == [
+        ["https://0", "https://2"],
+        ["https://3"],
+        ["https://1"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_preserves_all_citations(monkeypatch, long_key_points):
+    monkeypatch.setenv("SUMMARY_GROUP_TOKEN_BUDGET", "3000")
+    reduce_calls = []
+
+    async def fake_partial(request):
+        markers = sorted(
+            {request.source_numbers[kp.source_url] for kp in request.key_points}
+        )
+        # Long partials so that they are merged in several rounds
+        return CitedTextResponse(
+            text=" ".join(f"Statement [{n}]. {'x' * 400}" for n in markers),
+            response_info=fake_response_info(),
+        )
+
+    async def fake_reduce(request):
+        reduce_calls.append(len(request.partial_texts))
+        return CitedTextResponse(
+            text=" ".join(request.partial_texts), response_info=fake_response_info()
+        )
+
+    monkeypatch.setattr(
+        "riskgpt.chains.keypoint_text.keypoint_partial_text_chain", fake_partial
+    )
+    final_requests = []
+
+    async def fake_final(request):
+        final_requests.append(request)
+        return KeyPointTextResponse(
+            text="Statement (Example, 2024).",
+            references=[
+                f"Example (2024). Title. [Online] Available at: {url}"
+                for url in request.sources.values()
+            ],
+            response_info=fake_response_info(),
+        )
+
+    monkeypatch.setattr(
+        "riskgpt.chains.keypoint_text.keypoint_reduce_text_chain", fake_reduce
+    )
+    monkeypatch.setattr(
+        "riskgpt.chains.keypoint_text.keypoint_final_text_chain", fake_final
+    )
+
+    response = await keypoint_text_map_reduce_chain(
+        KeyPointTextRequest(key_points=long_key_points)
+    )
+
+    urls = {kp.source_url for kp in long_key_points}
+    (final,) = final_requests
+    # The final merge sees every source cited by the partial summaries
+    assert set(final.sources.values()) == urls
+    assert all(f"[{n}]" in " ".join(final.partial_texts) for n in final.sources)
+    assert response.text == "Statement (Example, 2024)."
+    assert len(response.references) == len(urls)
+    assert reduce_calls and sum(reduce_calls) > len(reduce_calls)
+    assert response.response_info.prompt_name == "keypoint_text_map_reduce"
+
+
+def test_cluster_key_points_merges_near_duplicates(long_key_points):
+    duplicates = [
+        KeyPoint(
+            content="Interest rates are expected to stay high in 2025.",
+            topic=TopicEnum.NEWS,
+            source_url="https://a",
+        ),
+        KeyPoint(
+            content="Regulators require new climate disclosures.",
+            topic=TopicEnum.REGULATORY,
+            source_url="https://b",
+        ),
+        KeyPoint(
+            content="Interest rates are expected to stay high in 2025!",
+            topic=TopicEnum.NEWS,
+            source_url="https://c",
+            supporting_urls=["https://d"],
+        ),
+    ]
+
+    clusters = cluster_key_points(duplicates, threshold=0.8)
+
+    assert [kp.content for kp in clusters.key_points] == [
+        duplicates[0].content,
+        duplicates[1].content,
+    ]
+    assert clusters.key_points[0].all_source_urls() == [
+        "https://a",
+        "https://c",
+        "https://d",
+    ]
+    assert clusters.compression_ratio == 1.5
+
+    # The long fixture keeps every source even though points are collapsed
+    clustered = cluster_key_points(long_key_points, threshold=0.5)
+    assert clustered.compression_ratio > 1
+    assert {url for kp in clustered.key_points for url in kp.all_source_urls()} == {
+        kp.source_url for kp in long_key_points
+    }
@@ -0,0 +1,106 @@
+import pytest
+from riskgpt.chains.risk_assessment import (
+    batch_assessment_saves_tokens,
+    risk_assessment_batch_chain,
+)
+from riskgpt.models.chains.assessment import (
+    AssessmentResponse,
+    BatchAssessmentOutput,
+    BatchAssessmentRequest,
+    RiskToAssess,
+)
+from riskgpt.models.common import BusinessContext
+from tests.utils.responses import fake_response_info
+
+CHAIN = "riskgpt.chains.risk_assessment"
+
+
+def _request(count: int) -> BatchAssessmentRequest:
+    return BatchAssessmentRequest(
+        business_context=BusinessContext(
+            project_id="CRM", project_description="Implementation of a new CRM system"
+        ),
+        risks=[
+            RiskToAssess(
+                risk_id=f"R{i}", risk_title=f"risk {i}", risk_description="description"
+            )
+            for i in range(count)
+        ],
+        document_refs=["doc-1"],
+    )
+
+
+def test_batching_is_used_when_it_saves_tokens(monkeypatch):
+    monkeypatch.setenv("ASSESSMENT_BATCH_SIZE", "1")
+    assert not batch_assessment_saves_tokens(_request(4))
+
+    monkeypatch.setenv("ASSESSMENT_BATCH_SIZE", "5")
+    assert batch_assessment_saves_tokens(_request(4))
+    assert not batch_assessment_saves_tokens(_request(1))
+
+
+def test_malformed_items_are_dropped_while_parsing():
+    output = BatchAssessmentOutput.model_validate(
+        {
+            "assessments": [
+                {"risk_id": "R0", "probability": 0.2},
+                {"risk_id": "R1", "probability": "quite likely"},
+                {"probability": 0.4},
+            ]
+        }
+    )
+
+    assert [item.risk_id for item in output.assessments] == ["R0"]
+
+
+@pytest.mark.asyncio
+async def test_batch_falls_back_to_individual_calls(monkeypatch):
+    monkeypatch.setenv("ASSESSMENT_BATCH_SIZE", "3")
+    batches = []
+    individual = []
+
+    async def fake_batch(request):
+        ids = [risk.risk_id for risk in request.risks]
+        batches.append(ids)
+        if "R3" in ids:
+            raise RuntimeError("invalid JSON")
+        # R2 is missing and R9 is unknown
+        return BatchAssessmentOutput.model_validate(
+            {
+                "assessments": [
+                    {"risk_id": "R1", "probability": 0.1},
+                    {"risk_id": "R9", "probability": 0.9},
+                    {"risk_id": "R0", "probability": 0.0, "impact": 0.5},
+                ],
+                "response_info": fake_response_info(30).model_dump(),
+            }
+        )
+
+    async def fake_single(request):
+        individual.append(request.risk_title)
+        if request.risk_title == "risk 3":
+            raise RuntimeError("rate limited")
+        assert request.document_refs == ["doc-1"]
+        return AssessmentResponse(probability=0.2, response_info=fake_response_info(20))
+
+    monkeypatch.setattr(f"{CHAIN}._risk_assessment_batch", fake_batch)
+    monkeypatch.setattr(f"{CHAIN}.risk_assessment_chain", fake_single)
+
+    response = await risk_assessment_batch_chain(_request(4))
+
+    assert sorted(batches) == [["R0", "R1", "R2"], ["R3"]]
+    assert sorted(individual) == ["risk 2", "risk 3"]
+    assert list(response.assessments) == ["R0", "R1", "R2", "R3"]
+    assert [a.probability for a in response.assessments.values()] == [
+        0.0,
+        0.1,
+        0.2,
+        None,
+    ]
+    assert response.assessments["R0"].document_refs == ["doc-1"]
+    assert response.assessments["R3"].response_info.error == "rate limited"
+    assert response.fallback_risk_ids == ["R2", "R3"]
+    # The batch is split among its three risks, R2 adds its individual call
+    assert response.assessments["R0"].response_info.consumed_tokens == 10
+    assert response.assessments["R2"].response_info.consumed_tokens == 30
+    assert response.response_info.consumed_tokens == 50
@@ -0,0 +1,93 @@
+import pytest
+from riskgpt.chains.base import BaseChain
+from riskgpt.chains.risk_identification import (
+    filter_duplicate_risks,
+    risk_identification_chain,
+)
+from riskgpt.models.chains.risk import IdentifiedRisk, Risk, RiskRequest, RiskResponse
+from riskgpt.models.common import BusinessContext
+
+EXISTING = [
+    Risk(
+        id="RISK-001",
+        title="Data migration failure",
+        description="Customer data is lost during the migration.",
+    ),
+    Risk(title="Integration delays with ERP", description="Interfaces are late."),
+]
+
+IDENTIFIED = [
+    IdentifiedRisk(
+        title="Failure of the data migration",
+        description="Customer data may be lost while migrating.",
+    ),
+    IdentifiedRisk(title="Delays in ERP integration", description="ERP is late."),
+    IdentifiedRisk(
+        title="Low user adoption", description="Sales staff resist the new system."
+    ),
+    IdentifiedRisk(
+        title="Data migration delays",
+        description="The migration takes longer than planned.",
+    ),
+]
+
+
+def test_near_duplicates_are_dropped_or_flagged():
+    kept = filter_duplicate_risks(IDENTIFIED, EXISTING, 0.7)
+    assert [r.title for r in kept] == ["Low user adoption", "Data migration delays"]
+
+    flagged = filter_duplicate_risks(IDENTIFIED, EXISTING, 0.7, "flag")
+    assert [r.duplicate_of for r in flagged] == [
+        "RISK-001",
+        "Integration delays with ERP",
+        None,
+        None,
+    ]
+    assert filter_duplicate_risks(IDENTIFIED, [], 0.7) == IDENTIFIED
+
+
+def test_digest_lists_titles_within_the_limit():
+    request = RiskRequest(
+        business_context=BusinessContext(project_id="CRM"),
+        category="Technical",
+        existing_risks=[
+            Risk(title=f"Risk number {i}", description="x" * 500) for i in range(600)
+        ],
+    )
+    digest = request.format_existing_risks(200)
+
+    assert len(digest) < 250
+    assert digest.startswith("- Risk number 0\n- Risk number 1\n")
+    assert digest.endswith("- ... and 588 more")
+    assert (
+        "duplicate_of"
+        not in RiskResponse.model_json_schema()["$defs"]["IdentifiedRisk"]["properties"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_chain_sends_the_digest_and_filters_duplicates(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    sent = {}
+
+    async def fake_invoke(self, inputs):
+        sent.update(inputs)
+        return RiskResponse(risks=IDENTIFIED)
+
+    monkeypatch.setattr(BaseChain, "invoke", fake_invoke)
+    response = await risk_identification_chain(
+        RiskRequest(
+            business_context=BusinessContext(project_id="CRM"),
+            category="Technical",
+            existing_risks=EXISTING,
+            existing_risks_digest=True,
+        )
+    )
+
+    assert sent["existing_risks"] == (
+        "- Data migration failure\n- Integration delays with ERP"
+    )
+    assert [r.title for r in response.risks] == [
+        "Low user adoption",
+        "Data migration delays",
+    ]
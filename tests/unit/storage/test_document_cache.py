@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from riskgpt.models.utils.documents import Document
+from riskgpt.storage.document_cache import DocumentCache
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def _document(uuid: str, content: str = "content") -> Document:
+    return Document(uuid=uuid, title=f"Title {uuid}", content=content)
+
+
+def test_lru_with_disk_tier(tmp_path):
+    path = str(tmp_path / "documents.db")
+    cache = DocumentCache(max_entries=2, path=path, ttl=timedelta(hours=1))
+    for uuid in ["a", "b", "c"]:
+        cache.put(_document(uuid), now=NOW)
+
+    # "a" was evicted from memory but is still found on disk
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a", now=NOW).title == "Title a"
+    assert list(cache._memory) == ["c", "a"]
+    assert cache.get("a", now=NOW + timedelta(hours=2)) is None
+    cache.close()
+
+    # Documents survive reopening the cache
+    reopened = DocumentCache(max_entries=2, path=path)
+    assert reopened.get("b").content == "content"
+    assert DocumentCache().get("b") is None
+
+
+@pytest.mark.asyncio
+async def test_prefetch_loads_each_document_once():
+    cache = DocumentCache()
+    cache.put(_document("cached"))
+    calls = []
+
+    async def loader(uuids):
+        calls.append(list(uuids))
+        await asyncio.sleep(0.01)
+        return {uuid: _document(uuid) for uuid in uuids if uuid != "missing"}
+
+    cache.prefetch(["a", "b", "cached"], loader)
+    await asyncio.sleep(0)
+    documents = await cache.fetch(["b", "cached", "c", "missing"], loader)
+    await cache.wait(["a"])
+
+    assert calls == [["a", "b"], ["c", "missing"]]
+    assert list(documents) == ["b", "cached", "c"]
+    assert cache.get("a") is not None
+
+
+def test_excerpts_split_the_characters():
+    cache = DocumentCache()
+    cache.put(_document("a", "word " * 100))
+    cache.put(_document("b", "short"))
+
+    excerpts = cache.excerpts(["a", "unknown", "b"], max_chars=60)
+
+    lines = excerpts.splitlines()
+    assert len(lines) == 2
+    assert lines[0].startswith("[a] Title a: word")
+    assert lines[0].endswith("…")
+    assert len(lines[0]) < 60
+    assert lines[1] == "[b] Title b: short"
+    assert cache.excerpts(["unknown"], max_chars=60) == ""
@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+import pytest
+from riskgpt.helpers.circuit_breaker import document_service_breaker
+from riskgpt.helpers.document_service import DocumentServiceClient
+from riskgpt.helpers.embedding import HashingEmbedder
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.documents import DocumentInput
+from riskgpt.storage.document_index import DocumentIndex
+from riskgpt.storage.document_index_server import create_server
+
+TOPICS = ["supplier", "migration", "regulation", "staffing", "weather", "currency"]
+
+
+def _corpus(count: int):
+    rng = np.random.default_rng(1)
+    return [
+        DocumentInput(
+            title=f"Report {i}",
+            content=" ".join(
+                [TOPICS[i % len(TOPICS)]] * 3
+                + [f"word{w}" for w in rng.integers(0, 500, 20)]
+            ),
+            metadata={"topic": TOPICS[i % len(TOPICS)]},
+        )
+        for i in range(count)
+    ]
+
+
+def test_hashing_embedder_is_stable_and_normalised():
+    embedder = HashingEmbedder(dimension=64)
+    vectors = embedder.embed(["supplier delay risk", "supplier delay risk", ""])
+
+    assert vectors.dtype == np.float32
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any()
+
+
+def test_add_search_delete_and_reopen(tmp_path):
+    path = str(tmp_path / "index")
+    index = DocumentIndex(path)
+    uuids = index.vectorize(
+        [
+            DocumentInput(
+                title="Supplier audit",
+                content="Delays of the main steel supplier",
+                metadata={"project_id": "P1"},
+            ),
+            "Data migration of the customer database",
+            DocumentInput(uuid="fixed", content="Currency exchange rate exposure"),
+        ]
+    )
+
+    matches = index.search("steel supplier delays", limit=2)
+    assert matches[0].uuid == uuids[0]
+    assert matches[0].metadata == {"project_id": "P1"}
+    assert matches[0].score > matches[1].score
+    assert index.get("fixed").content == "Currency exchange rate exposure"
+
+    # Documents with a known UUID replace the indexed document
+    index.vectorize([DocumentInput(uuid="fixed", content="Weather risks on site")])
+    assert index.search("weather on site", limit=1)[0].uuid == "fixed"
+    assert index.delete([uuids[0], "unknown"]) == 1
+    assert uuids[0] not in {m.uuid for m in index.search("steel supplier")}
+    index.close()
+
+    reopened = DocumentIndex(path)
+    assert len(reopened) == 2
+    assert reopened.get(uuids[0]) is None
+    assert reopened.search("weather on site", limit=1)[0].uuid == "fixed"
+    with pytest.raises(ValueError):
+        DocumentIndex(path, HashingEmbedder(dimension=32))
+
+
+def test_storage_grows_and_compacts(tmp_path):
+    index = DocumentIndex(str(tmp_path / "index"), HashingEmbedder(dimension=32))
+    uuids = index.vectorize(_corpus(1500))
+    index.delete(uuids[:1000])
+
+    assert len(index) == 500
+    assert index._size == 500
+    assert index.search(TOPICS[0], limit=1)[0].uuid in uuids[1000:]
+    assert index.get(uuids[1200]).title == "Report 1200"
+    # More UUIDs than SQLite accepts in one statement
+    documents = index.get_many(uuids[::-1])
+    assert list(documents) == uuids[:999:-1]
+
+
+def test_ivf_search_probes_the_closest_clusters():
+    corpus = _corpus(600)
+    exact = DocumentIndex()
+    ivf = DocumentIndex(mode="ivf", n_lists=6, n_probe=2)
+    exact.vectorize(corpus)
+    ivf.vectorize(corpus)
+
+    for topic in TOPICS:
+        expected = exact.search(topic, limit=10)
+        found = ivf.search(topic, limit=10)
+        assert {m.metadata["topic"] for m in found} == {topic}
+        assert found[0].score == pytest.approx(expected[0].score)
+    assert ivf._centroids is not None
+    assert len(np.unique(ivf._assignments[:600])) > 1
+
+    # Documents added after clustering are assigned to their closest cluster
+    ivf.vectorize([DocumentInput(uuid="new", content="weather " * 5)])
+    assert ivf.search("weather", limit=1)[0].uuid == "new"
+
+
+@pytest.mark.asyncio
+async def test_http_app_serves_the_document_service_api():
+    index = DocumentIndex()
+    server = create_server(index, port=0, api_key="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = DocumentServiceClient(url, api_key="secret")
+    try:
+        response = await client._client.post(
+            "/vectorize",
+            json={"documents": [{"title": "Audit", "content": "Steel supplier"}]},
+        )
+        uuid = response.json()["uuids"][0]
+
+        matches = await client.search(
+            BusinessContext(project_id="P1", project_description="steel supplier")
+        )
+        documents = await client.get_many([uuid, "unknown"])
+        unauthorized = await client._client.get(
+            f"/get/{uuid}", headers={"Authorization": "Bearer wrong"}
+        )
+    finally:
+        await client.aclose()
+        server.shutdown()
+        server.server_close()
+
+    assert [m.uuid for m in matches] == [uuid]
+    assert list(documents) == [uuid]
+    assert documents[uuid].title == "Audit"
+    assert unauthorized.status_code == 401
+    # Unknown documents do not count as failures of the service
+    assert document_service_breaker.fail_counter == 0
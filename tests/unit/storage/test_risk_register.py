@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.chains.drivers import RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation
+from riskgpt.models.chains.risk import IdentifiedRisk, Risk
+from riskgpt.storage.risk_register import RiskRegisterStore
+
+
+def _risks(count: int, category: str):
+    return [
+        IdentifiedRisk(title=f"{category} risk {i}", description=f"Risk {i}")
+        for i in range(count)
+    ]
+
+
+def test_upsert_matches_risks_by_title_and_keeps_ids(tmp_path):
+    path = str(tmp_path / "register.db")
+    store = RiskRegisterStore(path)
+    stored = store.upsert_risks("P1", _risks(2, "Technical"), category="Technical")
+    assert [r.id for r in stored] == ["RISK-001", "RISK-002"]
+
+    again = store.upsert_risks(
+        "P1",
+        [
+            IdentifiedRisk(title="  technical RISK 1", description="Updated"),
+            Risk(title="Supplier delay", description="Late steel", category="Supply"),
+        ],
+        category="Technical",
+    )
+    assert [r.id for r in again] == ["RISK-002", "RISK-003"]
+    assert again[1].category == "Supply"
+    # Other projects are numbered independently
+    assert store.upsert_risks("P2", _risks(1, "Legal"))[0].id == "RISK-001"
+    store.close()
+
+    reopened = RiskRegisterStore(path)
+    assert reopened.count_risks("P1") == 3
+    assert reopened.count_risks("P1", category="Technical") == 2
+    assert reopened.get_risk("P1", "RISK-002").description == "Updated"
+    assert reopened.get_risk("P1", "RISK-999") is None
+
+
+def test_pages_and_streams_risks_by_category_and_tag():
+    store = RiskRegisterStore()
+    technical = store.upsert_risks("P1", _risks(25, "Technical"), category="Technical")
+    store.upsert_risks("P1", _risks(5, "Legal"), category="Legal")
+    store.replace_correlation_tags(
+        "P1",
+        [
+            CorrelationTag(
+                tag="ERP",
+                justification="Same system",
+                risk_ids=[technical[3].id, technical[7].id],
+            )
+        ],
+    )
+
+    first = store.list_risks("P1", category="Technical", limit=10)
+    second = store.list_risks("P1", category="Technical", limit=10, after=first[-1].id)
+    assert len(first) == len(second) == 10
+    assert first[-1].id < second[0].id
+    streamed = list(store.iter_risks("P1", category="Technical", page_size=7))
+    assert [r.id for r in streamed] == [r.id for r in technical]
+    assert len(list(store.iter_risks("P1"))) == 30
+    assert [r.id for r in store.list_risks("P1", tag="ERP")] == [
+        technical[3].id,
+        technical[7].id,
+    ]
+    tags = store.get_correlation_tags("P1", risk_id=technical[7].id)
+    assert [(t.tag, t.risk_ids) for t in tags] == [
+        ("ERP", [technical[3].id, technical[7].id])
+    ]
+
+
+def test_stores_results_per_risk_and_deletes_them():
+    store = RiskRegisterStore()
+    ids = [r.id for r in store.upsert_risks("P1", _risks(3, "Technical"))]
+    store.upsert_assessments(
+        "P1",
+        {ids[0]: AssessmentResponse(probability=0.4)},
+        now=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    store.upsert_assessments("P1", {ids[0]: AssessmentResponse(probability=0.6)})
+    driver = RiskDriver(driver="Vendor", explanation="Single vendor", influences="both")
+    store.upsert_drivers("P1", {ids[0]: [driver, driver], ids[1]: [driver]})
+    store.upsert_drivers("P1", {ids[0]: [driver]})
+    store.upsert_mitigations(
+        "P1",
+        {
+            ids[1]: [
+                Mitigation(driver="Vendor", mitigation="Second vendor", explanation="")
+            ]
+        },
+    )
+
+    assert store.get_assessments("P1")[ids[0]].probability == 0.6
+    assert list(store.get_assessments("P1", [ids[1], ids[2]])) == []
+    assert {k: len(v) for k, v in store.get_drivers("P1").items()} == {
+        ids[0]: 1,
+        ids[1]: 1,
+    }
+    assert store.get_mitigations("P1", [ids[1]])[ids[1]][0].mitigation == (
+        "Second vendor"
+    )
+
+    assert store.delete_risks("P1", [ids[0], "RISK-999"]) == 1
+    assert store.count_risks("P1") == 2
+    assert store.get_assessments("P1") == {}
+    assert list(store.get_drivers("P1")) == [ids[1]]
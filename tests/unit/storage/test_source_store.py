@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.utils.search import Source
+from riskgpt.models.workflows.context import KeyPoint, KeyPointTextResponse
+from riskgpt.storage.source_store import SourceStore, content_hash, key_points_hash
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def _source(url: str, date: str = "", content: str = "content") -> Source:
+    return Source(url=url, date=date, content=content, topic=TopicEnum.NEWS)
+
+
+def _points(url: str):
+    return [KeyPoint(content=f"{url} point", topic=TopicEnum.NEWS, source_url=url)]
+
+
+def test_store_roundtrip_and_prune(tmp_path):
+    store = SourceStore(str(tmp_path / "sources.db"))
+    store.save_source(
+        "P1", _source("https://new", "2025-05-01"), _points("https://new"), now=NOW
+    )
+    store.save_source(
+        "P1", _source("https://old", "2023-01-15"), _points("https://old"), now=NOW
+    )
+    store.save_source(
+        "P1",
+        _source("https://undated"),
+        _points("https://undated"),
+        now=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    store.save_source("P2", _source("https://new"), [], now=NOW)
+
+    hashes = store.get_content_hashes("P1", ["https://new", "https://missing"])
+    assert hashes == {"https://new": content_hash(_source("https://new"))}
+
+    assert store.prune("P1", horizon_months=12, now=NOW) == 2
+    assert [kp.source_url for kp in store.get_key_points("P1")] == ["https://new"]
+    assert store.get_content_hashes("P2", ["https://new"])
+    store.close()
+
+    # Data survives reopening the database
+    reopened = SourceStore(str(tmp_path / "sources.db"))
+    assert len(reopened.get_key_points("P1")) == 1
+
+
+def test_summary_is_keyed_by_key_point_set():
+    store = SourceStore()
+    points = _points("https://a") + _points("https://b")
+    store.save_summary(
+        "P1", key_points_hash(points), KeyPointTextResponse(text="t", references=["r"])
+    )
+
+    stored = store.get_summary("P1", key_points_hash(list(reversed(points))))
+    assert stored is not None and stored.references == ["r"]
+    assert store.get_summary("P1", key_points_hash(points[:1])) is None
+
+
+def test_key_points_are_filtered_by_query():
+    store = SourceStore()
+    store.save_source("P1", _source("https://a"), _points("https://a"), "q1", now=NOW)
+    store.save_source("P1", _source("https://b"), _points("https://b"), "q2", now=NOW)
+    store.touch_sources("P1", ["https://b"], "q1", now=NOW)
+
+    assert [kp.source_url for kp in store.get_key_points("P1", query="q1")] == [
+        "https://a",
+        "https://b",
+    ]
+    assert [kp.source_url for kp in store.get_key_points("P1", query="q2")] == [
+        "https://b"
+    ]
+    assert store.get_key_points("P1", query="other") == []
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from riskgpt.helpers import correlation
+from riskgpt.helpers.correlation import (
+    CorrelationModel,
+    iman_conover,
+    nearest_correlation,
+)
+from riskgpt.helpers.simulation import simulate_portfolio
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.utils.simulation import SimulatedRisk
+
+
+def _risks(count, probability=1.0, tag=None):
+    return [
+        SimulatedRisk(
+            risk_id=f"r{i}",
+            distribution="pert",
+            parameters={"min": 0.0, "mode": 10.0, "max": 100.0},
+            probability=probability,
+            correlation_tag=tag,
+        )
+        for i in range(count)
+    ]
+
+
+def _tag(name, *indices):
+    return CorrelationTag(
+        tag=name, justification="j", risk_ids=[f"r{i}" for i in indices]
+    )
+
+
+def test_single_tag_is_equicorrelated():
+    model = CorrelationModel.from_tags(_risks(4, tag="supply"), coefficient=0.3)
+
+    matrix = model.matrix()
+    assert np.allclose(matrix[np.triu_indices(4, 1)], 0.3)
+    scores = model.scores(np.random.default_rng(0), 200000)
+    assert np.allclose(np.corrcoef(scores), matrix, atol=0.01)
+
+
+def test_overlapping_tags_use_the_largest_coefficient():
+    model = CorrelationModel.from_tags(
+        _risks(5),
+        [_tag("a", 0, 1, 2), _tag("b", 2, 3), _tag("single", 4)],
+        coefficients={"a": 0.2, "b": 0.6},
+    )
+
+    matrix = model.matrix()
+    assert model.correlated.tolist() == [0, 1, 2, 3]
+    assert matrix[0, 1] == pytest.approx(0.2)
+    assert matrix[2, 3] == pytest.approx(0.6)
+    assert matrix[0, 3] == pytest.approx(0.0, abs=1e-12)
+    assert matrix[4, :4].tolist() == [0.0] * 4
+
+
+def test_nearest_correlation_is_positive_semidefinite():
+    matrix = np.array([[1.0, 0.9, -0.9], [0.9, 1.0, 0.9], [-0.9, 0.9, 1.0]])
+
+    repaired = nearest_correlation(matrix)
+
+    assert np.linalg.eigvalsh(repaired)[0] > -1e-8
+    assert np.allclose(np.diag(repaired), 1.0)
+    assert np.allclose(repaired, repaired.T)
+
+
+def test_large_blocks_use_tag_factors(monkeypatch):
+    monkeypatch.setattr(correlation, "MAX_DENSE_BLOCK", 2)
+    model = CorrelationModel.from_tags(
+        _risks(4), [_tag("a", 0, 1, 2), _tag("b", 2, 3)], coefficient=0.5
+    )
+
+    (block,) = model.blocks
+    assert isinstance(block, correlation._FactorBlock)
+    matrix = model.matrix()
+    assert matrix[0, 1] == pytest.approx(0.5)
+    assert 0 < matrix[1, 2] < 0.5
+    assert np.linalg.eigvalsh(matrix)[0] > -1e-12
+
+
+def test_invalid_coefficients_are_rejected():
+    with pytest.raises(ValueError, match="between 0 and 1"):
+        CorrelationModel.from_tags(_risks(2, tag="t"), coefficient=1.5)
+
+
+def test_iman_conover_keeps_the_marginals():
+    rng = np.random.default_rng(1)
+    losses = rng.exponential(size=(3, 1000))
+    scores = rng.standard_normal((3, 1000))
+
+    reordered = iman_conover(losses, scores)
+
+    assert np.allclose(np.sort(reordered, axis=1), np.sort(losses, axis=1))
+    assert (np.argsort(reordered, axis=1) == np.argsort(scores, axis=1)).all()
+
+
+def test_correlation_keeps_the_mean_and_raises_the_tail():
+    risks = _risks(20, probability=0.3, tag="vendor")
+    model = CorrelationModel.from_tags(risks, coefficient=0.8)
+
+    independent = simulate_portfolio(risks, 20000, seed=2)
+    correlated = simulate_portfolio(risks, 20000, seed=2, correlation=model)
+
+    assert correlated.expected_loss == pytest.approx(
+        independent.expected_loss, rel=0.02
+    )
+    assert correlated.cvar > 1.3 * independent.cvar
+    assert sum(c.tail_loss for c in correlated.contributions) == pytest.approx(
+        correlated.cvar
+    )
+
+
+def test_model_of_other_risks_is_rejected():
+    model = CorrelationModel.from_tags(_risks(3, tag="t"))
+
+    with pytest.raises(ValueError, match="same risks"):
+        simulate_portfolio(_risks(2), 100, correlation=model)
@@ -0,0 +1,167 @@
+import asyncio
+
+import httpx
+import pybreaker
+import pytest
+from riskgpt.api import fetch_documents
+from riskgpt.helpers.circuit_breaker import document_service_breaker
+from riskgpt.helpers.document_service import (
+    DocumentServiceClient,
+    close_document_clients,
+    document_excerpts,
+    fetch_document_refs,
+    get_document_client,
+)
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.documents import DocumentInput
+from riskgpt.storage.document_index import get_document_index
+
+CONTEXT = BusinessContext(project_id="CRM", project_description="New CRM system")
+
+
+@pytest.fixture(autouse=True)
+def closed_breaker():
+    document_service_breaker.close()
+    yield
+    document_service_breaker.close()
+
+
+def _client(handler) -> DocumentServiceClient:
+    return DocumentServiceClient(
+        "https://documents.example.com/",
+        api_key="secret",
+        transport=httpx.MockTransport(handler),
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_and_batched_get():
+    running = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal running, peak
+        assert request.headers["Authorization"] == "Bearer secret"
+        if request.url.path == "/search":
+            return httpx.Response(
+                200, json=["doc-1", {"uuid": "doc-2", "score": 0.8, "metadata": {}}]
+            )
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        uuid = request.url.path.rsplit("/", 1)[-1]
+        if uuid == "doc-3":
+            return httpx.Response(404)
+        return httpx.Response(
+            200, json={"title": f"Title {uuid}", "text": "content", "author": "A"}
+        )
+
+    client = _client(handler)
+    matches = await client.search(CONTEXT)
+    documents = await client.get_many(["doc-2", "doc-1", "doc-3", "doc-1"])
+    await client.aclose()
+
+    assert [m.uuid for m in matches] == ["doc-1", "doc-2"]
+    assert matches[1].score == 0.8
+    assert list(documents) == ["doc-2", "doc-1"]
+    assert documents["doc-1"].title == "Title doc-1"
+    assert documents["doc-1"].content == "content"
+    assert documents["doc-1"].metadata == {"author": "A"}
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_failures_open_the_breaker():
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    client = _client(handler)
+    for _ in range(document_service_breaker.fail_max - 1):
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.search(CONTEXT)
+    with pytest.raises(pybreaker.CircuitBreakerError):
+        await client.search(CONTEXT)
+    with pytest.raises(pybreaker.CircuitBreakerError):
+        await client.get("doc-1")
+    await client.aclose()
+
+    assert calls == document_service_breaker.fail_max
+    assert document_service_breaker.current_state == "open"
+
+
+@pytest.mark.asyncio
+async def test_shared_client_and_fallback(monkeypatch):
+    monkeypatch.delenv("DOCUMENT_SERVICE_URL", raising=False)
+    assert get_document_client() is None
+    assert await fetch_document_refs(CONTEXT) == []
+
+    monkeypatch.setenv("DOCUMENT_SERVICE_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("DOCUMENT_SERVICE_CONNECT_TIMEOUT", "0.5")
+    client = get_document_client()
+    assert client is get_document_client()
+    # The service is unreachable, the workflow continues without documents
+    assert await fetch_document_refs(CONTEXT) == []
+
+    await close_document_clients()
+    assert client.is_closed
+    assert get_document_client() is not client
+    await close_document_clients()
+
+
+def test_fetch_documents_without_service(monkeypatch):
+    monkeypatch.delenv("DOCUMENT_SERVICE_URL", raising=False)
+    assert fetch_documents(CONTEXT) == []
+
+
+@pytest.mark.asyncio
+async def test_documents_are_prefetched_after_search(monkeypatch):
+    gets = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/search":
+            return httpx.Response(200, json={"documents": ["doc-1", "doc-2"]})
+        gets.append(request.url.path)
+        return httpx.Response(200, json={"title": "Report", "content": "Delays"})
+
+    monkeypatch.setenv("DOCUMENT_SERVICE_URL", "https://documents.example.com")
+    monkeypatch.setenv("DOCUMENT_CACHE_SIZE", "7")
+    client = _client(handler)
+    monkeypatch.setattr(
+        "riskgpt.helpers.document_service.get_document_client", lambda: client
+    )
+
+    refs = await fetch_document_refs(CONTEXT)
+    excerpts = await document_excerpts(refs)
+    # Cached documents are not requested again
+    assert await document_excerpts(refs, max_chars=100) == excerpts
+    await client.aclose()
+
+    assert refs == ["doc-1", "doc-2"]
+    assert sorted(gets) == ["/get/doc-1", "/get/doc-2"]
+    assert excerpts.splitlines() == [
+        "[doc-1] Report: Delays",
+        "[doc-2] Report: Delays",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_local_index_is_used_without_service(monkeypatch, tmp_path):
+    monkeypatch.delenv("DOCUMENT_SERVICE_URL", raising=False)
+    monkeypatch.setenv("DOCUMENT_INDEX_PATH", str(tmp_path / "index"))
+    index = get_document_index()
+    [uuid, _] = index.vectorize(
+        [
+            DocumentInput(title="CRM rollout", content="Lessons of the CRM system"),
+            DocumentInput(title="Plant", content="Construction of a plant"),
+        ]
+    )
+
+    refs = await fetch_document_refs(CONTEXT)
+
+    assert refs[0] == uuid
+    assert (await document_excerpts(refs[:1])).startswith(f"[{uuid}] CRM rollout")
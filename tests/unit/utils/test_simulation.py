@@ -0,0 +1,202 @@
+import math
+
+import numpy as np
+import pytest
+from riskgpt.helpers import simulation
+from riskgpt.helpers.simulation import (
+    _WorstScenarios,
+    risk_from_assessment,
+    simulate_assessments,
+    simulate_portfolio,
+)
+from riskgpt.models.chains.assessment import AssessmentResponse, QuantitativeAssessment
+from riskgpt.models.chains.correlation import CorrelationTag
+from riskgpt.models.common import Dist
+from riskgpt.models.utils.simulation import SimulatedRisk
+
+
+def _risk(risk_id, distribution, probability=1.0, **parameters):
+    return SimulatedRisk(
+        risk_id=risk_id,
+        distribution=distribution,
+        parameters=parameters,
+        probability=probability,
+    )
+
+
+def test_fixed_losses_are_exact():
+    result = simulate_portfolio(
+        [_risk("a", "fixed", value=10.0), _risk("b", "fixed", value=5.0)],
+        iterations=1000,
+        seed=0,
+    )
+
+    assert result.p50 == result.p95 == result.var == result.cvar == 15.0
+    assert result.expected_loss == 15.0
+    assert [c.risk_id for c in result.contributions] == ["a", "b"]
+    assert [c.tail_share for c in result.contributions] == [2 / 3, 1 / 3]
+
+
+def test_occurrence_drives_the_tail():
+    result = simulate_portfolio(
+        [_risk("rare", "fixed", 0.1, value=100.0), _risk("base", "fixed", value=1.0)],
+        iterations=100000,
+        seed=1,
+    )
+
+    assert result.expected_loss == pytest.approx(11.0, rel=0.03)
+    assert result.p50 == result.p80 == 1.0
+    assert result.var == result.cvar == 101.0
+    rare = result.contributions[0]
+    assert rare.risk_id == "rare"
+    assert rare.expected_loss == pytest.approx(10.0, rel=0.03)
+    assert rare.tail_loss == 100.0
+
+
+@pytest.mark.parametrize(
+    "risk, mean, std",
+    [
+        (_risk("t", "triangular", min=0.0, mode=1.0, max=2.0), 1.0, math.sqrt(1 / 6)),
+        (_risk("p", "pert", min=0.0, mode=1.0, max=5.0), 1.5, None),
+        (_risk("n", "normal", mean=10.0, std=2.0), 10.0, 2.0),
+        (_risk("l", "lognormal", mu=0.0, sigma=0.5), math.exp(0.125), None),
+        (_risk("d", "triangular", min=3.0, mode=3.0, max=3.0), 3.0, 0.0),
+    ],
+)
+def test_distributions_are_sampled_correctly(risk, mean, std):
+    sampler = simulation.PortfolioSampler([risk])
+    samples = sampler.sample(np.random.default_rng(2), 200000)[:, 0]
+
+    assert samples.mean() == pytest.approx(mean, rel=0.01)
+    if std is not None:
+        assert samples.std() == pytest.approx(std, rel=0.01, abs=1e-9)
+
+
+def test_sparse_occurrences_keep_their_risk():
+    risks = [
+        _risk("a", "fixed", 0.2, value=1.0),
+        _risk("b", "triangular", 0.3, min=10.0, mode=10.0, max=10.0),
+        _risk("c", "fixed", 0.4, value=100.0),
+    ]
+    sampler = simulation.PortfolioSampler(risks)
+    losses = sampler.sample(np.random.default_rng(3), 100000)
+
+    ids = [risk.risk_id for risk in sampler.risks]
+    for column, value, probability in (
+        (ids.index("a"), 1.0, 0.2),
+        (ids.index("b"), 10.0, 0.3),
+        (ids.index("c"), 100.0, 0.4),
+    ):
+        assert set(np.unique(losses[:, column])) == {0.0, value}
+        assert (losses[:, column] > 0).mean() == pytest.approx(probability, abs=0.01)
+
+
+def test_worst_scenarios_across_blocks():
+    rng = np.random.default_rng(4)
+    losses = rng.random((5000, 3))
+    totals = losses.sum(axis=1)
+    worst = _WorstScenarios(250)
+    for start in range(0, 5000, 64):
+        worst.add(totals[start : start + 64], losses[start : start + 64])
+
+    tail_totals, tail_losses = worst.result()
+
+    expected = np.sort(totals)[-250:]
+    assert np.allclose(np.sort(tail_totals), expected)
+    assert np.allclose(tail_losses.sum(axis=1), tail_totals)
+
+
+def test_contributions_add_up_to_the_cvar(monkeypatch):
+    monkeypatch.setattr(simulation, "BLOCK_ELEMENTS", 256)
+    risks = [
+        _risk(f"r{i}", name, 0.5, **params)
+        for i, (name, params) in enumerate(
+            [
+                ("pert", {"min": 1.0, "mode": 2.0, "max": 6.0}),
+                ("normal", {"mean": 3.0, "std": 1.0}),
+                ("lognormal", {"mu": 1.0, "sigma": 0.3}),
+            ]
+        )
+    ]
+
+    result = simulate_portfolio(risks, iterations=10000, confidence=0.9, seed=5)
+
+    assert result.p50 <= result.p80 <= result.p95
+    assert result.var <= result.cvar
+    assert sum(c.tail_loss for c in result.contributions) == pytest.approx(result.cvar)
+    assert sum(c.tail_share for c in result.contributions) == pytest.approx(1.0)
+    assert sum(c.expected_loss for c in result.contributions) == pytest.approx(
+        result.expected_loss
+    )
+
+
+def test_invalid_parameters_are_rejected():
+    with pytest.raises(ValueError, match="requires std"):
+        _risk("n", "normal", mean=1.0)
+    with pytest.raises(ValueError, match="min <= mode <= max"):
+        _risk("t", "triangular", min=2.0, mode=1.0, max=3.0)
+
+
+def test_risk_from_assessment():
+    fitted = risk_from_assessment(
+        "a",
+        AssessmentResponse(
+            probability=0.3,
+            quantitative=QuantitativeAssessment(
+                distribution_fit=Dist(name="Normal", parameters={"mean": 5, "std": 1})
+            ),
+        ),
+    )
+    three_point = risk_from_assessment(
+        "b",
+        AssessmentResponse(
+            quantitative=QuantitativeAssessment(
+                minimum=10, most_likely=20, maximum=50, distribution="log-normal"
+            )
+        ),
+    )
+
+    assert fitted.distribution == "normal" and fitted.probability == 0.3
+    assert three_point.distribution == "lognormal" and three_point.probability == 1
+    assert math.exp(three_point.parameters["mu"]) == pytest.approx(math.sqrt(500))
+    assert risk_from_assessment("c", AssessmentResponse(probability=0.5)) is None
+
+
+def test_simulate_assessments_skips_qualitative_risks():
+    quantitative = AssessmentResponse(
+        probability=0.5,
+        quantitative=QuantitativeAssessment(minimum=10, most_likely=20, maximum=30),
+    )
+
+    result = simulate_assessments(
+        [("a", quantitative), ("b", AssessmentResponse(probability=0.9, impact=0.8))],
+        iterations=1000,
+        seed=6,
+    )
+
+    assert [c.risk_id for c in result.contributions] == ["a"]
+    assert simulate_assessments([("b", AssessmentResponse())]) is None
+
+
+def test_simulate_assessments_uses_per_tag_coefficients():
+    assessment = AssessmentResponse(
+        probability=0.3,
+        quantitative=QuantitativeAssessment(minimum=0, most_likely=10, maximum=100),
+    )
+    assessments = [(f"r{i}", assessment) for i in range(20)]
+    tags = [
+        CorrelationTag(
+            tag="vendor",
+            justification="j",
+            risk_ids=[risk_id for risk_id, _ in assessments],
+        )
+    ]
+
+    def cvar(**kwargs):
+        return simulate_assessments(
+            assessments, iterations=20000, seed=2, tags=tags, **kwargs
+        ).cvar
+
+    independent = cvar(coefficients={"other": 0.8})
+    assert cvar(coefficients={"vendor": 0.8}) > 1.3 * independent
+    assert cvar(coefficient=0.8, coefficients={"vendor": 0.0}) == independent
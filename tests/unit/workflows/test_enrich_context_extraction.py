@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from riskgpt.helpers.extraction import pack_sources
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.utils.search import Source
+from riskgpt.models.workflows.context import (
+    ExtractKeyPointsResponse,
+    ExtractPackedKeyPointsResponse,
+    KeyPoint,
+    PackedKeyPoint,
+)
+from riskgpt.workflows.enrich_context import extract_topic_key_points
+
+
+def _sources(count: int, topic: TopicEnum = TopicEnum.NEWS):
+    return [
+        Source(
+            title=f"source-{i}",
+            url=f"https://example.com/{i}",
+            content=f"content {i}",
+            topic=topic,
+        )
+        for i in range(count)
+    ]
+
+
+def _index(request) -> int:
+    # Content is formatted as "Title: source-<i>\n\nContent: ..."
+    return int(request.content.split("\n")[0].split("-")[-1])
+
+
+@pytest.fixture
+def fast_settings(monkeypatch):
+    monkeypatch.setattr("riskgpt.helpers.search.settings.EXTRACTION_CONCURRENCY", 2)
+    monkeypatch.setattr("riskgpt.helpers.search.settings.EXTRACTION_TIMEOUT", 0.2)
+
+
+@pytest.mark.asyncio
+async def test_extraction_is_concurrent_and_ordered(monkeypatch, fast_settings):
+    delays = [0.05, 0.01, 0.03, 0.0, 0.02]
+    running = 0
+    peak = 0
+
+    async def fake_extract(request):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        idx = _index(request)
+        await asyncio.sleep(delays[idx])
+        running -= 1
+        return ExtractKeyPointsResponse(
+            points=[KeyPoint(content=f"point {idx}", topic=TopicEnum.NEWS)]
+        )
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+
+    state = {"sources": _sources(5) + _sources(2, TopicEnum.REGULATORY)}
+    result = await extract_topic_key_points(state, TopicEnum.NEWS)
+
+    assert peak == 2
+    assert [kp.content for kp in result["key_points"]] == [
+        f"point {i}" for i in range(5)
+    ]
+    assert [kp.source_url for kp in result["key_points"]] == [
+        f"https://example.com/{i}" for i in range(5)
+    ]
+    assert len(result["response_info_list"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_extraction_skips_timed_out_sources(monkeypatch, fast_settings):
+    async def fake_extract(request):
+        idx = _index(request)
+        if idx == 1:
+            await asyncio.sleep(5)
+        return ExtractKeyPointsResponse(
+            points=[KeyPoint(content=f"point {idx}", topic=TopicEnum.NEWS)]
+        )
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+
+    result = await extract_topic_key_points({"sources": _sources(3)}, TopicEnum.NEWS)
+
+    assert [kp.content for kp in result["key_points"]] == ["point 0", "point 2"]
+
+
+def test_pack_sources_respects_budget():
+    sources = _sources(4)
+    sources[2].content = "x" * 4000
+
+    groups = pack_sources(sources, token_budget=100)
+
+    assert [[s.url for s in group] for group in groups] == [
+        ["https://example.com/0", "https://example.com/1", "https://example.com/3"],
+        ["https://example.com/2"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_packed_extraction_maps_points_to_sources(monkeypatch, fast_settings):
+    monkeypatch.setattr("riskgpt.helpers.search.settings.EXTRACTION_PACKING", True)
+    monkeypatch.setattr(
+        "riskgpt.helpers.search.settings.EXTRACTION_PACK_TOKEN_BUDGET", 1000
+    )
+    packed_requests = []
+
+    async def fake_packed(request):
+        packed_requests.append(request)
+        return ExtractPackedKeyPointsResponse(
+            points=[
+                PackedKeyPoint(source_index=2, content="from 2"),
+                PackedKeyPoint(source_index=0, content="from 0"),
+                PackedKeyPoint(source_index=7, content="invalid"),
+            ]
+        )
+
+    async def fail_single(request):
+        raise AssertionError("single extraction should not be used")
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_packed_key_points", fake_packed
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fail_single
+    )
+
+    result = await extract_topic_key_points({"sources": _sources(3)}, TopicEnum.NEWS)
+
+    assert len(packed_requests) == 1
+    assert "[Source 2]" in packed_requests[0].format_contents()
+    assert [(kp.content, kp.source_url) for kp in result["key_points"]] == [
+        ("from 0", "https://example.com/0"),
+        ("from 2", "https://example.com/2"),
+    ]
+    assert all(kp.topic == TopicEnum.NEWS for kp in result["key_points"])
+    assert len(result["response_info_list"]) == 1
@@ -0,0 +1,81 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.utils.search import SearchResponse, SearchResult
+from riskgpt.models.workflows.context import (
+    EnrichContextRequest,
+    ExtractKeyPointsResponse,
+    KeyPoint,
+    KeyPointTextResponse,
+)
+from riskgpt.workflows.enrich_context import enrich_context
+from tests.utils.responses import fake_response_info
+
+
+@pytest.mark.asyncio
+async def test_rerun_only_extracts_changed_sources(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        "riskgpt.helpers.search.settings.SOURCE_STORE_PATH",
+        str(tmp_path / "sources.db"),
+    )
+    contents = {"news": ["a", "b"], "linkedin": [], "regulatory": ["c"]}
+
+    def fake_search(search_request):
+        topic = search_request.source_type
+        return SearchResponse(
+            results=[
+                SearchResult(
+                    title=f"{topic} {i}",
+                    url=f"https://example.com/{topic}/{i}",
+                    content=content,
+                )
+                for i, content in enumerate(contents[topic])
+            ]
+        )
+
+    extracted = []
+
+    async def fake_extract(request):
+        extracted.append(request.content)
+        return ExtractKeyPointsResponse(
+            points=[KeyPoint(content=request.content, topic=TopicEnum.NEWS)],
+            response_info=fake_response_info(),
+        )
+
+    summary = AsyncMock(return_value=KeyPointTextResponse(text="text", references=[]))
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.search", fake_search)
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.keypoint_text_chain", summary)
+    request = EnrichContextRequest(
+        business_context=BusinessContext(project_id="PRJ-1"), focus_keywords=["ai"]
+    )
+
+    await enrich_context(request)
+    assert len(extracted) == 3
+    assert summary.await_count == 1
+
+    # Nothing changed: no extraction and the stored summary is reused
+    response = await enrich_context(request)
+    assert len(extracted) == 3
+    assert summary.await_count == 1
+    assert response.full_report.startswith("text")
+    assert response.response_info.consumed_tokens == 0
+
+    # One source changed: only it is extracted and the summary is regenerated
+    contents["news"][1] = "b2"
+    await enrich_context(request)
+    assert extracted[3:] == ["Title: news 1\n\nContent: b2"]
+    assert summary.await_count == 2
+    assert len(summary.await_args.args[0].key_points) == 3
+
+    # Sources stored for another query of the project are not summarized
+    other = EnrichContextRequest(
+        business_context=BusinessContext(project_id="PRJ-1"), focus_keywords=["ml"]
+    )
+    contents.update(news=["d"], regulatory=[])
+    await enrich_context(other)
+    assert len(summary.await_args.args[0].key_points) == 1
@@ -0,0 +1,119 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.utils.search import SearchResponse, SearchResult, Source
+from riskgpt.models.workflows.context import (
+    EnrichContextRequest,
+    ExtractKeyPointsResponse,
+    KeyPoint,
+    KeyPointTextResponse,
+)
+from riskgpt.workflows.enrich_context import (
+    enrich_context,
+    merge_unique,
+    source_key,
+)
+from tests.utils.responses import fake_response_info
+
+POINTS_PER_SOURCE = 2
+
+
+@pytest.fixture
+def test_request():
+    return EnrichContextRequest(
+        business_context=BusinessContext(project_id="PRJ-1"),
+        focus_keywords=["ai"],
+    )
+
+
+def _search_returning(count: int):
+    def fake_search(search_request):
+        topic = search_request.source_type
+        return SearchResponse(
+            results=[
+                SearchResult(
+                    title=f"{topic} {i}",
+                    url=f"https://example.com/{topic}/{i}",
+                    type=topic,
+                    content=f"{topic} content {i}",
+                )
+                for i in range(count)
+            ]
+        )
+
+    return fake_search
+
+
+async def fake_extract(request):
+    return ExtractKeyPointsResponse(
+        points=[
+            KeyPoint(content=f"{request.content} #{i}", topic=TopicEnum.NEWS)
+            for i in range(POINTS_PER_SOURCE)
+        ],
+        response_info=fake_response_info(),
+    )
+
+
+def test_merge_unique_skips_known_items():
+    reducer = merge_unique(source_key)
+    first = [Source(url="https://a", topic=TopicEnum.NEWS)]
+
+    merged = reducer(None, first)
+    merged = reducer(merged, [Source(url="https://a", topic=TopicEnum.REGULATORY)])
+    merged = reducer(merged, [Source(url="https://b", topic=TopicEnum.NEWS)])
+
+    assert [s.url for s in merged] == ["https://a", "https://b"]
+    assert merged[0].topic == TopicEnum.NEWS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("per_topic", [1, 3, 6])
+async def test_item_counts_are_linear_in_sources(monkeypatch, test_request, per_topic):
+    summary = AsyncMock(
+        return_value=KeyPointTextResponse(
+            text="text",
+            references=[],
+            response_info=fake_response_info(5),
+        )
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.search", _search_returning(per_topic)
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.keypoint_text_chain", summary)
+
+    response = await enrich_context(test_request)
+
+    sources = 3 * per_topic
+    summary.assert_awaited_once()
+    key_points = summary.await_args.args[0].key_points
+    assert len(key_points) == sources * POINTS_PER_SOURCE
+    assert response.sector_summary == f"Collected {sources} external sources for PRJ-1."
+    assert response.response_info.consumed_tokens == sources * 10 + 5
+
+
+@pytest.mark.asyncio
+async def test_near_identical_key_points_are_clustered(monkeypatch, test_request):
+    summary = AsyncMock(return_value=KeyPointTextResponse(text="text", references=[]))
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.search", _search_returning(2))
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.keypoint_text_chain", summary)
+    monkeypatch.setattr(
+        "riskgpt.helpers.search.settings.KEYPOINT_DEDUP_THRESHOLD", 0.99
+    )
+
+    response = await enrich_context(test_request)
+
+    key_points = summary.await_args.args[0].key_points
+    # The points of a topic differ only in their numbers
+    assert [kp.supporting_urls for kp in key_points] == [
+        [f"https://example.com/{topic}/1"]
+        for topic in ("news", "linkedin", "regulatory")
+    ]
+    assert response.response_info.compression_ratio == 4.0
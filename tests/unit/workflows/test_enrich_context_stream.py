@@ -0,0 +1,120 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from riskgpt.helpers.budget import current_budget
+from riskgpt.helpers.checkpointing import MemoryCheckpointer
+from riskgpt.models.common import BusinessContext, WorkflowBudget
+from riskgpt.models.enums import TopicEnum
+from riskgpt.models.utils.search import SearchResponse, SearchResult
+from riskgpt.models.workflows.context import (
+    EnrichContextRequest,
+    ExtractKeyPointsResponse,
+    KeyPoint,
+    KeyPointTextResponse,
+)
+from riskgpt.workflows.enrich_context import enrich_context_stream
+
+
+def fake_search(search_request):
+    topic = search_request.source_type
+    return SearchResponse(
+        results=[
+            SearchResult(title=f"{topic} {i}", url=f"https://example.com/{i}")
+            for i in range(2)
+        ]
+    )
+
+
+@pytest.fixture
+def test_request():
+    return EnrichContextRequest(
+        business_context=BusinessContext(project_id="PRJ-1"), focus_keywords=["ai"]
+    )
+
+
+@pytest.fixture
+def summary(monkeypatch):
+    async def fake_extract(request):
+        await asyncio.sleep(0.01)
+        return ExtractKeyPointsResponse(
+            points=[KeyPoint(content=request.content, topic=TopicEnum.NEWS)]
+        )
+
+    summary = AsyncMock(return_value=KeyPointTextResponse(text="text", references=[]))
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.search", fake_search)
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.keypoint_text_chain", summary)
+    return summary
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_typed_events(summary, test_request):
+    events = [event async for event in enrich_context_stream(test_request)]
+    types = [event.type for event in events]
+
+    assert types.count("search_completed") == 3
+    # All topics return the same URLs, so only two sources are admitted
+    assert types.count("source_admitted") == 2
+    assert types.count("key_points_extracted") == 2
+    assert types.index("source_admitted") < types.index("key_points_extracted")
+    assert types[-1] == "final_response"
+    assert events[-1].response.sector_summary.startswith("Collected 2")
+
+
+@pytest.mark.asyncio
+async def test_stream_can_be_cancelled_early(summary, test_request):
+    stream = enrich_context_stream(test_request)
+    async for event in stream:
+        if event.type == "source_admitted":
+            break
+    await stream.aclose()
+
+    summary.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_budget_is_not_set_in_the_consuming_task(summary, test_request):
+    test_request.budget = WorkflowBudget(max_tokens=1000)
+
+    async for _ in enrich_context_stream(test_request):
+        assert current_budget() is None
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_a_checkpointed_run(monkeypatch, summary, test_request):
+    checkpointer = MemoryCheckpointer()
+    failures = [RuntimeError("rate limited")]
+
+    async def extract(request):
+        if failures:
+            raise failures.pop()
+        return ExtractKeyPointsResponse(
+            points=[KeyPoint(content=request.content, topic=TopicEnum.NEWS)]
+        )
+
+    monkeypatch.setattr("riskgpt.workflows.enrich_context.extract_key_points", extract)
+
+    with pytest.raises(RuntimeError):
+        async for _ in enrich_context_stream(test_request, "run-1", checkpointer):
+            pass
+    events = [
+        event
+        async for event in enrich_context_stream(test_request, "run-1", checkpointer)
+    ]
+
+    # The searches are not repeated
+    types = [event.type for event in events]
+    assert "search_completed" not in types
+    assert types[-1] == "final_response"
+    summary.assert_awaited_once()
+
+    # A finished run only yields its response
+    again = [
+        event
+        async for event in enrich_context_stream(test_request, "run-1", checkpointer)
+    ]
+    assert again == events[-1:]
+    summary.assert_awaited_once()
@@ -0,0 +1,457 @@
+import asyncio
+
+import pytest
+from riskgpt.models.chains.assessment import AssessmentResponse, QuantitativeAssessment
+from riskgpt.models.chains.communication import CommunicationResponse
+from riskgpt.models.chains.correlation import CorrelationTag, CorrelationTagResponse
+from riskgpt.models.chains.drivers import DriverResponse, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.workflows.presentation import (
+    MultiAudiencePresentationRequest,
+    PresentationRequest,
+)
+from riskgpt.workflows.prepare_presentation_output import (
+    prepare_presentation_output,
+    prepare_presentation_outputs,
+    simulation_seed,
+)
+from riskgpt.storage.risk_register import get_risk_register
+from tests.utils.responses import fake_response_info
+
+PRESENTATION = "riskgpt.workflows.prepare_presentation_output"
+
+
+@pytest.mark.asyncio
+async def test_risks_run_through_concurrent_pipelines(monkeypatch):
+    monkeypatch.setattr(f"{PRESENTATION}.settings.PRESENTATION_CONCURRENCY", 3)
+    running = 0
+    peak = 0
+    events = []
+
+    def tracked(name, make_response, delay=0.02):
+        async def chain(request):
+            nonlocal running, peak
+            title = request.risk_title if name == "assess" else request.risk.title
+            running += 1
+            peak = max(peak, running)
+            events.append(("start", name, title))
+            await asyncio.sleep(delay)
+            running -= 1
+            events.append(("end", name, title))
+            return make_response(request)
+
+        return chain
+
+    async def identification(request):
+        return RiskResponse(
+            risks=[
+                IdentifiedRisk(title=f"risk {i}", description="d") for i in range(4)
+            ],
+            response_info=fake_response_info(),
+        )
+
+    monkeypatch.setattr(f"{PRESENTATION}.risk_identification_chain", identification)
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_assessment_chain",
+        tracked(
+            "assess",
+            lambda r: AssessmentResponse(
+                probability=int(r.risk_title[-1]) / 10,
+                response_info=fake_response_info(),
+            ),
+            delay=0.05,
+        ),
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_drivers_chain",
+        tracked(
+            "drivers",
+            lambda r: DriverResponse(
+                drivers=[
+                    RiskDriver(
+                        driver=f"driver of {r.risk.title}",
+                        explanation="e",
+                        influences="both",
+                    )
+                ],
+                response_info=fake_response_info(),
+            ),
+        ),
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_mitigations_chain",
+        tracked(
+            "mitigations",
+            lambda r: MitigationResponse(
+                mitigations=[
+                    Mitigation(
+                        driver=r.risk_drivers[0].driver,
+                        mitigation=f"mitigate {r.risk_drivers[0].driver}",
+                        explanation="e",
+                    )
+                ],
+                response_info=fake_response_info(),
+            ),
+        ),
+    )
+
+    async def tags(request):
+        # Correlation joins once all pipelines are done
+        assert running == 0
+        return CorrelationTagResponse(
+            correlation_tags=[], response_info=fake_response_info()
+        )
+
+    async def communication(request):
+        return CommunicationResponse(
+            summary="summary", response_info=fake_response_info()
+        )
+
+    monkeypatch.setattr(f"{PRESENTATION}.correlation_tags_chain", tags)
+    monkeypatch.setattr(f"{PRESENTATION}.communicate_risks_chain", communication)
+
+    response = await prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+        )
+    )
+
+    assert peak == 3
+    # The assessment of a risk overlaps with the identification of its drivers
+    first_assessment_end = events.index(("end", "assess", "risk 0"))
+    assert ("start", "drivers", "risk 0") in events[:first_assessment_end]
+    # Mitigations only start after the drivers of their own risk
+    for i in range(4):
+        assert events.index(("end", "drivers", f"risk {i}")) < events.index(
+            ("start", "mitigations", f"risk {i}")
+        )
+    assert response.key_drivers == [f"driver of risk {i}" for i in range(4)]
+    assert response.mitigations == [f"mitigate driver of risk {i}" for i in range(4)]
+    assert response.quantitative_summary.splitlines()[3] == "risk 3: P=0.3, I=n/a"
+    assert response.response_info.consumed_tokens == 10 * (1 + 3 * 4 + 2)
+
+
+@pytest.mark.asyncio
+async def test_executive_output_only_analyses_the_top_risks(monkeypatch):
+    scores = {
+        "a": (0.1, 0.2),
+        "b": (0.9, 0.8),
+        "c": None,
+        "d": (0.5, 0.5),
+        "e": (0.3, 0.9),
+    }
+    analysed = []
+
+    async def identification(request):
+        return RiskResponse(
+            risks=[IdentifiedRisk(title=title, description="d") for title in scores],
+            response_info=fake_response_info(),
+        )
+
+    async def assessment(request):
+        score = scores[request.risk_title]
+        if score is None:
+            return AssessmentResponse(response_info=fake_response_info())
+        return AssessmentResponse(
+            probability=score[0], impact=score[1], response_info=fake_response_info()
+        )
+
+    async def drivers(request):
+        analysed.append(request.risk.title)
+        return DriverResponse(drivers=[], response_info=fake_response_info())
+
+    async def mitigations(request):
+        return MitigationResponse(mitigations=[], response_info=fake_response_info())
+
+    async def tags(request):
+        raise AssertionError("executives do not see correlation tags")
+
+    async def communication(request):
+        assert [r.title for r in request.risks] == ["b", "e", "d"]
+        return CommunicationResponse(
+            summary="summary", response_info=fake_response_info()
+        )
+
+    for name, chain in {
+        "risk_identification_chain": identification,
+        "risk_assessment_chain": assessment,
+        "risk_drivers_chain": drivers,
+        "risk_mitigations_chain": mitigations,
+        "correlation_tags_chain": tags,
+        "communicate_risks_chain": communication,
+    }.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", chain)
+
+    response = await prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.executive,
+        )
+    )
+
+    assert sorted(analysed) == ["b", "d", "e"]
+    assert response.main_risks == ["b", "e", "d"]
+    assert response.correlation_tags == []
+    assert response.chart_placeholders == ["executive_overview_chart"]
+    assert response.open_questions is None
+    # identification + 5 assessments + drivers and mitigations of 3 risks
+    assert response.response_info.consumed_tokens == 10 * (1 + 5 + 2 * 3 + 1)
+
+
+@pytest.mark.asyncio
+async def test_audiences_share_one_analysis(monkeypatch):
+    calls = {"drivers": 0, "tags": 0}
+    audiences = []
+
+    async def identification(request):
+        return RiskResponse(
+            risks=[
+                IdentifiedRisk(title=f"risk {i}", description="d") for i in range(5)
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def assessment(request):
+        index = int(request.risk_title[-1])
+        return AssessmentResponse(
+            probability=index / 10, impact=0.5, response_info=fake_response_info()
+        )
+
+    async def drivers(request):
+        calls["drivers"] += 1
+        return DriverResponse(
+            drivers=[
+                RiskDriver(
+                    driver=f"driver of {request.risk.title}",
+                    explanation="e",
+                    influences="both",
+                )
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def mitigations(request):
+        return MitigationResponse(mitigations=[], response_info=fake_response_info())
+
+    async def tags(request):
+        calls["tags"] += 1
+        return CorrelationTagResponse(
+            correlation_tags=[], response_info=fake_response_info()
+        )
+
+    async def communication(request):
+        audiences.append(request.audience)
+        await asyncio.sleep(0.01)
+        return CommunicationResponse(
+            summary=f"for {request.audience}", response_info=fake_response_info()
+        )
+
+    for name, chain in {
+        "risk_identification_chain": identification,
+        "risk_assessment_chain": assessment,
+        "risk_drivers_chain": drivers,
+        "risk_mitigations_chain": mitigations,
+        "correlation_tags_chain": tags,
+        "communicate_risks_chain": communication,
+    }.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", chain)
+
+    response = await prepare_presentation_outputs(
+        MultiAudiencePresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audiences=[
+                AudienceEnum.executive,
+                AudienceEnum.audit,
+                AudienceEnum.workshop,
+                AudienceEnum.executive,
+            ],
+        )
+    )
+
+    assert calls == {"drivers": 5, "tags": 1}
+    assert sorted(audiences) == ["audit", "executive", "workshop"]
+    presentations = response.presentations
+    assert list(presentations) == [
+        AudienceEnum.executive,
+        AudienceEnum.audit,
+        AudienceEnum.workshop,
+    ]
+    executive = presentations[AudienceEnum.executive]
+    assert executive.main_risks == ["risk 4", "risk 3", "risk 2"]
+    assert executive.key_drivers == [f"driver of risk {i}" for i in (4, 3, 2)]
+    assert presentations[AudienceEnum.audit].main_risks == [
+        f"risk {i}" for i in range(5)
+    ]
+    assert presentations[AudienceEnum.audit].appendix.endswith("[Audit trail]")
+    # identification + 5 x (assessment, drivers, mitigations) + tags
+    shared = 10 * (1 + 5 * 3 + 1)
+    assert executive.response_info.consumed_tokens == shared + 10
+    assert response.response_info.consumed_tokens == shared + 3 * 10
+
+
+@pytest.mark.asyncio
+async def test_presentation_simulates_the_portfolio_loss(monkeypatch):
+    async def identification(request):
+        return RiskResponse(
+            risks=[
+                IdentifiedRisk(title=title, description="d")
+                for title in ("delay", "fine", "vague")
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def assessment(request):
+        if request.risk_title == "vague":
+            return AssessmentResponse(
+                probability=0.5, response_info=fake_response_info()
+            )
+        value = 1000.0 if request.risk_title == "delay" else 500.0
+        return AssessmentResponse(
+            probability=1.0,
+            quantitative=QuantitativeAssessment(
+                minimum=value, most_likely=value, maximum=value
+            ),
+            response_info=fake_response_info(),
+        )
+
+    async def drivers(request):
+        return DriverResponse(drivers=[], response_info=fake_response_info())
+
+    async def mitigations(request):
+        return MitigationResponse(mitigations=[], response_info=fake_response_info())
+
+    async def tags(request):
+        return CorrelationTagResponse(
+            correlation_tags=[], response_info=fake_response_info()
+        )
+
+    async def communication(request):
+        return CommunicationResponse(
+            summary="summary", response_info=fake_response_info()
+        )
+
+    for name, chain in {
+        "risk_identification_chain": identification,
+        "risk_assessment_chain": assessment,
+        "risk_drivers_chain": drivers,
+        "risk_mitigations_chain": mitigations,
+        "correlation_tags_chain": tags,
+        "communicate_risks_chain": communication,
+    }.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", chain)
+    monkeypatch.setattr(f"{PRESENTATION}.settings.SIMULATION_ITERATIONS", 1000)
+
+    response = await prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+        )
+    )
+
+    portfolio = response.portfolio_simulation
+    assert portfolio.p50 == portfolio.cvar == 1500.0
+    assert [c.risk_id for c in portfolio.contributions] == ["RISK-001", "RISK-002"]
+    assert response.quantitative_summary.splitlines()[-1] == (
+        "Portfolio loss: P50=1,500, P80=1,500, P95=1,500, VaR95%=1,500, CVaR95%=1,500"
+    )
+
+
+@pytest.mark.asyncio
+async def test_analysis_is_stored_in_the_risk_register(monkeypatch, tmp_path):
+    path = str(tmp_path / "register.db")
+    monkeypatch.setenv("RISK_REGISTER_PATH", path)
+    store = get_risk_register(path)
+    other, known = store.upsert_risks(
+        "A",
+        [
+            IdentifiedRisk(title="other", description="d"),
+            IdentifiedRisk(title="fine", description="d"),
+        ],
+        category="General",
+    )
+    store.replace_correlation_tags(
+        "A", [CorrelationTag(tag="kept", justification="j", risk_ids=[other.id])]
+    )
+
+    async def identification(request):
+        return RiskResponse(
+            risks=[
+                IdentifiedRisk(title=title, description="d")
+                for title in ("delay", "fine")
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def assessment(request):
+        return AssessmentResponse(probability=0.5, response_info=fake_response_info())
+
+    async def drivers(request):
+        return DriverResponse(
+            drivers=[
+                RiskDriver(
+                    driver=request.risk.title, explanation="e", influences="both"
+                )
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def mitigations(request):
+        return MitigationResponse(
+            mitigations=[
+                Mitigation(driver="d", mitigation=request.risk.title, explanation="e")
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def tags(request):
+        return CorrelationTagResponse(
+            correlation_tags=[
+                CorrelationTag(tag="vendor", justification="j", risk_ids=["RISK-001"]),
+                CorrelationTag(tag="legal", justification="j", risk_ids=["fine"]),
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def communication(request):
+        return CommunicationResponse(
+            summary="summary", response_info=fake_response_info()
+        )
+
+    for name, chain in {
+        "risk_identification_chain": identification,
+        "risk_assessment_chain": assessment,
+        "risk_drivers_chain": drivers,
+        "risk_mitigations_chain": mitigations,
+        "correlation_tags_chain": tags,
+        "communicate_risks_chain": communication,
+    }.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", chain)
+
+    await prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+        )
+    )
+
+    ids = {r.title: r.id for r in store.iter_risks("A")}
+    assert ids["fine"] == known.id
+    delay, fine = ids["delay"], ids["fine"]
+    assert set(store.get_assessments("A")) == {delay, fine}
+    assert store.get_drivers("A")[delay][0].driver == "delay"
+    assert store.get_mitigations("A")[fine][0].mitigation == "fine"
+    stored_tags = {t.tag: t.risk_ids for t in store.get_correlation_tags("A")}
+    assert stored_tags == {"kept": [other.id], "vendor": [delay], "legal": [fine]}
+
+
+def test_simulation_seed_is_derived_from_the_run_id(monkeypatch):
+    assert simulation_seed(None) is None
+    assert simulation_seed("run-1") == simulation_seed("run-1")
+    assert simulation_seed("run-1") != simulation_seed("run-2")
+
+    monkeypatch.setattr(f"{PRESENTATION}.settings.SIMULATION_SEED", 7)
+    assert simulation_seed(None) == simulation_seed("run-1") == 7
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.categorization import CategoryResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.workflows.risk_sweep import RiskSweepRequest
+from riskgpt.workflows.risk_sweep import risk_sweep
+from tests.utils.responses import fake_response_info
+
+SWEEP = "riskgpt.workflows.risk_sweep"
+
+RISKS = {
+    "Technical": [
+        ("Data migration failure", "Customer data is lost during the migration."),
+        ("Integration delays", "Interfaces to the ERP system are late."),
+    ],
+    "Organizational": [
+        ("Low user adoption", "Sales staff resist the new CRM system."),
+        ("Data migration failure", "Customer data is lost during migration."),
+    ],
+    "Legal": [],
+}
+
+
+@pytest.fixture
+def sweep_chains(monkeypatch):
+    running = 0
+    peak = 0
+    assessed = []
+
+    async def fake_categories(request):
+        return CategoryResponse(
+            categories=["Technical", "Organizational", "Technical", "Legal"],
+            response_info=fake_response_info(5),
+        )
+
+    async def fake_identification(request):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if request.category == "Legal":
+            raise RuntimeError("rate limited")
+        return RiskResponse(
+            risks=[
+                IdentifiedRisk(title=title, description=description)
+                for title, description in RISKS[request.category]
+            ],
+            response_info=fake_response_info(10),
+        )
+
+    async def fake_assessment(request):
+        assessed.append(request.risk_title)
+        return AssessmentResponse(probability=0.5, response_info=fake_response_info(20))
+
+    monkeypatch.setattr(f"{SWEEP}.risk_categories_chain", fake_categories)
+    monkeypatch.setattr(f"{SWEEP}.risk_identification_chain", fake_identification)
+    monkeypatch.setattr(f"{SWEEP}.risk_assessment_chain", fake_assessment)
+    return lambda: (peak, assessed)
+
+
+@pytest.mark.asyncio
+async def test_sweep_dedups_across_categories(sweep_chains):
+    response = await risk_sweep(
+        RiskSweepRequest(business_context=BusinessContext(project_id="CRM"))
+    )
+    peak, assessed = sweep_chains()
+
+    assert response.categories == ["Technical", "Organizational", "Legal"]
+    assert peak == 3
+    assert [entry.risk.title for entry in response.risks] == [
+        "Data migration failure",
+        "Integration delays",
+        "Low user adoption",
+    ]
+    assert [entry.risk.id for entry in response.risks] == [
+        "RISK-001",
+        "RISK-002",
+        "RISK-003",
+    ]
+    migration = response.risks[0]
+    assert migration.risk.category == "Technical"
+    assert migration.duplicate_categories == ["Organizational"]
+    assert response.duplicates_removed == 1
+    # Only the unique risks are assessed
+    assert sorted(assessed) == sorted(e.risk.title for e in response.risks)
+    assert all(e.assessment.probability == 0.5 for e in response.risks)
+
+    costs = response.category_costs
+    assert costs["Legal"].error == "rate limited"
+    assert costs["Legal"].consumed_tokens == 0
+    assert (
+        costs["Technical"].consumed_tokens + costs["Organizational"].consumed_tokens
+        == 2 * 10 + 3 * 20
+    )
+    assert response.response_info.consumed_tokens == 5 + 2 * 10 + 3 * 20
+
+
+@pytest.mark.asyncio
+async def test_sweep_stores_the_register_and_reuses_it(
+    sweep_chains, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        f"{SWEEP}.settings.RISK_REGISTER_PATH", str(tmp_path / "register.db")
+    )
+    existing = {}
+
+    async def fake_identification(request):
+        existing[request.category] = request.existing_risks
+        return RiskResponse(
+            risks=[
+                IdentifiedRisk(title=title, description=description)
+                for title, description in RISKS[request.category]
+            ],
+            response_info=fake_response_info(10),
+        )
+
+    request = RiskSweepRequest(business_context=BusinessContext(project_id="CRM"))
+    first = await risk_sweep(request)
+    monkeypatch.setattr(f"{SWEEP}.risk_identification_chain", fake_identification)
+    second = await risk_sweep(request)
+
+    assert [e.risk.id for e in second.risks] == [e.risk.id for e in first.risks]
+    assert [r.title for r in existing["Technical"]] == [
+        "Data migration failure",
+        "Integration delays",
+    ]
+    assert existing["Legal"] is None
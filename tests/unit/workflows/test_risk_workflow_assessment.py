@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from riskgpt.models.base import default_response_info
+from riskgpt.models.chains.assessment import (
+    AssessmentResponse,
+    BatchAssessmentResponse,
+)
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskRequest, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.storage.risk_register import get_risk_register
+from riskgpt.workflows.risk_workflow import (
+    assess_risks,
+    identify_risks,
+    prepare_response,
+)
+from tests.utils.responses import fake_response_info
+
+
+def _state(count: int):
+    return {
+        "request": RiskRequest(
+            business_context=BusinessContext(project_id="A"), category="Technical"
+        ),
+        "risks": [
+            IdentifiedRisk(title=f"risk {i}", description="description")
+            for i in range(count)
+        ],
+        "document_refs": ["doc-1"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_assessments_are_concurrent_ordered_and_isolated(monkeypatch):
+    monkeypatch.setenv("ASSESSMENT_CONCURRENCY", "3")
+    delays = [0.05, 0.01, 0.03, 0.0, 0.02, 0.01]
+    running = 0
+    peak = 0
+
+    async def fake_assessment(request):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        index = int(request.risk_title.split()[-1])
+        await asyncio.sleep(delays[index])
+        running -= 1
+        if index == 2:
+            raise RuntimeError("malformed output")
+        return AssessmentResponse(
+            probability=index / 10,
+            response_info=fake_response_info(),
+        )
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_assessment_chain", fake_assessment
+    )
+
+    result = await assess_risks(_state(6))
+
+    assert peak == 3
+    assessments = result["assessments"]
+    assert [a.probability for a in assessments] == [0.0, 0.1, None, 0.3, 0.4, 0.5]
+    assert assessments[2].response_info.error == "malformed output"
+    assert all(a.document_refs == ["doc-1"] for a in assessments)
+    assert len(result["response_info_list"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_batches_send_references_once(monkeypatch):
+    monkeypatch.setenv("ASSESSMENT_BATCH_SIZE", "10")
+    batches = []
+
+    async def fake_batch(request):
+        batches.append(request)
+        return BatchAssessmentResponse(
+            assessments={
+                risk.risk_id: AssessmentResponse(probability=0.5)
+                for risk in request.risks
+            },
+            response_info=fake_response_info(),
+        )
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_assessment_batch_chain", fake_batch
+    )
+    state = _state(6)
+    state["references"] = ["https://example.com/a", "https://example.com/b"]
+
+    result = await assess_risks(state)
+
+    assert len(result["assessments"]) == 6
+    (batch,) = batches
+    assert all(r.risk_description == "description" for r in batch.risks)
+    assert batch.document_excerpts.count("https://example.com/a") == 1
+
+
+@pytest.mark.asyncio
+async def test_results_are_stored_and_passed_as_existing_risks(monkeypatch, tmp_path):
+    path = str(tmp_path / "register.db")
+    monkeypatch.setenv("RISK_REGISTER_PATH", path)
+    state = _state(3)
+    state["assessments"] = [
+        AssessmentResponse(probability=0.2),
+        AssessmentResponse(probability=0.3),
+        AssessmentResponse(response_info=default_response_info(error="failed")),
+    ]
+    state["risk_response"] = RiskResponse(risks=state["risks"])
+    response = prepare_response(state)["response"]
+
+    assert [a.response_info.error for a in response.assessments] == [
+        None,
+        None,
+        "failed",
+    ]
+    store = get_risk_register(path)
+    assert [r.title for r in store.iter_risks("A", "Technical")] == [
+        "risk 0",
+        "risk 1",
+        "risk 2",
+    ]
+    assert sorted(a.probability for a in store.get_assessments("A").values()) == [
+        0.2,
+        0.3,
+    ]
+
+    requests = []
+
+    async def fake_identification(request):
+        requests.append(request)
+        return RiskResponse(risks=[])
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_identification_chain",
+        fake_identification,
+    )
+    await identify_risks({"request": state["request"]})
+    assert [r.id for r in requests[0].existing_risks] == [
+        "RISK-001",
+        "RISK-002",
+        "RISK-003",
+    ]
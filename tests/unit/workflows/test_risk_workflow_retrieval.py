@@ -0,0 +1,66 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskRequest, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.utils.search import SearchRequest, SearchResponse, SearchResult
+from riskgpt.workflows import risk_workflow as workflow
+
+DELAY = 0.3
+
+
+@pytest.mark.asyncio
+async def test_search_and_documents_are_retrieved_concurrently(monkeypatch):
+    search_requests = []
+
+    def fake_search(request):
+        search_requests.append(request)
+        time.sleep(DELAY)
+        return SearchResponse(
+            results=[SearchResult(title="Supply chain report", url="https://a")]
+        )
+
+    async def fake_fetch_documents(context):
+        await asyncio.sleep(DELAY)
+        return ["doc-1"]
+
+    identification = AsyncMock(
+        return_value=RiskResponse(
+            risks=[IdentifiedRisk(title="risk", description="description")]
+        )
+    )
+    assessment = AsyncMock(return_value=AssessmentResponse())
+    monkeypatch.setattr("riskgpt.workflows.risk_workflow.search", fake_search)
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.afetch_documents", fake_fetch_documents
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_identification_chain", identification
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_assessment_chain", assessment
+    )
+
+    start = time.perf_counter()
+    response = await workflow.risk_workflow(
+        RiskRequest(
+            business_context=BusinessContext(
+                project_id="A", project_description="Plant construction"
+            ),
+            category="Supply",
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2 * DELAY
+    assert isinstance(search_requests[0], SearchRequest)
+    assert search_requests[0].query == "Plant construction Supply risks"
+    # Both retrieval results are joined before the risks are identified
+    assert identification.await_count == 1
+    assert identification.await_args.args[0].document_refs == ["doc-1"]
+    assessment_request = assessment.await_args.args[0]
+    assert "Supply chain report" in assessment_request.risk_description
+    assert response.document_refs == ["doc-1"]
@@ -0,0 +1,219 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.output_parsers import BaseOutputParser
+from riskgpt.chains.base import BaseChain
+from riskgpt.helpers.budget import (
+    BudgetExceededError,
+    current_budget,
+    track_budget,
+)
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.categorization import CategoryResponse
+from riskgpt.models.chains.communication import CommunicationResponse
+from riskgpt.models.chains.correlation import CorrelationTagResponse
+from riskgpt.models.chains.drivers import DriverResponse, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskResponse
+from riskgpt.models.common import BusinessContext, WorkflowBudget
+from riskgpt.models.enums import AudienceEnum, TopicEnum
+from riskgpt.models.utils.search import Source
+from riskgpt.models.workflows.context import ExtractKeyPointsResponse, KeyPoint
+from riskgpt.models.workflows.presentation import PresentationRequest
+from riskgpt.workflows import prepare_presentation_output as presentation
+from riskgpt.workflows.enrich_context import extract_topic_key_points
+from tests.utils.responses import fake_response_info
+
+PRESENTATION = "riskgpt.workflows.prepare_presentation_output"
+
+
+def _charged(response):
+    """Fake chain that charges its tokens to the budget like BaseChain.invoke."""
+    calls = []
+
+    async def chain(request):
+        budget = current_budget()
+        if budget is not None:
+            budget.check("fake")
+            budget.record(response.response_info)
+        calls.append(request)
+        return response
+
+    chain.calls = calls
+    return chain
+
+
+class DummyParser(BaseOutputParser):
+    def parse(self, text):
+        return CategoryResponse(categories=["foo"], rationale=None)
+
+    def get_format_instructions(self) -> str:
+        return ""
+
+
+@pytest.mark.asyncio
+async def test_base_chain_stops_when_budget_is_exhausted(monkeypatch):
+    chain = BaseChain(prompt_template="hi", parser=DummyParser(), prompt_name="demo")
+    calls = []
+
+    async def fake_ainvoke(inputs, memory=None):
+        calls.append(inputs)
+        return CategoryResponse(categories=["foo"], rationale=None)
+
+    class DummyCB:
+        total_tokens = 30
+        total_cost = 0.001
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, tb):
+            pass
+
+    monkeypatch.setattr(chain, "chain", SimpleNamespace(ainvoke=fake_ainvoke))
+    monkeypatch.setattr("riskgpt.chains.base.get_openai_callback", DummyCB)
+
+    with track_budget(WorkflowBudget(max_tokens=50)) as budget:
+        await chain.invoke({})
+        await chain.invoke({})
+        with pytest.raises(BudgetExceededError):
+            await chain.invoke({})
+
+    assert len(calls) == 2
+    assert budget.consumed_tokens == 60
+    assert budget.partial
+    assert current_budget() is None
+
+
+@pytest.mark.asyncio
+async def test_extraction_skips_least_relevant_sources(monkeypatch):
+    monkeypatch.setattr("riskgpt.helpers.search.settings.EXTRACTION_CONCURRENCY", 1)
+
+    async def fake_extract(request):
+        return await _charged(
+            ExtractKeyPointsResponse(
+                points=[KeyPoint(content=request.content, topic=TopicEnum.NEWS)],
+                response_info=fake_response_info(),
+            )
+        )(request)
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.enrich_context.extract_key_points", fake_extract
+    )
+    sources = [
+        Source(
+            title=f"source-{i}",
+            url=f"https://example.com/{i}",
+            content=f"content {i}",
+            topic=TopicEnum.NEWS,
+            score=score,
+        )
+        for i, score in enumerate([0.2, 0.9, 0.5])
+    ]
+
+    with track_budget(WorkflowBudget(max_tokens=20)) as budget:
+        result = await extract_topic_key_points({"sources": sources}, TopicEnum.NEWS)
+
+    assert [kp.source_url for kp in result["key_points"]] == [
+        "https://example.com/1",
+        "https://example.com/2",
+    ]
+    assert budget.skipped == ["extraction of 'https://example.com/0'"]
+
+
+@pytest.mark.asyncio
+async def test_presentation_degrades_when_budget_runs_low(monkeypatch):
+    identification = _charged(
+        RiskResponse(
+            risks=[
+                IdentifiedRisk(title=f"risk {i}", description="d") for i in range(2)
+            ],
+            response_info=fake_response_info(),
+        )
+    )
+    drivers = _charged(
+        DriverResponse(
+            drivers=[RiskDriver(driver="driver", explanation="e", influences="both")],
+            response_info=fake_response_info(),
+        )
+    )
+    mitigations = _charged(
+        MitigationResponse(
+            mitigations=[Mitigation(driver="driver", mitigation="m", explanation="e")],
+            response_info=fake_response_info(),
+        )
+    )
+    tags = _charged(
+        CorrelationTagResponse(correlation_tags=[], response_info=fake_response_info())
+    )
+    communication = _charged(
+        CommunicationResponse(summary="summary", response_info=fake_response_info())
+    )
+    monkeypatch.setattr(f"{PRESENTATION}.risk_identification_chain", identification)
+    assessment = _charged(
+        AssessmentResponse(probability=0.5, response_info=fake_response_info())
+    )
+    monkeypatch.setattr(f"{PRESENTATION}.risk_assessment_chain", assessment)
+    monkeypatch.setattr(f"{PRESENTATION}.risk_drivers_chain", drivers)
+    monkeypatch.setattr(f"{PRESENTATION}.risk_mitigations_chain", mitigations)
+    monkeypatch.setattr(f"{PRESENTATION}.correlation_tags_chain", tags)
+    monkeypatch.setattr(f"{PRESENTATION}.communicate_risks_chain", communication)
+    monkeypatch.setattr(f"{PRESENTATION}.settings.BUDGET_RESERVE", 0.1)
+
+    response = await presentation.prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+            budget=WorkflowBudget(max_tokens=40),
+        )
+    )
+
+    # identification + the pipeline of the first risk reach the budget
+    assert len(assessment.calls) == len(drivers.calls) == len(mitigations.calls) == 1
+    assert tags.calls == [] and communication.calls == []
+    assert response.main_risks == ["risk 0", "risk 1"]
+    assert response.key_drivers == ["driver"]
+    assert response.quantitative_summary == "risk 0: P=0.5, I=n/a\nrisk 1: P=n/a, I=n/a"
+    assert response.response_info.consumed_tokens == 40
+    assert response.response_info.partial
+    assert "budget" in response.executive_summary
+
+
+@pytest.mark.asyncio
+async def test_presentation_without_budget_is_complete(monkeypatch):
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_identification_chain",
+        _charged(
+            RiskResponse(
+                risks=[IdentifiedRisk(title="risk", description="d")],
+                response_info=fake_response_info(),
+            )
+        ),
+    )
+    for name, response in {
+        "risk_assessment_chain": AssessmentResponse(response_info=fake_response_info()),
+        "risk_drivers_chain": DriverResponse(
+            drivers=[], response_info=fake_response_info()
+        ),
+        "risk_mitigations_chain": MitigationResponse(
+            mitigations=[], response_info=fake_response_info()
+        ),
+        "correlation_tags_chain": CorrelationTagResponse(
+            correlation_tags=[], response_info=fake_response_info()
+        ),
+        "communicate_risks_chain": CommunicationResponse(
+            summary="summary", response_info=fake_response_info()
+        ),
+    }.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", _charged(response))
+
+    response = await presentation.prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+        )
+    )
+
+    assert response.executive_summary == "summary"
+    assert response.response_info.consumed_tokens == 60
+    assert not response.response_info.partial
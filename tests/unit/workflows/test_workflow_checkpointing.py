@@ -0,0 +1,171 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from riskgpt.helpers.checkpointing import MemoryCheckpointer, SQLiteCheckpointer
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.communication import CommunicationResponse
+from riskgpt.models.chains.correlation import CorrelationTag, CorrelationTagResponse
+from riskgpt.models.chains.drivers import DriverResponse, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.workflows.presentation import PresentationRequest
+from riskgpt.workflows.prepare_presentation_output import prepare_presentation_output
+from tests.utils.responses import fake_response_info
+
+PRESENTATION = "riskgpt.workflows.prepare_presentation_output"
+
+
+@pytest.fixture
+def chains(monkeypatch):
+    mocks = {
+        "risk_identification_chain": AsyncMock(
+            return_value=RiskResponse(
+                risks=[IdentifiedRisk(title="risk", description="d")],
+                response_info=fake_response_info(),
+            )
+        ),
+        "risk_assessment_chain": AsyncMock(
+            return_value=AssessmentResponse(
+                probability=0.1, response_info=fake_response_info()
+            )
+        ),
+        "risk_drivers_chain": AsyncMock(
+            return_value=DriverResponse(
+                drivers=[RiskDriver(driver="drv", explanation="e", influences="both")],
+                response_info=fake_response_info(),
+            )
+        ),
+        "risk_mitigations_chain": AsyncMock(
+            return_value=MitigationResponse(
+                mitigations=[Mitigation(driver="drv", mitigation="m", explanation="e")],
+                response_info=fake_response_info(),
+            )
+        ),
+        "correlation_tags_chain": AsyncMock(
+            side_effect=[
+                RuntimeError("rate limited"),
+                CorrelationTagResponse(
+                    correlation_tags=[
+                        CorrelationTag(tag="tag", justification="j", risk_ids=[])
+                    ],
+                    response_info=fake_response_info(),
+                ),
+            ]
+        ),
+        "communicate_risks_chain": AsyncMock(
+            return_value=CommunicationResponse(
+                summary="summary", response_info=fake_response_info()
+            )
+        ),
+    }
+    for name, mock in mocks.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", mock)
+    return mocks
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+async def test_failed_run_resumes_from_last_node(chains, tmp_path, backend):
+    checkpointer = (
+        MemoryCheckpointer()
+        if backend == "memory"
+        else SQLiteCheckpointer(str(tmp_path / "checkpoints.db"))
+    )
+    request = PresentationRequest(
+        business_context=BusinessContext(project_id="P1"),
+        audience=AudienceEnum.workshop,
+    )
+
+    with pytest.raises(RuntimeError):
+        await prepare_presentation_output(request, "run-1", checkpointer)
+
+    response = await prepare_presentation_output(request, "run-1", checkpointer)
+
+    assert response.correlation_tags == ["tag"]
+    assert chains["correlation_tags_chain"].await_count == 2
+    for name in ("risk_identification_chain", "risk_drivers_chain"):
+        assert chains[name].await_count == 1
+    # All chain outputs are accounted for even though they come from the first run
+    assert response.response_info.consumed_tokens == 60
+
+    # A finished run returns its stored result
+    again = await prepare_presentation_output(request, "run-1", checkpointer)
+    assert again == response
+    assert chains["communicate_risks_chain"].await_count == 1
+
+
+def test_expired_runs_are_pruned(tmp_path):
+    for checkpointer in (
+        MemoryCheckpointer(),
+        SQLiteCheckpointer(str(tmp_path / "checkpoints.db")),
+    ):
+        config = {"configurable": {"thread_id": "old", "checkpoint_ns": ""}}
+        checkpoint = {
+            "v": 1,
+            "id": "1",
+            "ts": "2024-01-01T00:00:00+00:00",
+            "channel_values": {},
+            "channel_versions": {},
+            "versions_seen": {},
+            "pending_sends": [],
+        }
+        checkpointer.put(config, checkpoint, {}, {})
+
+        assert checkpointer.prune(timedelta(hours=1)) == 0
+        assert checkpointer.prune(timedelta(seconds=0)) == 1
+        assert checkpointer.get_tuple(config) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+async def test_resumed_run_only_repeats_the_failed_risk(
+    chains, monkeypatch, tmp_path, backend
+):
+    checkpointer = (
+        MemoryCheckpointer()
+        if backend == "memory"
+        else SQLiteCheckpointer(str(tmp_path / "checkpoints.db"))
+    )
+    chains["risk_identification_chain"].return_value = RiskResponse(
+        risks=[IdentifiedRisk(title=f"risk {i}", description="d") for i in range(3)],
+        response_info=fake_response_info(),
+    )
+    chains["correlation_tags_chain"].side_effect = None
+    chains["correlation_tags_chain"].return_value = CorrelationTagResponse(
+        correlation_tags=[], response_info=fake_response_info()
+    )
+    failures = ["risk 1"]
+
+    async def mitigations(request):
+        if request.risk.title in failures:
+            # Fails once the other risks are done
+            await asyncio.sleep(0.05)
+            failures.remove(request.risk.title)
+            raise RuntimeError("rate limited")
+        return MitigationResponse(
+            mitigations=[
+                Mitigation(driver="drv", mitigation=request.risk.title, explanation="e")
+            ],
+            response_info=fake_response_info(),
+        )
+
+    monkeypatch.setattr(f"{PRESENTATION}.risk_mitigations_chain", mitigations)
+    request = PresentationRequest(
+        business_context=BusinessContext(project_id="P1"),
+        audience=AudienceEnum.workshop,
+    )
+
+    with pytest.raises(RuntimeError):
+        await prepare_presentation_output(request, "run-2", checkpointer)
+    response = await prepare_presentation_output(request, "run-2", checkpointer)
+
+    assert response.mitigations == ["risk 0", "risk 1", "risk 2"]
+    assert chains["risk_assessment_chain"].await_count == 3
+    # Only the drivers of the failed risk are identified again
+    assert chains["risk_drivers_chain"].await_count == 4
+    # identification + 3 x (assessment, drivers, mitigations) + tags + summary
+    assert response.response_info.consumed_tokens == 10 * (1 + 3 * 3 + 2)
@@ -0,0 +1,202 @@
+import asyncio
+import time
+
+import pytest
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.communication import CommunicationResponse
+from riskgpt.models.chains.correlation import CorrelationTagResponse
+from riskgpt.models.chains.drivers import DriverResponse, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskRequest, RiskResponse
+from riskgpt.models.common import BusinessContext, WorkflowBudget
+from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.utils.search import SearchResponse
+from riskgpt.models.workflows.presentation import PresentationRequest
+from riskgpt.workflows import risk_workflow as workflow
+from riskgpt.workflows.prepare_presentation_output import prepare_presentation_output
+from tests.utils.responses import fake_response_info
+
+PRESENTATION = "riskgpt.workflows.prepare_presentation_output"
+DEADLINE = 0.5
+STRAGGLER = 5.0
+
+
+def _identified(count: int) -> RiskResponse:
+    return RiskResponse(
+        risks=[
+            IdentifiedRisk(title=f"risk {i}", description="d") for i in range(count)
+        ],
+        response_info=fake_response_info(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_presentation_returns_by_the_deadline(monkeypatch):
+    async def identification(request):
+        return _identified(2)
+
+    async def assessment(request):
+        return AssessmentResponse(probability=0.5, response_info=fake_response_info())
+
+    async def drivers(request):
+        if request.risk.title == "risk 1":
+            await asyncio.sleep(STRAGGLER)
+        return DriverResponse(
+            drivers=[
+                RiskDriver(
+                    driver=f"driver of {request.risk.title}",
+                    explanation="e",
+                    influences="both",
+                )
+            ],
+            response_info=fake_response_info(),
+        )
+
+    async def mitigations(request):
+        return MitigationResponse(
+            mitigations=[Mitigation(driver="driver", mitigation="m", explanation="e")],
+            response_info=fake_response_info(),
+        )
+
+    async def tags(request):
+        return CorrelationTagResponse(
+            correlation_tags=[], response_info=fake_response_info()
+        )
+
+    async def communication(request):
+        return CommunicationResponse(
+            summary="summary", response_info=fake_response_info()
+        )
+
+    for name, chain in {
+        "risk_identification_chain": identification,
+        "risk_assessment_chain": assessment,
+        "risk_drivers_chain": drivers,
+        "risk_mitigations_chain": mitigations,
+        "correlation_tags_chain": tags,
+        "communicate_risks_chain": communication,
+    }.items():
+        monkeypatch.setattr(f"{PRESENTATION}.{name}", chain)
+    monkeypatch.setattr(f"{PRESENTATION}.settings.BUDGET_RESERVE", 0.2)
+
+    start = time.perf_counter()
+    response = await prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+            budget=WorkflowBudget(max_seconds=DEADLINE),
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < DEADLINE + 0.2
+    assert response.executive_summary == "summary"
+    assert response.main_risks == ["risk 0", "risk 1"]
+    assert response.key_drivers == ["driver of risk 0"]
+    assert response.mitigations == ["m"]
+    assert response.missing_sections == [
+        "drivers of 'risk 1'",
+        "mitigations of 'risk 1'",
+        "correlation tags",
+    ]
+    assert response.response_info.partial
+
+
+@pytest.mark.asyncio
+async def test_presentation_without_summary_at_the_deadline(monkeypatch):
+    async def identification(request):
+        return _identified(1)
+
+    async def communication(request):
+        await asyncio.sleep(STRAGGLER)
+
+    monkeypatch.setattr(f"{PRESENTATION}.risk_identification_chain", identification)
+    monkeypatch.setattr(f"{PRESENTATION}.communicate_risks_chain", communication)
+    for name, response in {
+        "risk_assessment_chain": AssessmentResponse(response_info=fake_response_info()),
+        "risk_drivers_chain": DriverResponse(
+            drivers=[], response_info=fake_response_info()
+        ),
+        "risk_mitigations_chain": MitigationResponse(
+            mitigations=[], response_info=fake_response_info()
+        ),
+        "correlation_tags_chain": CorrelationTagResponse(
+            correlation_tags=[], response_info=fake_response_info()
+        ),
+    }.items():
+        monkeypatch.setattr(
+            f"{PRESENTATION}.{name}", lambda request, response=response: _done(response)
+        )
+
+    start = time.perf_counter()
+    response = await prepare_presentation_output(
+        PresentationRequest(
+            business_context=BusinessContext(project_id="A"),
+            audience=AudienceEnum.workshop,
+            budget=WorkflowBudget(max_seconds=DEADLINE),
+        )
+    )
+
+    assert time.perf_counter() - start < DEADLINE + 0.2
+    assert "deadline" in response.executive_summary
+    assert response.main_risks == ["risk 0"]
+    assert response.missing_sections == ["executive summary"]
+    assert response.response_info.partial
+
+
+async def _done(response):
+    return response
+
+
+@pytest.mark.asyncio
+async def test_risk_workflow_cancels_straggling_assessments(monkeypatch):
+    async def identification(request):
+        return _identified(3)
+
+    async def assessment(request):
+        if request.risk_title == "risk 2":
+            await asyncio.sleep(STRAGGLER)
+        return AssessmentResponse(probability=0.5, response_info=fake_response_info())
+
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.search",
+        lambda request: SearchResponse(results=[]),
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.afetch_documents",
+        lambda context: _done([]),
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_identification_chain", identification
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_assessment_chain", assessment
+    )
+    results = {}
+    original = workflow.prepare_response
+
+    def prepare_response(state):
+        results["assessments"] = state["assessments"]
+        return original(state)
+
+    monkeypatch.setattr(workflow, "prepare_response", prepare_response)
+    workflow._build_risk_workflow_graph.cache_clear()
+
+    start = time.perf_counter()
+    try:
+        response = await workflow.risk_workflow(
+            RiskRequest(
+                business_context=BusinessContext(project_id="A"),
+                category="c",
+                budget=WorkflowBudget(max_seconds=DEADLINE),
+            )
+        )
+    finally:
+        workflow._build_risk_workflow_graph.cache_clear()
+
+    assert time.perf_counter() - start < DEADLINE
+    assert [risk.title for risk in response.risks] == ["risk 0", "risk 1", "risk 2"]
+    assessments = results["assessments"]
+    assert [a.probability for a in assessments] == [0.5, 0.5, None]
+    assert "Deadline" in assessments[2].response_info.error
+    assert response.response_info.partial
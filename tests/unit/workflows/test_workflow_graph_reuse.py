@@ -0,0 +1,173 @@
+import gc
+import weakref
+from unittest.mock import AsyncMock
+
+import pytest
+from riskgpt.helpers.checkpointing import MemoryCheckpointer
+from riskgpt.models.chains.assessment import AssessmentResponse
+from riskgpt.models.chains.communication import CommunicationResponse
+from riskgpt.models.chains.correlation import CorrelationTag, CorrelationTagResponse
+from riskgpt.models.chains.drivers import DriverResponse, RiskDriver
+from riskgpt.models.chains.mitigation import Mitigation, MitigationResponse
+from riskgpt.models.chains.risk import IdentifiedRisk, RiskRequest, RiskResponse
+from riskgpt.models.common import BusinessContext
+from riskgpt.models.enums import AudienceEnum
+from riskgpt.models.utils.search import SearchResponse
+from riskgpt.models.workflows.presentation import PresentationRequest
+from riskgpt.workflows import prepare_presentation_output as presentation
+from riskgpt.workflows import risk_workflow as workflow
+from tests.utils.responses import fake_response_info
+
+PRESENTATION = "riskgpt.workflows.prepare_presentation_output"
+
+
+async def fake_identification(request):
+    return RiskResponse(
+        risks=[
+            IdentifiedRisk(
+                title=f"{request.business_context.project_id} risk {i}",
+                description="description",
+            )
+            for i in range(2)
+        ],
+        response_info=fake_response_info(),
+    )
+
+
+@pytest.fixture
+def presentation_chains(monkeypatch):
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_identification_chain", fake_identification
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_assessment_chain",
+        AsyncMock(
+            return_value=AssessmentResponse(
+                probability=0.5, impact=0.4, response_info=fake_response_info()
+            )
+        ),
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_drivers_chain",
+        AsyncMock(
+            return_value=DriverResponse(
+                drivers=[
+                    RiskDriver(driver="driver", explanation="e", influences="both")
+                ],
+                response_info=fake_response_info(),
+            )
+        ),
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.risk_mitigations_chain",
+        AsyncMock(
+            return_value=MitigationResponse(
+                mitigations=[
+                    Mitigation(
+                        driver="driver", mitigation="mitigation", explanation="e"
+                    )
+                ],
+                response_info=fake_response_info(),
+            )
+        ),
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.correlation_tags_chain",
+        AsyncMock(
+            return_value=CorrelationTagResponse(
+                correlation_tags=[
+                    CorrelationTag(
+                        tag="shared", justification="j", risk_ids=["RISK-001"]
+                    )
+                ],
+                response_info=fake_response_info(),
+            )
+        ),
+    )
+    monkeypatch.setattr(
+        f"{PRESENTATION}.communicate_risks_chain",
+        AsyncMock(
+            return_value=CommunicationResponse(
+                summary="summary",
+                technical_annex="annex",
+                response_info=fake_response_info(),
+            )
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_presentation_graph_is_compiled_once(presentation_chains):
+    presentation._build_graph.cache_clear()
+
+    responses = [
+        await presentation.prepare_presentation_output(
+            PresentationRequest(
+                business_context=BusinessContext(project_id=project_id),
+                audience=AudienceEnum.workshop,
+            )
+        )
+        for project_id in ("A", "B")
+    ]
+
+    assert presentation._build_graph.cache_info().misses == 1
+    assert presentation._build_graph.cache_info().hits == 1
+    assert responses[0].main_risks == ["A risk 0", "A risk 1"]
+    assert responses[1].main_risks == ["B risk 0", "B risk 1"]
+    # 1 identification + 2 x (assessment, drivers, mitigations) + tags + summary
+    assert responses[1].response_info.consumed_tokens == 90
+    assert responses[1].correlation_tags == ["shared"]
+    assert responses[1].key_drivers == ["driver", "driver"]
+
+
+@pytest.mark.asyncio
+async def test_risk_workflow_graph_is_compiled_once(monkeypatch):
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.search",
+        lambda request: SearchResponse(results=[]),
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_identification_chain",
+        fake_identification,
+    )
+    monkeypatch.setattr(
+        "riskgpt.workflows.risk_workflow.risk_assessment_chain",
+        AsyncMock(return_value=AssessmentResponse(response_info=fake_response_info())),
+    )
+    workflow._build_risk_workflow_graph.cache_clear()
+
+    for project_id in ("A", "B"):
+        response = await workflow.risk_workflow(
+            RiskRequest(
+                business_context=BusinessContext(project_id=project_id),
+                category="Technical",
+            )
+        )
+        assert [r.title for r in response.risks] == [
+            f"{project_id} risk 0",
+            f"{project_id} risk 1",
+        ]
+        assert response.response_info.consumed_tokens == 30
+
+    assert workflow._build_risk_workflow_graph.cache_info().misses == 1
+
+
+@pytest.mark.asyncio
+async def test_checkpointers_share_the_compiled_graph(presentation_chains):
+    presentation._build_graph.cache_clear()
+    request = PresentationRequest(
+        business_context=BusinessContext(project_id="A"),
+        audience=AudienceEnum.workshop,
+    )
+
+    released = []
+    for run_id in ("run-1", "run-2"):
+        checkpointer = MemoryCheckpointer()
+        await presentation.prepare_presentation_output(request, run_id, checkpointer)
+        released.append(weakref.ref(checkpointer))
+        del checkpointer
+    gc.collect()
+
+    assert presentation._build_graph.cache_info().misses == 1
+    # The cached graph does not keep the checkpointers of earlier runs alive
+    assert [ref() for ref in released] == [None, None]
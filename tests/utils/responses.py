@@ -0,0 +1,13 @@
+"""Fake responses of chain calls shared by the unit tests."""
+
+from riskgpt.models.base import ResponseInfo
+
+
+def fake_response_info(tokens: int = 10) -> ResponseInfo:
+    """Response info of a faked chain call costing 0.001 USD per 1000 tokens."""
+    return ResponseInfo(
+        consumed_tokens=tokens,
+        total_cost=tokens / 1000,
+        prompt_name="x",
+        model_name="m",
+    )